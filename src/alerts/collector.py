@@ -0,0 +1,99 @@
+import threading
+
+from src.alerts.index import AlertIndex, DEFAULT_MAX_ALERTS
+from src.alerts.sources import build_alert_sources
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_WINDOW = 30.0
+DEFAULT_SETTLE = 10.0
+
+
+def parse_alert_config(config):
+    """
+    Normalize the optional 'alerts' section of lab_conf.yaml:
+        { "sources": {name: {...}}, "poll_interval": s, "window": s, "settle": s,
+          "max_alerts": n }
+    Returns None if the section is missing or has no sources.
+    """
+    if not config or not isinstance(config, dict) or not config.get("sources"):
+        return None
+    return {
+        "sources": {str(name): cfg or {} for name, cfg in config["sources"].items()},
+        "poll_interval": float(config.get("poll_interval", DEFAULT_POLL_INTERVAL)),
+        "window": float(config.get("window", DEFAULT_WINDOW)),
+        "settle": float(config.get("settle", DEFAULT_SETTLE)),
+        "max_alerts": int(config.get("max_alerts", DEFAULT_MAX_ALERTS)),
+    }
+
+
+class AlertCollector:
+    def __init__(self, sources, poll_interval=DEFAULT_POLL_INTERVAL, window=DEFAULT_WINDOW,
+                 settle=DEFAULT_SETTLE, max_alerts=DEFAULT_MAX_ALERTS):
+        """
+        Ingest the alerts of the IDS/SIEM sources in a background thread:
+        each poll reads the lines appended to every source since its last
+        offset and stores the parsed batch in an AlertIndex.
+
+        Parameters:
+        - sources: AlertSource objects (see sources.py)
+        - poll_interval: seconds between two reads of the sources
+        - window: seconds after a command during which its alerts are expected
+        - settle: seconds waited after a plan for late alerts
+        - max_alerts: alerts kept in memory (oldest dropped)
+        """
+        self.sources = sources
+        self.poll_interval = poll_interval
+        self.window = window
+        self.settle = settle
+        self.index = AlertIndex(max_alerts)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _loop(self):
+        while not self.stop_event.wait(self.poll_interval):
+            self.poll()
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def poll(self):
+        """Read the new alerts of every source now; returns them."""
+        new_alerts = []
+        for source in self.sources:
+            try:
+                batch = source.read()
+            except Exception as e:
+                source.errors += 1
+                print(f"[WARNING] Alert source '{source.name}': {e}")
+                continue
+            self.index.add_batch(batch)
+            new_alerts.extend(batch)
+        return new_alerts
+
+    def alerts_between(self, start, end=None):
+        """Alerts dated from start (to end, if given)."""
+        return self.index.between(start, end)
+
+    def start(self):
+        self.poll()  # position every source on the current end of its file
+        self.thread = threading.Thread(target=self._loop, name="alert-collector", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+
+def start_alert_collector(config, lab, lab_folder):
+    """Start a collector for the 'alerts' section of lab_conf.yaml (None if no source works)."""
+    sources = build_alert_sources(config["sources"], lab, lab_folder)
+    if not sources:
+        return None
+    return AlertCollector(
+        sources,
+        poll_interval=config["poll_interval"],
+        window=config["window"],
+        settle=config["settle"],
+        max_alerts=config["max_alerts"],
+    ).start()
@@ -0,0 +1,229 @@
+import contextvars
+import itertools
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+IP_PATTERN = re.compile(r"\b(\d{1,3}(?:\.\d{1,3}){3})\b")
+MAX_RECORDS = 10000
+# Alert timestamps may be truncated to the second (syslog)
+CLOCK_SKEW = 1.0
+
+# Last command executed by the current thread, and the scopes (plan, step) it belongs to
+_last_record = contextvars.ContextVar("last_command_record", default=None)
+_scopes = contextvars.ContextVar("command_scopes", default=())
+
+
+class CommandScope:
+    """Commands executed while the scope is active (e.g. one plan step)."""
+
+    def __init__(self, label):
+        self.label = label
+        self.records = []
+
+
+class CommandJournal:
+    def __init__(self, max_records=MAX_RECORDS):
+        """
+        Give every executed command a correlation id and precise start/end
+        timestamps (epoch seconds), so IDS/SIEM alerts can be matched to it.
+        """
+        self.records = deque(maxlen=max_records)
+        self.ids = itertools.count(1)
+        self.session = format(int(time.time()), "x")
+        self.lock = threading.Lock()
+
+    def begin(self, machine, command):
+        with self.lock:
+            record = {
+                "id": f"{self.session}-{next(self.ids):05d}",
+                "machine": machine,
+                "command": command,
+                "started": time.time(),
+                "ended": None,
+                "exit_code": None,
+            }
+            self.records.append(record)
+        for scope in _scopes.get():
+            scope.records.append(record)
+        _last_record.set(record)
+        return record
+
+    @staticmethod
+    def end(record, code):
+        record["ended"] = time.time()
+        record["exit_code"] = code
+
+
+@contextmanager
+def command_scope(label):
+    """Collect the commands executed by the current thread (and its workers) in a CommandScope."""
+    scope = CommandScope(label)
+    token = _scopes.set(_scopes.get() + (scope,))
+    try:
+        yield scope
+    finally:
+        _scopes.reset(token)
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="microseconds") if timestamp else None
+
+
+def correlation_log_fields():
+    """Correlation id and timestamps of the last command executed by this thread, for the logs."""
+    record = _last_record.get()
+    if record is None:
+        return {}
+    return {"correlation_id": record["id"], "started_at": _iso(record["started"])}
+
+
+# ---------------------- MATCHING ----------------------
+def machine_addresses(devices, machine):
+    """IP addresses of a device from lab_conf.yaml."""
+    addresses = (devices.get(machine) or {}).get("addresses") or {}
+    return {str(addr).split("/")[0] for addr in addresses.values()}
+
+
+def signature_filter(detect):
+    """
+    Build a predicate from the optional 'detect' key of a plan step:
+    a regex on the alert signature, or a dict with 'signature', 'rule'
+    and/or 'source'.
+    """
+    if not detect:
+        return lambda alert: True
+    if isinstance(detect, str):
+        detect = {"signature": detect}
+    pattern = re.compile(str(detect["signature"]), re.IGNORECASE) if detect.get("signature") else None
+    rule, source = detect.get("rule"), detect.get("source")
+
+    def matches(alert):
+        if pattern and not pattern.search(alert["signature"] or ""):
+            return False
+        if rule is not None and str(alert["rule"]) != str(rule) and not str(alert["rule"]).endswith(f":{rule}"):
+            return False
+        return source is None or alert["source"] == source
+    return matches
+
+
+def match_alerts(records, alerts, devices, window, filters=None):
+    """
+    Attribute every alert to at most one command, among the commands whose
+    window [start, end + window] contains the alert and whose host (IP of
+    the machine or an IP in the command line) is the alert source or
+    destination. Preferred, in order: a command whose step expects this
+    signature ('detect'), a command naming an IP of the alert, the most
+    recent command.
+    Returns {record_id: [alerts]}.
+    """
+    filters = filters or {}
+    machine_hosts, command_hosts = {}, {}
+    for record in records:
+        machine_hosts[record["id"]] = machine_addresses(devices, record["machine"])
+        command_hosts[record["id"]] = set(IP_PATTERN.findall(record["command"]))
+
+    matched = {}
+    for alert in alerts:
+        alert_hosts = {alert.get("src"), alert.get("dst")} - {None}
+        best, best_score = None, None
+        for record in records:
+            end = (record["ended"] or record["started"]) + window
+            if not (record["started"] - CLOCK_SKEW <= alert["time"] <= end):
+                continue
+            names_target = bool(alert_hosts & command_hosts[record["id"]])
+            if not names_target and not (alert_hosts & machine_hosts[record["id"]]) \
+                    and alert.get("host") != record["machine"]:
+                continue
+            step_filter = filters.get(record["id"])
+            if step_filter is not None and not step_filter(alert):
+                continue
+            score = (step_filter is not None, names_target, record["started"])
+            if best_score is None or score > best_score:
+                best, best_score = record, score
+        if best is not None:
+            matched.setdefault(best["id"], []).append(alert)
+    return matched
+
+
+def latency_distribution(latencies):
+    """count, min, median, p95 and max of a list of latencies (seconds)."""
+    if not latencies:
+        return {"count": 0}
+    values = sorted(latencies)
+
+    def percentile(p):
+        return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+    return {
+        "count": len(values),
+        "min": round(values[0], 3),
+        "median": round(percentile(0.5), 3),
+        "p95": round(percentile(0.95), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def detection_summary(records, matched):
+    """
+    Detection log of a set of commands: per source, the distribution of the
+    time from command start to its first alert, and the signatures seen.
+    """
+    first = {}
+    signatures = {}
+    for record in records:
+        for alert in matched.get(record["id"], []):
+            latency = max(0.0, alert["time"] - record["started"])
+            key = (record["id"], alert["source"])
+            first[key] = min(first.get(key, latency), latency)
+            signatures.setdefault(alert["signature"], alert["source"])
+
+    sources = sorted({source for _, source in first})
+    return {
+        "commands": len(records),
+        "detected": len({record_id for record_id, _ in first}),
+        "alerts": sum(len(matched.get(r["id"], [])) for r in records),
+        "latency": {
+            source: latency_distribution([v for (_, s), v in first.items() if s == source]) for source in sources
+        },
+        "signatures": [f"[{source}] {signature}" for signature, source in list(signatures.items())[:20]],
+    }
+
+
+def attach_detection(collector, devices, plan_log, step_scopes, plan_steps=None):
+    """
+    Wait for late alerts, match them to the commands of each plan step and
+    add a 'detection' entry to every step log and a summary to the plan log.
+
+    Parameters:
+    - collector: running AlertCollector
+    - step_scopes: [(section, idx, CommandScope)] in execution order
+    - plan_steps: {(section, idx): step} used for the optional 'detect' key
+    """
+    records = [record for _, _, scope in step_scopes for record in scope.records]
+    if not records:
+        return
+    last_end = max(record["ended"] or record["started"] for record in records)
+    wait = last_end + collector.settle - time.time()
+    if wait > 0:
+        print(f"Waiting {wait:.0f}s for late alerts...")
+        time.sleep(wait)
+    collector.poll()
+
+    filters = {}
+    for section, idx, scope in step_scopes:
+        detect = (plan_steps or {}).get((section, idx), {}).get("detect")
+        if detect:
+            step_filter = signature_filter(detect)
+            filters.update({record["id"]: step_filter for record in scope.records})
+
+    start = min(record["started"] for record in records) - CLOCK_SKEW
+    matched = match_alerts(records, collector.alerts_between(start), devices, collector.window, filters)
+    for section, idx, scope in step_scopes:
+        step_log = plan_log[section]["steps"].get(idx)
+        if isinstance(step_log, dict) and scope.records:
+            step_log["detection"] = detection_summary(scope.records, matched)
+    plan_log["detection"] = detection_summary(records, matched)
@@ -0,0 +1,137 @@
+import re
+import threading
+import time
+from collections import deque
+
+DEFAULT_MAX_ALERTS = 10000
+INDEXED_FIELDS = ("rule", "src", "dst")
+
+
+def alert_filter(rule=None, src=None, dst=None, source=None, signature=None, since=None):
+    """
+    Normalize alert filters (from the 'alerts' command or an expect_alert
+    step). 'rule' matches '1:10000011' or just the SID '10000011',
+    'signature' is a case-insensitive regex.
+    """
+    return {
+        "rule": str(rule) if rule is not None else None,
+        "src": src,
+        "dst": dst,
+        "source": source,
+        "signature": re.compile(str(signature), re.IGNORECASE) if signature else None,
+        "since": since,
+    }
+
+
+def alert_matches(alert, filters):
+    rule = filters.get("rule")
+    if rule is not None and alert["rule"] != rule and not str(alert["rule"]).endswith(f":{rule}"):
+        return False
+    for field in ("src", "dst", "source"):
+        if filters.get(field) is not None and alert.get(field) != filters[field]:
+            return False
+    if filters.get("signature") is not None and not filters["signature"].search(alert["signature"] or ""):
+        return False
+    return filters.get("since") is None or alert["time"] >= filters["since"]
+
+
+class AlertIndex:
+    def __init__(self, max_alerts=DEFAULT_MAX_ALERTS):
+        """
+        Bounded in-memory store of the ingested alerts, indexed by rule,
+        source address and destination address. The oldest alerts are
+        dropped first; threads can wait for an alert matching a filter.
+        """
+        self.max_alerts = max_alerts
+        self.alerts = deque()
+        self.by_field = {field: {} for field in INDEXED_FIELDS}
+        self.seq = 0
+        self.total = 0
+        self.condition = threading.Condition()
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _index_key(self, field, alert):
+        value = alert.get(field)
+        if field == "rule" and value:
+            # '1:10000011' is also found by its SID
+            return str(value).split(":")[-1]
+        return value
+
+    def _evict(self):
+        alert = self.alerts.popleft()
+        for field in INDEXED_FIELDS:
+            key = self._index_key(field, alert)
+            bucket = self.by_field[field].get(key)
+            if bucket and bucket[0] is alert:
+                bucket.popleft()
+                if not bucket:
+                    del self.by_field[field][key]
+
+    def _candidates(self, filters):
+        """Smallest indexed bucket for the filters, or every alert."""
+        buckets = []
+        for field in INDEXED_FIELDS:
+            if filters.get(field) is not None:
+                key = str(filters[field]).split(":")[-1] if field == "rule" else filters[field]
+                buckets.append(self.by_field[field].get(key, ()))
+        return min(buckets, key=len) if buckets else self.alerts
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def add_batch(self, alerts):
+        """Store a batch of alerts and wake up the waiting threads."""
+        if not alerts:
+            return
+        with self.condition:
+            for alert in alerts:
+                self.seq += 1
+                alert["seq"] = self.seq
+                self.alerts.append(alert)
+                for field in INDEXED_FIELDS:
+                    key = self._index_key(field, alert)
+                    if key is not None:
+                        self.by_field[field].setdefault(key, deque()).append(alert)
+                if len(self.alerts) > self.max_alerts:
+                    self._evict()
+            self.total += len(alerts)
+            self.condition.notify_all()
+
+    def query(self, filters=None, limit=None):
+        """Alerts matching the filters (see alert_filter), oldest first; only the last `limit` ones."""
+        filters = filters or {}
+        with self.condition:
+            found = [a for a in self._candidates(filters) if alert_matches(a, filters)]
+        return found[-limit:] if limit else found
+
+    def between(self, start, end=None):
+        with self.condition:
+            return [a for a in self.alerts if a["time"] >= start and (end is None or a["time"] <= end)]
+
+    def wait_for(self, filters, timeout):
+        """
+        Block until an alert matching the filters is stored (or already is),
+        or the timeout expires. Returns the first matching alert or None.
+        """
+        deadline = time.time() + timeout
+        after_seq = 0
+        with self.condition:
+            while True:
+                for alert in self._candidates(filters):
+                    if alert["seq"] > after_seq and alert_matches(alert, filters):
+                        return alert
+                after_seq = self.seq
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def stats(self):
+        """Number of stored alerts per (source, rule, signature), most frequent first."""
+        counts = {}
+        with self.condition:
+            for alert in self.alerts:
+                key = (alert["source"], alert["rule"], alert["signature"])
+                counts[key] = counts.get(key, 0) + 1
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+    def __len__(self):
+        return len(self.alerts)
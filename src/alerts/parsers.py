@@ -0,0 +1,123 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+# Snort 3 alert_fast / alert_syslog body:
+#   [1:10000011:2] "msg" [**] [Classification: ...] [Priority: 1] {TCP} 192.168.0.10:41234 -> 192.168.2.10:80
+SNORT_TEXT_PATTERN = re.compile(
+    r"\[(?P<gid>\d+):(?P<sid>\d+):(?P<rev>\d+)\]\s+\"?(?P<msg>[^\"\[]*?)\"?\s*(\[\*\*\]\s*)?"
+    r"(\[Classification:\s*(?P<classification>[^\]]*)\]\s*)?(\[Priority:\s*(?P<priority>\d+)\]\s*)?"
+    r"\{(?P<proto>\w+)\}\s+(?P<src>\d+\.\d+\.\d+\.\d+)(:\d+)?\s+->\s+(?P<dst>\d+\.\d+\.\d+\.\d+)(:\d+)?"
+)
+SNORT_TIME_PATTERN = re.compile(r"^(\d{2}/\d{2}-\d{2}:\d{2}:\d{2}(\.\d+)?)")
+SYSLOG_TIME_PATTERN = re.compile(r"^([A-Z][a-z]{2}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})\s+(\S+)")
+ISO_TIME_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2}T\S+)\s+(\S+)")
+
+
+def _tz(utc_offset):
+    return timezone(timedelta(hours=utc_offset or 0))
+
+
+def parse_snort_time(value, utc_offset=0):
+    """Snort timestamps ('10/19-12:00:00.123456') have no year: the current one is used."""
+    now = datetime.now(_tz(utc_offset))
+    fmt = "%m/%d-%H:%M:%S.%f" if "." in value else "%m/%d-%H:%M:%S"
+    parsed = datetime.strptime(value, fmt).replace(year=now.year, tzinfo=_tz(utc_offset))
+    if parsed > now + timedelta(days=1):
+        parsed = parsed.replace(year=now.year - 1)
+    return parsed.timestamp()
+
+
+def parse_iso_time(value, utc_offset=0):
+    """ISO 8601 timestamps, with or without zone ('+0000', '+00:00', 'Z')."""
+    value = value.replace("Z", "+00:00")
+    value = re.sub(r"([+-]\d{2})(\d{2})$", r"\1:\2", value)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=_tz(utc_offset))
+    return parsed.timestamp()
+
+
+def _syslog_time(value, utc_offset=0):
+    now = datetime.now(_tz(utc_offset))
+    parsed = datetime.strptime(f"{now.year} {value}", "%Y %b %d %H:%M:%S").replace(tzinfo=_tz(utc_offset))
+    return parsed.timestamp()
+
+
+def make_alert(source, time, rule, signature, src=None, dst=None, host=None, raw=None, **extra):
+    """Normalized alert shared by every parser."""
+    return {"source": source, "time": time, "rule": rule, "signature": signature,
+            "src": src, "dst": dst, "host": host, **extra, "raw": raw}
+
+
+def parse_snort_text(line, source="snort", utc_offset=0):
+    """
+    Parse a Snort 3 alert_fast line or an alert_syslog line (as written by
+    syslog-ng), also when the message is an alert_json object (syslog
+    output with format = json). Returns None for lines that are not alerts.
+    """
+    match = SNORT_TEXT_PATTERN.search(line)
+    if not match:
+        if "{" in line:
+            return parse_snort_json(line[line.index("{"):], source, utc_offset)
+        return None
+    time, host = None, None
+    prefix = line[:match.start()]
+    if SNORT_TIME_PATTERN.match(prefix):
+        time = parse_snort_time(SNORT_TIME_PATTERN.match(prefix).group(1), utc_offset)
+    elif SYSLOG_TIME_PATTERN.match(prefix):
+        syslog = SYSLOG_TIME_PATTERN.match(prefix)
+        time, host = _syslog_time(syslog.group(1), utc_offset), syslog.group(2)
+    elif ISO_TIME_PATTERN.match(prefix):
+        iso = ISO_TIME_PATTERN.match(prefix)
+        time, host = parse_iso_time(iso.group(1), utc_offset), iso.group(2)
+    return make_alert(
+        source, time, f"{match.group('gid')}:{match.group('sid')}", match.group("msg").strip(),
+        src=match.group("src"), dst=match.group("dst"), host=host, raw=line,
+        classification=match.group("classification"), priority=match.group("priority")
+    )
+
+
+def parse_snort_json(line, source="snort", utc_offset=0):
+    """Parse a Snort 3 alert_json line (alert_json.txt)."""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "rule" not in data:
+        return None
+    gid, _, rest = str(data["rule"]).partition(":")
+    sid = rest.split(":")[0]
+    time = parse_snort_time(data["timestamp"], utc_offset) if data.get("timestamp") else None
+    return make_alert(
+        source, time, f"{gid}:{sid}" if sid else gid, data.get("msg", ""),
+        src=data.get("src_addr"), dst=data.get("dst_addr"), raw=line,
+        classification=data.get("class"), priority=data.get("priority")
+    )
+
+
+def parse_wazuh_json(line, source="wazuh", utc_offset=0):
+    """Parse a Wazuh manager alerts.json line."""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "rule" not in data:
+        return None
+    rule = data.get("rule") or {}
+    fields = data.get("data") or {}
+    time = parse_iso_time(data["timestamp"], utc_offset) if data.get("timestamp") else None
+    return make_alert(
+        source, time, str(rule.get("id", "")), rule.get("description", ""),
+        src=fields.get("srcip") or fields.get("src_addr"),
+        dst=fields.get("dstip") or fields.get("dst_addr"),
+        host=(data.get("agent") or {}).get("name"), raw=line,
+        level=rule.get("level"), groups=rule.get("groups")
+    )
+
+
+PARSERS = {
+    "snort": parse_snort_text,
+    "snort_json": parse_snort_json,
+    "wazuh_json": parse_wazuh_json,
+}
@@ -0,0 +1,149 @@
+import os
+import time
+
+from src.alerts.parsers import PARSERS
+from src.backend.manager import get_manager
+
+MAX_READ_BYTES = 4 * 1024 * 1024
+
+
+class AlertSource:
+    def __init__(self, name, path, format, utc_offset=0, from_start=False):
+        """
+        An alert file read incrementally: every read returns the alerts
+        appended since the previous one (an incomplete last line is kept
+        for the next read). A file getting smaller is read from the start.
+
+        Parameters:
+        - name: source name reported in the alerts (e.g. 'snort', 'wazuh')
+        - path: alert file
+        - format: parser name, see src/alerts/parsers.py
+        - utc_offset: hours added to timestamps without a zone
+        - from_start: also return the alerts already in the file
+        """
+        if format not in PARSERS:
+            raise ValueError(f"Unknown alert format '{format}' for source '{name}' ({', '.join(PARSERS)})")
+        self.name = name
+        self.path = path
+        self.format = format
+        self.parser = PARSERS[format]
+        self.utc_offset = utc_offset
+        self.offset = None if not from_start else 0
+        self.partial = b""
+        self.errors = 0
+        self.count = 0
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _read_from(self, offset):
+        """
+        Return (file_size, bytes from offset), only the size if offset is None
+        and (None, b"") if the file cannot be read. Implemented by subclasses.
+        """
+        raise NotImplementedError
+
+    def _parse(self, data):
+        data = self.partial + data
+        lines = data.split(b"\n")
+        self.partial = lines.pop()
+        alerts = []
+        received = time.time()
+        for line in lines:
+            text = line.decode("utf-8", errors="replace").strip()
+            if not text:
+                continue
+            try:
+                alert = self.parser(text, source=self.name, utc_offset=self.utc_offset)
+            except ValueError:
+                self.errors += 1
+                continue
+            if alert is not None:
+                # Alerts without a parsable timestamp are dated when received
+                if alert["time"] is None:
+                    alert["time"] = received
+                alerts.append(alert)
+        self.count += len(alerts)
+        return alerts
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def read(self):
+        """Return the alerts appended since the last read."""
+        size, data = self._read_from(self.offset)
+        if size is None:
+            return []
+        if self.offset is None:
+            # First read: skip what is already in the file
+            self.offset = size
+            return []
+        if size < self.offset:
+            self.offset, self.partial = 0, b""
+            size, data = self._read_from(0)
+        self.offset += len(data)
+        return self._parse(data)
+
+
+class FileSource(AlertSource):
+    """Alert file on the host (also used as a stand-in for the lab sources in tests)."""
+
+    def _read_from(self, offset):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None, b""
+        if offset is None:
+            return size, b""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return size, f.read(MAX_READ_BYTES)
+
+
+class MachineFileSource(AlertSource):
+    def __init__(self, name, machine, path, format, lab, **kwargs):
+        """Alert file inside a lab machine, read with tail from the last offset."""
+        super().__init__(name, path, format, **kwargs)
+        self.machine = machine
+        self.lab = lab
+
+    def _read_from(self, offset):
+        command = f"f='{self.path}'; [ -f \"$f\" ] || exit 3; wc -c < \"$f\""
+        if offset is not None:
+            command += f"; tail -c +{offset + 1} \"$f\" | head -c {MAX_READ_BYTES}"
+        try:
+            stdout, _, code = get_manager().exec(
+                machine_name=self.machine, command=["sh", "-c", command], lab=self.lab, stream=False
+            )
+        except Exception:
+            self.errors += 1
+            return None, b""
+        if code != 0 or not stdout:
+            return None, b""
+        size, _, data = stdout.partition(b"\n")
+        try:
+            return int(size.strip()), data
+        except ValueError:
+            return None, b""
+
+
+def build_alert_sources(sources, lab, lab_folder):
+    """
+    Create the sources of the 'alerts' section of lab_conf.yaml:
+    'machine' + 'path' for a file in a lab machine, 'file' for a host file
+    (relative to the lab folder).
+    """
+    built = []
+    for name, cfg in (sources or {}).items():
+        options = {"utc_offset": cfg.get("utc_offset", 0), "from_start": cfg.get("from_start", False)}
+        try:
+            if cfg.get("file"):
+                path = os.path.join(lab_folder, cfg["file"])
+                built.append(FileSource(name, path, cfg.get("format", "snort"), **options))
+            elif cfg.get("machine") and cfg.get("path"):
+                if cfg["machine"] not in lab.machines:
+                    print(f"[WARNING] Alert source '{name}': machine '{cfg['machine']}' not in the lab, ignored.")
+                    continue
+                built.append(MachineFileSource(name, cfg["machine"], cfg["path"], cfg.get("format", "snort"),
+                                               lab, **options))
+            else:
+                print(f"[WARNING] Alert source '{name}' needs 'machine' and 'path', or 'file'. Ignored.")
+        except ValueError as e:
+            print(f"[WARNING] {e}")
+    return built
@@ -0,0 +1,157 @@
+import contextvars
+import itertools
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from src.command_system.utils import CommandFailure
+
+MAX_JOB_OUTPUT = 1 << 20
+MAX_JOBS_KEPT = 200
+
+# Job receiving the output printed by the current thread (None: the console)
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class StdoutRouter:
+    """
+    sys.stdout replacement sending what a remote job prints to that job,
+    and everything else to the console. fileno() is forwarded so that
+    input() keeps using readline for the local prompt.
+    """
+
+    def __init__(self, console):
+        self.console = console
+
+    def write(self, text):
+        job = _current_job.get()
+        if job is None:
+            return self.console.write(text)
+        job.append_output(text)
+        return len(text)
+
+    def flush(self):
+        if _current_job.get() is None:
+            self.console.flush()
+
+    def fileno(self):
+        return self.console.fileno()
+
+    def isatty(self):
+        return self.console.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.console, name)
+
+
+def install_stdout_router():
+    """Route sys.stdout through a StdoutRouter (idempotent)."""
+    if not isinstance(sys.stdout, StdoutRouter):
+        sys.stdout = StdoutRouter(sys.stdout)
+    return sys.stdout
+
+
+class Job:
+    def __init__(self, job_id, command, args, machines):
+        """
+        A command submitted through the remote API.
+        Output is kept up to MAX_JOB_OUTPUT characters (oldest dropped);
+        offsets stay absolute so that streaming clients never miss or repeat text.
+        """
+        self.id = job_id
+        self.command = command
+        self.args = args
+        self.machines = machines
+        self.status = "queued"
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.output = ""
+        self.output_start = 0
+        self.finished = threading.Event()
+        self.lock = threading.Lock()
+
+    # ---------------------- OUTPUT ----------------------
+    def append_output(self, text):
+        with self.lock:
+            self.output += text
+            overflow = len(self.output) - MAX_JOB_OUTPUT
+            if overflow > 0:
+                self.output = self.output[overflow:]
+                self.output_start += overflow
+
+    def read_output(self, offset=0):
+        """
+        Return (text, next_offset) printed from the absolute offset on.
+        Text dropped from the buffer is skipped.
+        """
+        with self.lock:
+            start = max(offset, self.output_start)
+            text = self.output[start - self.output_start:]
+            return text, self.output_start + len(self.output)
+
+    # ---------------------- EXECUTION ----------------------
+    def run(self, cmd_manager):
+        """Run the command in the current thread, capturing its output."""
+        token = _current_job.set(self)
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            result = cmd_manager.run_command(self.command, list(self.args))
+            if isinstance(result, CommandFailure):
+                # the command printed its error and returned (see handle_errors)
+                self.status = "failed"
+                self.error = str(result)
+            else:
+                self.status = "done"
+        except BaseException as e:
+            self.status = "failed"
+            self.error = str(e) or type(e).__name__
+        finally:
+            self.finished_at = time.time()
+            _current_job.reset(token)
+            self.finished.set()
+
+    def to_dict(self, with_output=False):
+        data = {
+            "job_id": self.id,
+            "command": self.command,
+            "args": self.args,
+            "machines": self.machines,
+            "status": self.status,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if with_output:
+            data["output"], _ = self.read_output()
+        return data
+
+
+class JobStore:
+    def __init__(self, max_jobs=MAX_JOBS_KEPT):
+        """Registry of API jobs; the oldest finished jobs are forgotten."""
+        self.jobs = OrderedDict()
+        self.max_jobs = max_jobs
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def create(self, command, args, machines):
+        with self.lock:
+            job = Job(str(next(self.ids)), command, args, machines)
+            self.jobs[job.id] = job
+            finished = [job_id for job_id, j in self.jobs.items() if j.finished.is_set()]
+            for job_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+                del self.jobs[job_id]
+            return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
@@ -0,0 +1,276 @@
+import asyncio
+import hmac
+import ipaddress
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from src.api.jobs import JobStore, install_stdout_router
+from src.backend.manager import get_manager
+
+# Commands that cannot be driven remotely (they need the local terminal or stop the lab)
+LOCAL_ONLY_COMMANDS = {"exit", "terminal"}
+DEFAULT_JOB_WORKERS = 8
+MAX_BODY_BYTES = 1 << 20
+STREAM_POLL_INTERVAL = 0.1
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized",
+           404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+def is_loopback_host(host):
+    """True if the API address is only reachable from this machine."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ApiServer:
+    def __init__(self, cmd_manager, host="127.0.0.1", port=8080, token=None, max_workers=DEFAULT_JOB_WORKERS):
+        """
+        HTTP/JSON server exposing the lab commands to remote clients.
+
+        Parameters:
+        - cmd_manager: the CommandManager of the running lab
+        - host, port: listening address
+        - token: if set, requests must send 'Authorization: Bearer <token>'
+        - max_workers: jobs running at the same time
+
+        Endpoints:
+          GET  /health              lab name and server status
+          GET  /commands            commands accepted by POST /jobs
+          GET  /machines            lab machines and whether they are running
+          POST /jobs                {"command": "action", "args": [...], "wait": false}
+          GET  /jobs                submitted jobs
+          GET  /jobs/<id>           job status and output
+          GET  /jobs/<id>/stream    output as newline-delimited JSON events, until the job ends
+
+        Jobs run concurrently; CommandManager serializes the ones touching
+        the same machines.
+        """
+        if not token and not is_loopback_host(host):
+            # the API runs shell commands in every container: never expose it unauthenticated
+            raise ValueError(f"The remote control API on {host} requires a token (--api-token)")
+        self.cmd_manager = cmd_manager
+        self.host = host
+        self.port = port
+        self.token = token
+        self.jobs = JobStore()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-job")
+        self.loop = None
+        self.server = None
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _commands(self):
+        return [name for name in self.cmd_manager.cmd_commands if name not in LOCAL_ONLY_COMMANDS]
+
+    def _authorized(self, headers):
+        if not self.token:
+            return True
+        expected = f"Bearer {self.token}"
+        return hmac.compare_digest(headers.get("authorization", ""), expected)
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise ApiError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    async def _send_json(writer, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _stream_job(self, writer, job):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+
+        async def send(event):
+            data = (json.dumps(event, default=str) + "\n").encode()
+            writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+
+        offset = 0
+        await send({"type": "job", **job.to_dict()})
+        while True:
+            finished = job.finished.is_set()
+            text, offset = job.read_output(offset)
+            if text:
+                await send({"type": "output", "data": text})
+            if finished:
+                break
+            await asyncio.sleep(STREAM_POLL_INTERVAL)
+        await send({"type": "end", "status": job.status, "error": job.error})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _submit(self, payload):
+        if not isinstance(payload, dict):
+            raise ApiError(400, "Body must be a JSON object")
+        command = str(payload.get("command", "")).lower()
+        args = payload.get("args", [])
+        if isinstance(args, str):
+            args = args.split()
+        if command not in self._commands():
+            raise ApiError(400, f"Unknown or local-only command: {command}")
+        if not isinstance(args, list) or not all(isinstance(a, (str, int, float)) for a in args):
+            raise ApiError(400, "'args' must be a list of strings")
+        args = [str(a) for a in args]
+
+        job = self.jobs.create(command, args, self.cmd_manager.command_machines(command, args))
+        self.loop.run_in_executor(self.executor, job.run, self.cmd_manager)
+        return job
+
+    def _machines(self):
+        machines = []
+        for name in self.cmd_manager.lab.machines.keys():
+            try:
+                running = next(get_manager().get_machine_stats(name, lab=self.cmd_manager.lab), None) is not None
+            except Exception:
+                running = False
+            machines.append({"name": name, "running": running,
+                             "type": self.cmd_manager.devices.get(name, {}).get("type")})
+        return machines
+
+    async def _route(self, writer, method, target, body):
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+
+        if parts == ["health"] and method == "GET":
+            return await self._send_json(writer, 200, {"status": "ok", "lab": self.cmd_manager.lab_name})
+        if parts == ["commands"] and method == "GET":
+            return await self._send_json(writer, 200, {"commands": self._commands()})
+        if parts == ["machines"] and method == "GET":
+            machines = await self.loop.run_in_executor(self.executor, self._machines)
+            return await self._send_json(writer, 200, {"machines": machines})
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                return await self._send_json(writer, 200, {"jobs": [j.to_dict() for j in self.jobs.list()]})
+            if method != "POST":
+                raise ApiError(405, "Use GET or POST")
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise ApiError(400, "Invalid JSON body")
+            job = self._submit(payload)
+            wait = payload.get("wait") if isinstance(payload, dict) else False
+            if wait or query.get("wait", ["0"])[0] not in ("0", "false"):
+                await self.loop.run_in_executor(None, job.finished.wait)
+                return await self._send_json(writer, 200, job.to_dict(with_output=True))
+            return await self._send_json(writer, 202, job.to_dict())
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise ApiError(404, f"No such job: {parts[1]}")
+            if method != "GET":
+                raise ApiError(405, "Use GET")
+            if len(parts) == 2:
+                return await self._send_json(writer, 200, job.to_dict(with_output=True))
+            if parts[2] == "stream":
+                return await self._stream_job(writer, job)
+
+        raise ApiError(404, f"No such endpoint: {url.path}")
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, target, headers, body = request
+            if not self._authorized(headers):
+                raise ApiError(401, "Missing or invalid token")
+            await self._route(writer, method, target, body)
+        except ApiError as e:
+            await self._send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            try:
+                await self._send_json(writer, 400, {"error": str(e)})
+            except Exception:
+                pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _serve(self, ready):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        ready.set()
+        async with self.server:
+            await self.server.serve_forever()
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def start(self):
+        """
+        Start the server on its own event loop in a daemon thread.
+        Output printed by remote jobs is routed to the jobs, not the console.
+        """
+        install_stdout_router()
+        ready = threading.Event()
+        errors = []
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.loop.run_until_complete(self._serve(ready))
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+
+        threading.Thread(target=run, name="api-server", daemon=True).start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+
+def start_api_server(cmd_manager, port, host="127.0.0.1", token=None):
+    """Start the remote control API for a running lab."""
+    return ApiServer(cmd_manager, host=host, port=port, token=token).start()
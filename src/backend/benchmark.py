@@ -0,0 +1,108 @@
+"""
+Throughput benchmark of the action and plan engines on the in-memory backend.
+
+Usage:
+    python -m src.backend.benchmark [--machines N] [--commands N] [--runs N]
+                                    [--latency SECONDS] [--workers N]
+"""
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.backend.fake_manager import FakeLab, FakeManager
+from src.backend.manager import set_manager
+
+
+def build_session(machines, commands, latency):
+    """
+    Create a fake lab, a FakeManager and a CommandManager with one synthetic
+    action ('bench') of `commands` echo commands and one plan using it.
+    """
+    from src.command_system.cmd_manager import CommandManager
+
+    lab = FakeLab("bench", [f"m{i}" for i in range(machines)])
+    manager = FakeManager(latency=latency)
+    set_manager(manager)
+    manager.deploy_lab(lab)
+
+    actions = {
+        "bench": {
+            "parameters": {},
+            "commands": [(f"echo 'ok {i}'", f"ok {i}", {}) for i in range(commands)],
+        }
+    }
+    plans = {
+        "bench_plan": {
+            "plan_timeout": None,
+            "parameters": {},
+            "need": [{"type": "command", "command": "echo 'ready'", "machine": "m0",
+                      "timeout": None, "expected": "ready", "parameters": {}}],
+            "actions": [{"type": "action", "name": "bench", "machine": name,
+                         "timeout": None, "expected": "Success", "parameters": {}}
+                        for name in lab.machines],
+        }
+    }
+    cmd_manager = CommandManager(
+        lab=lab,
+        lab_name=lab.name,
+        devices={name: {"image": "kathara/base", "type": None} for name in lab.machines},
+        actions=actions,
+        plans=plans,
+        processes={},
+        action_logger=None,
+        plan_logger=None,
+        spawn_terminals=False
+    )
+    return cmd_manager, manager
+
+
+def bench_actions(cmd_manager, runs, workers):
+    from src.command_system.commands.action import run_action
+
+    machines = list(cmd_manager.lab.machines.keys())
+    jobs = [machines[i % len(machines)] for i in range(runs)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda m: run_action(cmd_manager, m, "bench")[0], jobs))
+    return results
+
+
+def bench_plans(cmd_manager, runs, workers):
+    from src.command_system.commands.plan import run_plan
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda _: run_plan(cmd_manager, "bench_plan")[0], range(runs)))
+    return results
+
+
+def report(label, manager, results, elapsed, start_count):
+    execs = manager.exec_count - start_count
+    failed = sum(1 for r in results if r != "Success")
+    print(f"{label:<8} runs: {len(results):>6}  failed: {failed:>4}  "
+          f"commands: {execs:>8}  time: {elapsed:8.3f}s  "
+          f"throughput: {execs / elapsed if elapsed else 0:10.1f} cmd/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark action/plan engines on the fake backend.")
+    parser.add_argument("--machines", type=int, default=10, help="Number of fake machines")
+    parser.add_argument("--commands", type=int, default=10, help="Commands per action")
+    parser.add_argument("--runs", type=int, default=200, help="Action/plan runs per benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected latency per exec (seconds)")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent runs")
+    args = parser.parse_args()
+
+    cmd_manager, manager = build_session(args.machines, args.commands, args.latency)
+
+    for label, bench in (("actions", bench_actions), ("plans", bench_plans)):
+        start_count = manager.exec_count
+        start = time.perf_counter()
+        # The engines print every command, keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = bench(cmd_manager, args.runs, args.workers)
+        report(label, manager, results, time.perf_counter() - start, start_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from src.backend.manager import ManagerInterface, ExecStream
+
+
+class MachineNotRunningError(Exception):
+    pass
+
+
+class ImageNotFoundError(Exception):
+    pass
+
+
+class FakeMachine:
+    """Minimal stand-in for Kathara.model.Machine."""
+
+    def __init__(self, name, image="kathara/base", meta=None):
+        self.name = name
+        self.meta = {"image": image, **(meta or {})}
+
+    def add_meta(self, name, value):
+        self.meta[name] = value
+
+
+class FakeFS:
+    """In-memory lab filesystem exposing the few calls used on Lab.fs."""
+
+    def __init__(self):
+        self.files = {}
+
+    def exists(self, path):
+        return path.lstrip("/") in self.files
+
+    def readtext(self, path):
+        return self.files[path.lstrip("/")]
+
+    def writetext(self, path, content):
+        self.files[path.lstrip("/")] = content
+
+
+class FakeLab:
+    """
+    Minimal stand-in for Kathara.model.Lab, enough for CommandManager and the
+    action/plan engines. Machines can be given as names or as {name: image}.
+    """
+
+    def __init__(self, name, machines=None):
+        self.name = name
+        self.machines = {}
+        self.fs = FakeFS()
+        if isinstance(machines, dict):
+            for machine_name, image in machines.items():
+                self.new_machine(machine_name, image=image)
+        else:
+            for machine_name in machines or []:
+                self.new_machine(machine_name)
+
+    def new_machine(self, name, **kwargs):
+        machine = FakeMachine(name, image=kwargs.get("image", "kathara/base"))
+        self.machines[name] = machine
+        return machine
+
+    def get_machine(self, name):
+        return self.machines[name]
+
+    def create_file_from_list(self, lines, dst_path):
+        self.fs.writetext(dst_path, "\n".join(lines) + "\n")
+
+
+class FakeMachineStats:
+    """Stats snapshot with the same fields printed by Kathara machine stats."""
+
+    def __init__(self, name, lab_name, image, started_at):
+        self.name = name
+        self.lab_name = lab_name
+        self.image = image
+        self.status = "running"
+        self.started_at = started_at
+        self.cpu_usage = "0.00 %"
+        self.mem_usage = "0.0 MB / 0.0 MB"
+        self.mem_percent = "0.00 %"
+        self.net_usage = "0 B / 0 B"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "lab_name": self.lab_name,
+            "image": self.image,
+            "status": self.status,
+            "cpu_usage": self.cpu_usage,
+            "mem_usage": self.mem_usage,
+            "mem_percent": self.mem_percent,
+            "net_usage": self.net_usage,
+        }
+
+    def __str__(self):
+        return " | ".join(f"{k}: {v}" for k, v in self.to_dict().items())
+
+
+class FakeImages:
+    def __init__(self, manager):
+        self.manager = manager
+
+    def get(self, tag):
+        if tag not in self.manager.images:
+            raise ImageNotFoundError(f"Image {tag} not found")
+        return FakeImage(self.manager, tag)
+
+
+class FakeImage:
+    def __init__(self, manager, tag):
+        self.manager = manager
+        self.id = manager.get_local_image_id(tag)
+        self.tags = [tag]
+
+    def tag(self, repository, tag=None):
+        name = f"{repository}:{tag or 'latest'}"
+        with self.manager.lock:
+            self.manager.images[name] = self.manager.images[self.tags[0]]
+        self.tags.append(name)
+        return True
+
+
+class FakeClient:
+    def __init__(self, manager):
+        self.images = FakeImages(manager)
+
+
+class FakeContainer:
+    """Docker-like API object returned by FakeManager.get_machine_api_object."""
+
+    def __init__(self, manager, lab_name, machine_name):
+        self.manager = manager
+        self.lab_name = lab_name
+        self.name = machine_name
+        self.client = FakeClient(manager)
+
+    def restart(self, timeout=10):
+        with self.manager.lock:
+            self.manager.deployed[self.lab_name][self.name]["started_at"] = time.time()
+
+    def remove(self, force=False):
+        with self.manager.lock:
+            machines = self.manager.deployed.get(self.lab_name, {})
+            machines.pop(self.name, None)
+            if not machines:
+                self.manager.deployed.pop(self.lab_name, None)
+
+    def commit(self, repository=None, tag=None):
+        image = f"{repository}:{tag}"
+        with self.manager.lock:
+            self.manager.images[image] = time.time()
+        return FakeImage(self.manager, image)
+
+    @property
+    def attrs(self):
+        started_at = self.manager._started_at(self.lab_name, self.name)
+        return {
+            "Name": f"/{self.name}",
+            "State": {
+                "Running": started_at is not None,
+                "StartedAt": datetime.fromtimestamp(started_at, timezone.utc).isoformat() if started_at else None,
+            },
+        }
+
+
+class FakeResponse:
+    """A scripted exec response matched by machine and command pattern."""
+
+    def __init__(self, pattern, stdout=b"", stderr=b"", code=0, machine=None, latency=None, regex=False):
+        self.pattern = re.compile(pattern) if regex else pattern
+        self.regex = regex
+        self.stdout = stdout
+        self.stderr = stderr
+        self.code = code
+        self.machine = machine
+        self.latency = latency
+
+    def matches(self, machine_name, command):
+        if self.machine is not None and self.machine != machine_name:
+            return False
+        if self.regex:
+            return self.pattern.search(command) is not None
+        return self.pattern in command
+
+    def render(self, machine_name, command):
+        if callable(self.stdout):
+            return self.stdout(machine_name, command)
+        return self.stdout, self.stderr, self.code
+
+
+class FakeManager(ManagerInterface):
+    """
+    In-process Kathara backend: simulates machines, deploy/undeploy, stats and
+    exec with scripted or latency-injected responses. No Docker required.
+
+    Parameters:
+    - responses: list of FakeResponse (or kwargs dicts) checked in order
+    - latency: seconds added to each exec, or (min, max) for a uniform range
+    - default_response: (stdout, stderr, code) used when nothing matches;
+      None echoes the command like 'sh -c "echo ..."' would
+    - available_images: if set, check_image fails for any other image
+    - pull_latency: seconds spent by check_image
+    - undeploy_latency: seconds spent by undeploy_lab per call, or {machine: seconds}
+    """
+
+    supports_terminals = False
+
+    def __init__(self, responses=None, latency=0.0, default_response=None,
+                 available_images=None, pull_latency=0.0, undeploy_latency=0.0):
+        self.responses = []
+        for response in responses or []:
+            if isinstance(response, dict):
+                self.add_response(**response)
+            else:
+                self.responses.append(response)
+        self.latency = latency
+        self.default_response = default_response
+        self.available_images = set(available_images) if available_images is not None else None
+        self.pull_latency = pull_latency
+        self.undeploy_latency = undeploy_latency
+        self.deployed = {}
+        self.images = {}
+        self.exec_count = 0
+        self.lock = threading.Lock()
+
+    # ---------------------- SCRIPTING ----------------------
+    def add_response(self, pattern, stdout=b"", stderr=b"", code=0, machine=None, latency=None, regex=False):
+        """
+        Register a scripted response. stdout may also be a callable
+        (machine_name, command) -> (stdout, stderr, code).
+        """
+        if isinstance(stdout, str):
+            stdout = stdout.encode()
+        if isinstance(stderr, str):
+            stderr = stderr.encode()
+        response = FakeResponse(pattern, stdout, stderr, code, machine, latency, regex)
+        self.responses.append(response)
+        return response
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    @staticmethod
+    def _lab_name(lab_name=None, lab=None):
+        if lab is not None:
+            return lab.name
+        return lab_name
+
+    def _started_at(self, lab_name, machine_name):
+        return self.deployed.get(lab_name, {}).get(machine_name, {}).get("started_at")
+
+    @staticmethod
+    def _render_command(command):
+        if isinstance(command, (list, tuple)):
+            if len(command) >= 3 and command[1] == "-c":
+                return command[2]
+            return " ".join(command)
+        return command
+
+    def _sleep(self, latency):
+        if isinstance(latency, (list, tuple)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    # ---------------------- MANAGER API ----------------------
+    def deploy_lab(self, lab, selected_machines=None, excluded_machines=None):
+        names = set(lab.machines.keys())
+        if selected_machines:
+            names &= set(selected_machines)
+        if excluded_machines:
+            names -= set(excluded_machines)
+        with self.lock:
+            machines = self.deployed.setdefault(lab.name, {})
+            for name in names:
+                if name not in machines:
+                    image = lab.machines[name].meta.get("image") if hasattr(lab.machines[name], "meta") else None
+                    machines[name] = {"image": image, "started_at": time.time()}
+
+    def undeploy_lab(self, lab_hash=None, lab_name=None, lab=None, selected_machines=None, excluded_machines=None):
+        name = self._lab_name(lab_name, lab)
+        if isinstance(self.undeploy_latency, dict):
+            self._sleep(max([self.undeploy_latency.get(m, 0.0) for m in selected_machines or []] or [0.0]))
+        else:
+            self._sleep(self.undeploy_latency)
+        with self.lock:
+            machines = self.deployed.get(name, {})
+            names = set(machines.keys())
+            if selected_machines:
+                names &= set(selected_machines)
+            if excluded_machines:
+                names -= set(excluded_machines)
+            for machine_name in names:
+                machines.pop(machine_name, None)
+            if not machines:
+                self.deployed.pop(name, None)
+
+    def exec(self, machine_name, command, lab_hash=None, lab_name=None, lab=None, wait=False, stream=True):
+        name = self._lab_name(lab_name, lab)
+        if self._started_at(name, machine_name) is None:
+            raise MachineNotRunningError(f"Machine {machine_name} is not running in lab {name}")
+
+        rendered = self._render_command(command)
+        response = next((r for r in self.responses if r.matches(machine_name, rendered)), None)
+        self._sleep(response.latency if response and response.latency is not None else self.latency)
+
+        if response is not None:
+            stdout, stderr, code = response.render(machine_name, rendered)
+        elif self.default_response is not None:
+            stdout, stderr, code = self.default_response
+        else:
+            echoed = re.fullmatch(r"echo\s+['\"]?(.*?)['\"]?", rendered.strip())
+            stdout, stderr, code = ((echoed.group(1) + "\n").encode() if echoed else b""), b"", 0
+
+        with self.lock:
+            self.exec_count += 1
+
+        if stream:
+            return ExecStream([(stdout, stderr)], code)
+        return stdout, stderr, code
+
+    def get_machine_stats(self, machine_name, lab_hash=None, lab_name=None, lab=None):
+        name = self._lab_name(lab_name, lab)
+        info = self.deployed.get(name, {}).get(machine_name)
+        if info is not None:
+            yield FakeMachineStats(machine_name, name, info["image"], info["started_at"])
+
+    def get_machines_stats(self, lab_hash=None, lab_name=None, lab=None, machine_name=None):
+        name = self._lab_name(lab_name, lab)
+        machines = dict(self.deployed.get(name, {}))
+        yield {machine: FakeMachineStats(machine, name, info["image"], info["started_at"])
+               for machine, info in machines.items()
+               if machine_name is None or machine == machine_name}
+
+    def get_links_stats(self, lab_hash=None, lab_name=None, lab=None, link_name=None):
+        yield {}
+
+    def check_image(self, image_name):
+        self._sleep(self.pull_latency)
+        if self.available_images is not None and image_name not in self.available_images:
+            raise ImageNotFoundError(f"Image {image_name} not found")
+        with self.lock:
+            self.images[image_name] = time.time()
+
+    def get_local_image_id(self, image_name):
+        created = self.images.get(image_name)
+        if created is None:
+            return None
+        return "sha256:" + hashlib.sha256(repr(created).encode()).hexdigest()
+
+    def get_machine_api_object(self, machine_name, lab_hash=None, lab_name=None, lab=None):
+        name = self._lab_name(lab_name, lab)
+        if self._started_at(name, machine_name) is None:
+            raise MachineNotRunningError(f"Machine {machine_name} is not running in lab {name}")
+        return FakeContainer(self, name, machine_name)
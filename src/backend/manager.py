@@ -0,0 +1,146 @@
+from abc import ABC, abstractmethod
+
+BACKENDS = ("kathara", "fake")
+
+_manager = None
+
+
+class ManagerInterface(ABC):
+    """
+    Subset of the Kathara manager API used by KathaRange.
+
+    The Kathara singleton implements these methods natively; alternative
+    backends (e.g. FakeManager) subclass this interface so that the command
+    system, the OSPF check and start_lab.py can run against them unchanged.
+    """
+
+    @abstractmethod
+    def deploy_lab(self, lab, selected_machines=None, excluded_machines=None):
+        """Deploy all (or the selected) machines of a lab."""
+
+    @abstractmethod
+    def undeploy_lab(self, lab_hash=None, lab_name=None, lab=None, selected_machines=None, excluded_machines=None):
+        """Undeploy all (or the selected) machines of a lab."""
+
+    @abstractmethod
+    def exec(self, machine_name, command, lab_hash=None, lab_name=None, lab=None, wait=False, stream=True):
+        """
+        Execute a command on a machine.
+        Returns (stdout, stderr, exit_code) when stream is False,
+        otherwise an iterator of (stdout, stderr) chunks whose exit_code()
+        is known once it is consumed (see ExecStream).
+        """
+
+    @abstractmethod
+    def get_machine_stats(self, machine_name, lab_hash=None, lab_name=None, lab=None):
+        """Return a generator yielding the stats of a running machine (nothing if stopped)."""
+
+    @abstractmethod
+    def check_image(self, image_name):
+        """Ensure the image is available, pulling it if needed."""
+
+    @abstractmethod
+    def get_machine_api_object(self, machine_name, lab_hash=None, lab_name=None, lab=None):
+        """Return the backend object (e.g. Docker container) of a machine."""
+
+    def connect_tty(self, machine_name, lab_hash=None, lab_name=None, lab=None, shell=None, logs=False):
+        """Attach the current terminal to the machine TTY."""
+        raise NotImplementedError("This backend does not support interactive terminals")
+
+
+class ExecStream:
+    """
+    Streamed output of a command, as returned by the Kathara exec streams:
+    iterating yields (stdout, stderr) chunks, exit_code() returns the exit
+    code of the command once the chunks are consumed.
+
+    Parameters:
+    - chunks: iterable of (stdout, stderr)
+    - exit_code: the exit code, or a function returning it
+    """
+
+    def __init__(self, chunks, exit_code=0):
+        self.chunks = iter(chunks)
+        self._exit_code = exit_code
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def exit_code(self):
+        return self._exit_code() if callable(self._exit_code) else self._exit_code
+
+
+def get_manager():
+    """
+    Return the active lab manager.
+    Defaults to the Kathara singleton, imported lazily so that alternative
+    backends do not require Docker.
+    """
+    global _manager
+    if _manager is None:
+        from Kathara.manager.Kathara import Kathara
+        _manager = Kathara.get_instance()
+    return _manager
+
+
+def set_manager(manager):
+    """
+    Replace the active lab manager (None restores the Kathara default).
+    """
+    global _manager
+    _manager = manager
+
+
+def create_manager(backend, **kwargs):
+    """
+    Build a manager for the given backend name and make it the active one.
+    """
+    if backend == "kathara":
+        set_manager(None)
+        return get_manager()
+    if backend == "fake":
+        from src.backend.fake_manager import FakeManager
+        manager = FakeManager(**kwargs)
+        set_manager(manager)
+        return manager
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def get_machine_started_at(machine_name, lab, manager=None):
+    """
+    Return the start time of the machine container (as reported by the backend),
+    or None if the machine is not running or the backend does not expose it.
+    Changes whenever the machine is restarted or redeployed.
+    """
+    manager = manager or get_manager()
+    try:
+        api_object = manager.get_machine_api_object(machine_name, lab=lab)
+        return api_object.attrs["State"]["StartedAt"]
+    except Exception:
+        return None
+
+
+def get_local_image_id(image, manager=None):
+    """
+    Return the id of an image available on the local Docker daemon, or None
+    if it is missing. Never pulls.
+    """
+    manager = manager or get_manager()
+    if hasattr(manager, "get_local_image_id"):
+        return manager.get_local_image_id(image)
+    try:
+        import docker
+        return docker.from_env().images.get(image).id
+    except Exception:
+        return None
+
+
+def supports_terminals(manager=None):
+    """
+    True if the manager can attach device terminals (xterm + connect_tty).
+    """
+    manager = manager or get_manager()
+    return getattr(manager, "supports_terminals", True)
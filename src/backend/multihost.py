@@ -0,0 +1,176 @@
+import os
+import threading
+
+from src.backend.manager import ManagerInterface, get_local_image_id
+from src.command_system.fanout import run_concurrently
+
+# Kathara reads the Docker endpoint from the environment when a manager is built
+_env_lock = threading.Lock()
+
+
+def _docker_manager(endpoint):
+    """Kathara Docker manager bound to one daemon (DOCKER_HOST while it is built)."""
+    from Kathara.manager.docker.DockerManager import DockerManager
+
+    with _env_lock:
+        previous = os.environ.get("DOCKER_HOST")
+        os.environ["DOCKER_HOST"] = endpoint
+        try:
+            return DockerManager()
+        finally:
+            if previous is None:
+                os.environ.pop("DOCKER_HOST", None)
+            else:
+                os.environ["DOCKER_HOST"] = previous
+
+
+def create_host_managers(hosts, backend="kathara"):
+    """
+    One manager per host of the 'hosts' section, built concurrently.
+    The fake backend gives each host its own in-memory FakeManager.
+    """
+    if backend == "fake":
+        from src.backend.fake_manager import FakeManager
+        return {name: FakeManager() for name in hosts}
+    managers = run_concurrently(list(hosts), lambda name: _docker_manager(hosts[name]["endpoint"]), len(hosts))
+    for name, manager in managers.items():
+        if isinstance(manager, Exception):
+            raise ConnectionError(f"Host '{name}' ({hosts[name]['endpoint']}): {manager}")
+    return managers
+
+
+def host_capacities(hosts, managers):
+    """
+    {host: (cpus, mem)} from the configuration, else from the daemon info,
+    None when neither is known (other backends).
+    """
+    capacities = {}
+    for name, cfg in hosts.items():
+        cpus, mem = cfg["cpus"], cfg["mem"]
+        client = getattr(managers.get(name), "client", None)
+        if (cpus is None or mem is None) and client is not None:
+            try:
+                info = client.info()
+                cpus, mem = cpus or info["NCPU"], mem or info["MemTotal"]
+            except Exception:
+                pass
+        capacities[name] = (cpus, mem) if cpus and mem else None
+    return capacities
+
+
+class MultiHostManager(ManagerInterface):
+    """
+    Backend spreading one lab over several container hosts.
+    Machine calls go to the manager of the host the machine is placed on;
+    deploy, undeploy, stats and image checks run on every host in parallel.
+
+    Parameters:
+    - managers: {host: manager}
+    - placement: {machine: host}
+    - images: {machine: image}, to check images only where they are used
+    - endpoints: {host: Docker endpoint}, used by the device terminals
+    """
+
+    def __init__(self, managers, placement, images=None, endpoints=None):
+        self.managers = managers
+        self.placement = placement
+        self.images = images or {}
+        self.endpoints = endpoints or {}
+        self.default_host = next(iter(managers))
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    @property
+    def supports_terminals(self):
+        return all(getattr(m, "supports_terminals", True) for m in self.managers.values())
+
+    def _fan_out(self, hosts, func):
+        """Run func(host) on the hosts in parallel; raise the first error once all are done."""
+        results = run_concurrently(list(hosts), func, len(self.managers))
+        for host, result in results.items():
+            if isinstance(result, Exception):
+                raise RuntimeError(f"[{host}] {result}") from result
+        return results
+
+    def _machines_by_host(self, machines):
+        by_host = {}
+        for machine in machines:
+            by_host.setdefault(self.host_of(machine), []).append(machine)
+        return by_host
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def host_of(self, machine_name):
+        return self.placement.get(machine_name, self.default_host)
+
+    def manager_of(self, machine_name):
+        return self.managers[self.host_of(machine_name)]
+
+    def endpoint_of(self, machine_name):
+        return self.endpoints.get(self.host_of(machine_name))
+
+    # ---------------------- MANAGER API ----------------------
+    def deploy_lab(self, lab, selected_machines=None, excluded_machines=None):
+        machines = [m for m in lab.machines if not selected_machines or m in selected_machines]
+        machines = [m for m in machines if not excluded_machines or m not in excluded_machines]
+        by_host = self._machines_by_host(machines)
+        self._fan_out(by_host, lambda host: self.managers[host].deploy_lab(lab, selected_machines=set(by_host[host])))
+
+    def undeploy_lab(self, lab_hash=None, lab_name=None, lab=None, selected_machines=None, excluded_machines=None):
+        if selected_machines:
+            by_host = self._machines_by_host(selected_machines)
+            hosts = list(by_host)
+        else:
+            by_host, hosts = {}, list(self.managers)
+        self._fan_out(hosts, lambda host: self.managers[host].undeploy_lab(
+            lab_hash=lab_hash, lab_name=lab_name, lab=lab,
+            selected_machines=set(by_host[host]) if host in by_host else None,
+            excluded_machines=excluded_machines))
+
+    def exec(self, machine_name, command, lab_hash=None, lab_name=None, lab=None, wait=False, stream=True):
+        return self.manager_of(machine_name).exec(machine_name, command, lab_hash=lab_hash, lab_name=lab_name,
+                                                  lab=lab, wait=wait, stream=stream)
+
+    def get_machine_stats(self, machine_name, lab_hash=None, lab_name=None, lab=None):
+        return self.manager_of(machine_name).get_machine_stats(machine_name, lab_hash=lab_hash,
+                                                               lab_name=lab_name, lab=lab)
+
+    def get_machines_stats(self, lab_hash=None, lab_name=None, lab=None, machine_name=None):
+        results = self._fan_out(self.managers, lambda host: next(self.managers[host].get_machines_stats(
+            lab_hash=lab_hash, lab_name=lab_name, lab=lab, machine_name=machine_name), None) or {})
+        merged = {}
+        for stats in results.values():
+            merged.update(stats)
+        yield merged
+
+    def get_links_stats(self, lab_hash=None, lab_name=None, lab=None, link_name=None):
+        results = self._fan_out(self.managers, lambda host: next(self.managers[host].get_links_stats(
+            lab_hash=lab_hash, lab_name=lab_name, lab=lab, link_name=link_name), None) or {})
+        merged = {}
+        for stats in results.values():
+            merged.update(stats)
+        yield merged
+
+    def check_image(self, image_name):
+        hosts = {self.host_of(m) for m, image in self.images.items() if image == image_name} or set(self.managers)
+        self._fan_out(hosts, lambda host: self.managers[host].check_image(image_name))
+
+    def get_local_image_id(self, image_name):
+        """Id of the image on the first host using it, None if a host using it lacks it."""
+        hosts = sorted({self.host_of(m) for m, image in self.images.items() if image == image_name}) \
+            or list(self.managers)
+        ids = []
+        for host in hosts:
+            client = getattr(self.managers[host], "client", None)
+            try:
+                ids.append(client.images.get(image_name).id if client is not None
+                           else get_local_image_id(image_name, manager=self.managers[host]))
+            except Exception:
+                return None
+        return ids[0] if all(ids) else None
+
+    def get_machine_api_object(self, machine_name, lab_hash=None, lab_name=None, lab=None):
+        return self.manager_of(machine_name).get_machine_api_object(machine_name, lab_hash=lab_hash,
+                                                                    lab_name=lab_name, lab=lab)
+
+    def connect_tty(self, machine_name, lab_hash=None, lab_name=None, lab=None, shell=None, logs=False):
+        return self.manager_of(machine_name).connect_tty(machine_name, lab_hash=lab_hash, lab_name=lab_name,
+                                                         lab=lab, shell=shell, logs=logs)
@@ -0,0 +1,203 @@
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from src.backend.fake_manager import FakeManager, MachineNotRunningError
+from src.backend.manager import ExecStream
+from src.command_system.output_capture import OutputCapture, DEFAULT_HEAD_BYTES, DEFAULT_TAIL_BYTES
+
+TRACE_VERSION = 1
+REPLAY_MISS_CODE = 127
+
+
+def _encode(data, key):
+    """Store bytes as text when possible, base64 otherwise."""
+    if data is None:
+        return {}
+    if isinstance(data, str):
+        return {key: data}
+    try:
+        return {key: data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {f"{key}_b64": base64.b64encode(data).decode()}
+
+
+def _decode(entry, key):
+    if f"{key}_b64" in entry:
+        return base64.b64decode(entry[f"{key}_b64"])
+    return entry.get(key, "").encode()
+
+
+def open_trace(path):
+    """Open a trace file, gzip-compressed if its name ends with .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class RecordingManager:
+    """
+    Wrap a lab manager and record every exec (machine, rendered command,
+    stdout, stderr, exit code, latency) into a JSON-lines trace file,
+    gzip-compressed if the name ends with .gz. Every other call is
+    forwarded unchanged.
+    Outputs are recorded through the head/tail window of the command
+    outputs (see src/command_system/output_capture.py): larger ones keep
+    their head and tail, and the entry gets their size in stdout_bytes /
+    stderr_bytes.
+    """
+
+    def __init__(self, inner, path, lab_name=None, output_window=None):
+        self.inner = inner
+        self.path = path
+        self.output_window = output_window or (DEFAULT_HEAD_BYTES, DEFAULT_TAIL_BYTES)
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.count = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = gzip.open(path, "wt", encoding="utf-8") if path.endswith(".gz") else open(path, "w", encoding="utf-8")
+        self._write({"type": "header", "version": TRACE_VERSION, "lab": lab_name,
+                     "created": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        atexit.register(self.close)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _write(self, entry):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(json.dumps(entry) + "\n")
+
+    def _captures(self):
+        return OutputCapture(*self.output_window), OutputCapture(*self.output_window)
+
+    def _record(self, machine_name, command, stdout, stderr, code, started, error=None):
+        """Write an exec entry; stdout and stderr are OutputCaptures (None after an error)."""
+        self.count += 1
+        fields = {}
+        for key, capture in (("stdout", stdout), ("stderr", stderr)):
+            if capture is not None:
+                fields.update(_encode(capture.data, key))
+                if capture.truncated:
+                    fields[f"{key}_bytes"] = capture.total_bytes
+        self._write({
+            "type": "exec",
+            "t": round(started - self.start, 6),
+            "machine": machine_name,
+            "command": FakeManager._render_command(command),
+            **fields,
+            "code": code,
+            "latency": round(time.time() - started, 6),
+            **({"error": error} if error else {}),
+        })
+
+    # ---------------------- MANAGER API ----------------------
+    def exec(self, machine_name, command, lab_hash=None, lab_name=None, lab=None, wait=False, stream=True):
+        started = time.time()
+        try:
+            result = self.inner.exec(machine_name=machine_name, command=command, lab_hash=lab_hash,
+                                     lab_name=lab_name, lab=lab, wait=wait, stream=stream)
+        except Exception as e:
+            self._record(machine_name, command, None, None, None, started, error=str(e) or type(e).__name__)
+            raise
+        stdout, stderr = self._captures()
+        if not stream:
+            stdout.feed(result[0])
+            stderr.feed(result[1])
+            self._record(machine_name, command, stdout, stderr, result[2], started)
+            return result
+
+        def generator():
+            code = None
+            try:
+                for out, err in result:
+                    stdout.feed(out)
+                    stderr.feed(err)
+                    yield out, err
+                code = result.exit_code()
+            finally:
+                self._record(machine_name, command, stdout, stderr, code, started)
+        return ExecStream(generator(), result.exit_code)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class ReplayManager(FakeManager):
+    """
+    In-memory backend answering exec calls from a recorded trace.
+
+    Responses are matched by machine and rendered command, in recording
+    order; once the recorded answers of a command are used up, the last one
+    is repeated (polling loops). Exceptions raised during the recording are
+    raised again. Commands never recorded fail with exit code 127 and are
+    counted in `misses`.
+
+    Parameters:
+    - path: trace file written by RecordingManager
+    - speed: time compression of the recorded latencies (1 = real time,
+      10 = ten times faster, 0 = no waiting)
+    """
+
+    def __init__(self, path, speed=0.0):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.recorded = defaultdict(deque)
+        self.last = {}
+        self.misses = []
+        self.header = {}
+        with open_trace(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get("type") == "header":
+                    self.header = entry
+                elif entry.get("type") == "exec":
+                    self.recorded[(entry["machine"], entry["command"])].append(entry)
+        self.total = sum(len(q) for q in self.recorded.values())
+
+    def unused(self):
+        """Number of recorded responses never replayed."""
+        return sum(len(q) for q in self.recorded.values())
+
+    def exec(self, machine_name, command, lab_hash=None, lab_name=None, lab=None, wait=False, stream=True):
+        name = self._lab_name(lab_name, lab)
+        if self._started_at(name, machine_name) is None:
+            raise MachineNotRunningError(f"Machine {machine_name} is not running in lab {name}")
+
+        key = (machine_name, self._render_command(command))
+        with self.lock:
+            queue = self.recorded.get(key)
+            entry = queue.popleft() if queue else self.last.get(key)
+            if entry is not None:
+                self.last[key] = entry
+            else:
+                self.misses.append(key)
+            self.exec_count += 1
+
+        if entry is None:
+            stdout, stderr, code = b"", f"replay: no recorded response for '{key[1]}' on {machine_name}".encode(), REPLAY_MISS_CODE
+        else:
+            if self.speed:
+                time.sleep(entry.get("latency", 0.0) / self.speed)
+            if entry.get("error"):
+                raise Exception(entry["error"])
+            stdout, stderr = _decode(entry, "stdout"), _decode(entry, "stderr")
+            # streams left unfinished during the recording have no exit code
+            code = entry.get("code")
+            if code is None:
+                code = 0
+
+        if stream:
+            return ExecStream([(stdout, stderr)], code)
+        return stdout, stderr, code
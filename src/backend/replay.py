@@ -0,0 +1,120 @@
+"""
+Replay a recorded run (start_lab.py --record) without Docker.
+
+The lab configuration, actions.yaml and plans.yaml are loaded from the lab
+folder, machines are simulated in memory and every exec is answered from
+the trace. Use it to regression-test parser, matching and plan-logic
+changes in seconds.
+
+Usage:
+    python -m src.backend.replay <lab_folder> <trace> [--plan NAME ...]
+                                 [--action MACHINE:ACTION ...] [--speed FACTOR]
+                                 [--quiet]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from src.backend.fake_manager import FakeLab
+from src.backend.manager import set_manager
+from src.backend.recording import ReplayManager
+
+
+def build_replay_session(lab_folder, trace, speed=0.0):
+    """
+    Create a fake lab from lab_conf.yaml, a ReplayManager for the trace and
+    a CommandManager with the lab actions and plans (no logs are written).
+    """
+    from src.lab_manager.LabManager import LabManager
+    from src.command_system.action_parser import parse_actions
+    from src.command_system.plan_parser import parse_plans
+    from src.command_system.cmd_manager import CommandManager
+
+    lab_manager = LabManager(os.getcwd(), lab_folder, lab_name=None)
+    lab_info, devices = lab_manager.load_lab()
+    lab_name = lab_info.get("description") or os.path.basename(os.path.normpath(lab_folder))
+
+    actions, plans = {}, {}
+    if os.path.isfile(os.path.join(lab_folder, "actions.yaml")):
+        actions = {str(k): v for k, v in parse_actions(os.path.join(lab_folder, "actions.yaml")).items()}
+    if os.path.isfile(os.path.join(lab_folder, "plans.yaml")):
+        plans = {str(k): v for k, v in parse_plans(os.path.join(lab_folder, "plans.yaml")).items()}
+
+    lab = FakeLab(lab_name, {name: dev["image"] for name, dev in devices.items()})
+    manager = ReplayManager(trace, speed=speed)
+    set_manager(manager)
+    manager.deploy_lab(lab)
+
+    cmd_manager = CommandManager(
+        lab=lab,
+        lab_name=lab_name,
+        devices=devices,
+        actions=actions,
+        plans=plans,
+        processes={},
+        action_logger=None,
+        plan_logger=None,
+        spawn_terminals=False,
+        output_window=lab_manager.get_output_window(lab_info),
+        groups=lab_manager.groups,
+        lab_folder=lab_folder
+    )
+    return cmd_manager, manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded lab run on the in-memory backend.")
+    parser.add_argument("lab_folder", help="Lab folder (lab_conf.yaml, actions.yaml, plans.yaml)")
+    parser.add_argument("trace", help="Trace file written by start_lab.py --record")
+    parser.add_argument("--plan", action="append", default=[], help="Plan to run (repeatable)")
+    parser.add_argument("--action", action="append", default=[], metavar="MACHINE:ACTION",
+                        help="Action to run on a machine (repeatable)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Time compression of recorded latencies (1 = real time, default 0 = no waiting)")
+    parser.add_argument("--quiet", action="store_true", help="Hide the output of the engines")
+    args = parser.parse_args()
+
+    from src.command_system.commands.action import run_action
+    from src.command_system.commands.plan import run_plan
+    from src.command_system.plan_parser import expand_matrix
+
+    cmd_manager, manager = build_replay_session(args.lab_folder, args.trace, args.speed)
+    for target in args.action:
+        machine, _, action_name = target.partition(":")
+        if machine not in cmd_manager.lab.machines or action_name not in cmd_manager.actions:
+            parser.error(f"unknown machine or action: {target}")
+    for plan_name in args.plan:
+        if plan_name not in cmd_manager.plans:
+            parser.error(f"unknown plan: {plan_name}")
+    print(f"Replaying {manager.total} recorded execs from {args.trace}")
+
+    results = []
+    start = time.perf_counter()
+    output = contextlib.redirect_stdout(io.StringIO()) if args.quiet else contextlib.nullcontext()
+    with output:
+        for target in args.action:
+            machine, _, action_name = target.partition(":")
+            results.append((f"action {target}", run_action(cmd_manager, machine, action_name)[0]))
+        for plan_name in args.plan:
+            # matrix instances are replayed one after the other
+            for instance_name, _, plan in expand_matrix(plan_name, cmd_manager.plans[plan_name]):
+                results.append((f"plan {instance_name}", run_plan(cmd_manager, instance_name, plan=plan)[0]))
+    elapsed = time.perf_counter() - start
+
+    print("\nReplay summary:")
+    for label, result in results:
+        print(f"  {label:<40} {result}")
+    print(f"  execs: {manager.exec_count}  unmatched: {len(manager.misses)}  "
+          f"unused recorded: {manager.unused()}  time: {elapsed:.3f}s")
+    for machine, command in dict.fromkeys(manager.misses):
+        print(f"  [unmatched] {machine}: {command}")
+
+    failed = any(result != "Success" for _, result in results) or manager.misses
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
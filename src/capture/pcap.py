@@ -0,0 +1,68 @@
+import struct
+
+# Magic numbers of the classic pcap format (microsecond / nanosecond timestamps)
+MAGIC_USEC = 0xa1b2c3d4
+MAGIC_NSEC = 0xa1b23c4d
+GLOBAL_HEADER_SIZE = 24
+RECORD_HEADER_SIZE = 16
+
+
+class PcapError(Exception):
+    pass
+
+
+def read_header(data):
+    """
+    Return (byte_order, divisor, global_header) of a pcap file, where
+    divisor converts the sub-second field to seconds.
+    """
+    if len(data) < GLOBAL_HEADER_SIZE:
+        raise PcapError("File too short for a pcap header")
+    for order in ("<", ">"):
+        magic = struct.unpack(f"{order}I", data[:4])[0]
+        if magic == MAGIC_USEC:
+            return order, 1e6, data[:GLOBAL_HEADER_SIZE]
+        if magic == MAGIC_NSEC:
+            return order, 1e9, data[:GLOBAL_HEADER_SIZE]
+    raise PcapError("Not a pcap file (pcapng is not supported)")
+
+
+def iter_packets(data):
+    """
+    Yield (timestamp, record_bytes) for every complete packet of a pcap
+    file. A truncated last record (file still being written) is ignored.
+    """
+    order, divisor, _ = read_header(data)
+    offset = GLOBAL_HEADER_SIZE
+    record = struct.Struct(f"{order}IIII")
+    while offset + RECORD_HEADER_SIZE <= len(data):
+        ts_sec, ts_frac, incl_len, _ = record.unpack_from(data, offset)
+        end = offset + RECORD_HEADER_SIZE + incl_len
+        if end > len(data):
+            break
+        yield ts_sec + ts_frac / divisor, data[offset:end]
+        offset = end
+
+
+def extract_window(segments, start, end):
+    """
+    Merge the packets of consecutive pcap segments (bytes, in time order)
+    dated in [start, end] into one pcap file. Returns (pcap_bytes, packets);
+    pcap_bytes is None if no segment is readable.
+    """
+    header = None
+    records = []
+    for data in segments:
+        try:
+            _, _, segment_header = read_header(data)
+        except PcapError:
+            continue
+        if header is None:
+            header = segment_header
+        elif segment_header != header:
+            # Different byte order or link type: keep the first segment format
+            continue
+        records.extend(record for timestamp, record in iter_packets(data) if start <= timestamp <= end)
+    if header is None:
+        return None, 0
+    return header + b"".join(records), len(records)
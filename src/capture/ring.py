@@ -0,0 +1,204 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from src.backend.manager import get_manager
+from src.capture.pcap import extract_window
+
+CAPTURE_DIR = "/captures"
+DEFAULT_SECONDS = 60
+DEFAULT_SIZE_MB = 10
+DEFAULT_FILES = 20
+DEFAULT_SNAPLEN = 262144
+PRUNE_INTERVAL = 5
+# Segment names: <link>_<UTC start YYYYmmdd-HHMMSS>.pcap[<size rotation index>]
+SEGMENT_PATTERN = re.compile(r"_(\d{8}-\d{6})\.pcap(\d*)$")
+
+
+def _exec(machine, command, lab):
+    stdout, stderr, code = get_manager().exec(
+        machine_name=machine, command=["sh", "-c", command], lab=lab, stream=False
+    )
+    text = stdout.decode(errors="replace") if isinstance(stdout, bytes) else (stdout or "")
+    return text, stdout, code
+
+
+class CaptureSession:
+    def __init__(self, link, machine, iface, lab, seconds=DEFAULT_SECONDS, size_mb=DEFAULT_SIZE_MB,
+                 files=DEFAULT_FILES, snaplen=DEFAULT_SNAPLEN):
+        """
+        tcpdump capture of one collision domain, run on a machine attached
+        to it, into a ring of segment files: a new segment every `seconds`
+        or `size_mb` MB, the oldest removed beyond `files` segments. The
+        start time is in every segment name, so the segments of a time
+        window are found without reading the captures.
+        """
+        self.link = link
+        self.machine = machine
+        self.iface = iface
+        self.lab = lab
+        self.seconds = seconds
+        self.size_mb = size_mb
+        self.files = files
+        self.snaplen = snaplen
+        self.directory = f"{CAPTURE_DIR}/{link}"
+        self.started = None
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _start_command(self):
+        d = self.directory
+        tcpdump = (
+            f"TZ=UTC nohup tcpdump -i {self.iface} -n -U -s {self.snaplen} "
+            f"-G {self.seconds} -C {self.size_mb} -w {d}/{self.link}_%Y%m%d-%H%M%S.pcap "
+            f"> {d}/tcpdump.log 2>&1 & echo $! > {d}/tcpdump.pid"
+        )
+        # Ring: keep only the newest segments while tcpdump runs
+        pruner = (
+            f"while kill -0 $(cat {d}/tcpdump.pid) 2>/dev/null; do "
+            f"ls -1t {d}/*.pcap* 2>/dev/null | tail -n +{self.files + 1} | xargs -r rm -f; "
+            f"sleep {PRUNE_INTERVAL}; done"
+        )
+        return f"mkdir -p {d} && ({tcpdump}) && (nohup sh -c '{pruner}' > /dev/null 2>&1 &)"
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def start(self):
+        _, _, code = _exec(self.machine, self._start_command(), self.lab)
+        if code != 0:
+            raise RuntimeError(f"tcpdump could not be started on {self.machine} ({self.iface})")
+        self.started = time.time()
+        return self
+
+    def stop(self):
+        _exec(self.machine, f"kill $(cat {self.directory}/tcpdump.pid) 2>/dev/null; rm -f {self.directory}/tcpdump.pid",
+              self.lab)
+        self.started = None
+
+    def running(self):
+        _, _, code = _exec(self.machine, f"kill -0 $(cat {self.directory}/tcpdump.pid) 2>/dev/null", self.lab)
+        return code == 0
+
+    def segments(self):
+        """
+        Time index of the ring: [(start, end, size, path)] sorted by start,
+        with start from the segment name and end its last modification.
+        """
+        text, _, code = _exec(self.machine, f"stat -c '%Y %s %n' {self.directory}/*.pcap* 2>/dev/null", self.lab)
+        segments = []
+        for line in text.splitlines():
+            parts = line.split(" ", 2)
+            if len(parts) != 3 or not parts[0].isdigit():
+                continue
+            match = SEGMENT_PATTERN.search(parts[2])
+            if not match:
+                continue
+            start = datetime.strptime(match.group(1), "%Y%m%d-%H%M%S").replace(tzinfo=timezone.utc).timestamp()
+            segments.append((start, float(parts[0]), int(parts[1]), parts[2], int(match.group(2) or 0)))
+        segments.sort(key=lambda s: (s[0], s[4]))
+        return [s[:4] for s in segments]
+
+    def extract(self, start, end, output_path):
+        """
+        Write the packets captured in [start, end] into output_path, reading
+        only the segments overlapping the window. Returns the packet count
+        (None if no segment overlaps).
+        """
+        # A segment ends when it was last written (+1s: mtime has second precision)
+        selected = [path for seg_start, seg_end, _, path in self.segments()
+                    if seg_start <= end and seg_end + 1 >= start]
+        if not selected:
+            return None
+        data = []
+        for path in selected:
+            _, raw, code = _exec(self.machine, f"cat '{path}'", self.lab)
+            if code == 0 and raw:
+                data.append(raw if isinstance(raw, bytes) else raw.encode())
+        pcap, packets = extract_window(data, start, end)
+        if pcap is None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "wb") as f:
+            f.write(pcap)
+        return packets
+
+
+class CaptureManager:
+    def __init__(self, lab, devices, device_index):
+        """
+        Captures running in the lab, one per collision domain.
+        The capture machine of a link is the first attached router with
+        tcpdump (it sees the traffic routed through the link), else any
+        attached machine with tcpdump.
+        """
+        self.lab = lab
+        self.devices = devices
+        self.device_index = device_index
+        self.sessions = {}
+        self.lock = threading.Lock()
+        # Held while a link is started or stopped, so concurrent 'capture'
+        # commands start one session per link while other links proceed
+        self.link_locks = {}
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _interface(self, machine, link):
+        for iface, name in (self.devices[machine].get("interfaces") or {}).items():
+            if str(name) == link:
+                return iface
+        return None
+
+    def _link_lock(self, link):
+        with self.lock:
+            return self.link_locks.setdefault(link, threading.Lock())
+
+    def _capture_machine(self, link):
+        members = self.device_index.by_link.get(link, [])
+        routers = [m for m in members if self.devices[m].get("type") == "router"]
+        for machine in routers + [m for m in members if m not in routers]:
+            try:
+                _, _, code = _exec(machine, "command -v tcpdump", self.lab)
+            except Exception:
+                continue
+            if code == 0:
+                return machine
+        return None
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def links(self):
+        return list(self.device_index.by_link.keys())
+
+    def start(self, link, **options):
+        """Start capturing a link (no-op if already captured). Returns the session."""
+        if link not in self.device_index.by_link:
+            raise ValueError(f"Unknown collision domain: {link}")
+        with self._link_lock(link):
+            with self.lock:
+                if link in self.sessions:
+                    return self.sessions[link]
+            machine = self._capture_machine(link)
+            if machine is None:
+                raise RuntimeError(f"No machine with tcpdump attached to {link}")
+            session = CaptureSession(link, machine, self._interface(machine, link), self.lab, **options).start()
+            with self.lock:
+                self.sessions[link] = session
+            return session
+
+    def stop(self, link):
+        with self._link_lock(link):
+            with self.lock:
+                session = self.sessions.pop(link, None)
+            if session is not None:
+                session.stop()
+            return session
+
+    def extract(self, link, start, end, output_path):
+        session = self.sessions.get(link)
+        if session is None:
+            raise ValueError(f"Link {link} is not being captured")
+        return session.extract(start, end, output_path)
+
+
+def capture_output_path(lab_folder, label, link, start):
+    """<lab_folder>/logs/captures/<label>/<link>_<window start>.pcap"""
+    stamp = datetime.fromtimestamp(start).strftime("%Y%m%d-%H%M%S")
+    return os.path.join(lab_folder or ".", "logs", "captures", label, f"{link}_{stamp}.pcap")
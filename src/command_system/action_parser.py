@@ -1,5 +1,7 @@
 import yaml
 import re
+from src.command_system.traffic_load import normalize_traffic_load
+from src.command_system.wait_until import normalize_wait_until
 
 def extract_params_from_text(text: str):
     """
@@ -20,7 +22,7 @@ def parse_actions(filename: str):
         { action_name: { "parameters": {defaults}, "commands": [(cmd, expected, params), ...] } }
     
     Notes:
-        - Supports simple commands, compound commands (AND/OR), and calls.
+        - Supports simple commands, compound commands (AND/OR), calls, traffic_load and wait_until steps.
         - Each command is normalized to a tuple: (command_str, expected_output, parameters)
     """
     with open(filename, "r") as f:
@@ -48,6 +50,12 @@ def parse_actions(filename: str):
             if "call" in action:
                 # call action format: {"call": action_name, "expected": "Success", "parameters": {...}}
                 return ("call", action["call"], action.get("expected", "Success"), action.get("parameters", {}))
+            if "traffic_load" in action:
+                # traffic load format: {"traffic_load": {"target": ..., "rates": [...], ...}}
+                return ("traffic_load", normalize_traffic_load(action["traffic_load"]))
+            if "wait_until" in action:
+                # polling format: {"wait_until": {"command": ..., "expected": ..., "timeout": ...}}
+                return ("wait_until", normalize_wait_until(action["wait_until"]))
             if "command" not in action:
                 raise ValueError(f"Dict action missing 'command': {action}")
             cmd_str = action["command"]
@@ -77,6 +85,9 @@ def parse_actions(filename: str):
                 if operator not in ("AND", "OR"):
                     raise ValueError(f"Unsupported operator: {operator}")
                 sub_actions = [normalize_action(v) for k, v in sorted(value.items()) if k != "operator"]
+                for step_type in ("traffic_load", "wait_until"):
+                    if any(sub[0] == step_type for sub in sub_actions):
+                        raise ValueError(f"{step_type} cannot be used inside an {operator} block ({action_name})")
                 parsed_actions[action_name]["commands"].append((operator, *sub_actions))
             else:
                 parsed_actions[action_name]["commands"].append(normalize_action(value))
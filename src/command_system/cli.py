@@ -1,4 +1,8 @@
+from src.command_system.utils import setup_history_and_completion
+
+
 def cli(cmd_manager, stop_event):
+    setup_history_and_completion(cmd_manager)
     try:
         while not stop_event.is_set():
             line = input("> ").strip()
@@ -6,9 +10,8 @@ def cli(cmd_manager, stop_event):
                 continue
             parts = line.split()
             cmd_name, args = parts[0].lower(), parts[1:]
-            cmd_func = cmd_manager.cmd_commands.get(cmd_name)
-            if cmd_func: 
-                cmd_func(args=args, cmd_manager=cmd_manager)
+            if cmd_name in cmd_manager.cmd_commands:
+                cmd_manager.run_command(cmd_name, args)
             else:
                 print(f"Unknown command: {cmd_name}")
     except KeyboardInterrupt:
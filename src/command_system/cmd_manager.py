@@ -1,22 +1,66 @@
-from src.command_system.utils import setup_history_and_completion
-from src.command_system.commands.help import cmd_help
-from src.command_system.commands.exit import cmd_exit
-from src.command_system.commands.status import cmd_status
-from src.command_system.commands.terminal import cmd_terminal
-from src.command_system.commands.deploy import cmd_deploy
-from src.command_system.commands.undeploy import cmd_undeploy
-from src.command_system.commands.restart import cmd_restart
-from src.command_system.commands.action import cmd_action
-from src.command_system.commands.plan import cmd_plan
+import importlib
 
+from src.command_system.output_capture import DEFAULT_HEAD_BYTES, DEFAULT_TAIL_BYTES
+from src.command_system.selectors import DeviceIndex, is_selector
+from src.command_system.plan_parser import expand_matrix
+from src.tracing.tracer import tracer
+from src.alerts.correlation import CommandJournal
+from src.capture.ring import CaptureManager
+from contextlib import ExitStack
+from threading import Event, RLock
 
-from threading import Event
+# Commands that never lock machines (read-only or interactive)
+UNLOCKED_COMMANDS = {"help", "status", "terminal", "exit", "alerts", "capture", "console"}
+# Commands where '-a' means every machine ('action' uses it for every action)
+ALL_MACHINES_COMMANDS = {"deploy", "undeploy", "restart", "snapshot", "exec"}
+# Command name -> (module in src/command_system/commands, function)
+COMMANDS = {
+    "help": ("help", "cmd_help"),
+    "exit": ("exit", "cmd_exit"),
+    "status": ("status", "cmd_status"),
+    "terminal": ("terminal", "cmd_terminal"),
+    "deploy": ("deploy", "cmd_deploy"),
+    "undeploy": ("undeploy", "cmd_undeploy"),
+    "restart": ("restart", "cmd_restart"),
+    "action": ("action", "cmd_action"),
+    "plan": ("plan", "cmd_plan"),
+    "snapshot": ("snapshot", "cmd_snapshot"),
+    "alerts": ("alerts", "cmd_alerts"),
+    "capture": ("capture", "cmd_capture"),
+    "exec": ("exec", "cmd_exec"),
+    "console": ("console", "cmd_console"),
+}
+
+
+class LazyCommand:
+    # A command whose module is imported the first time it is run (or its
+    # docstring is read by 'help'), so the CLI starts without loading them all
+
+    def __init__(self, module, function):
+        self.module = f"src.command_system.commands.{module}"
+        self.function = function
+        self.func = None
+
+    def load(self):
+        if self.func is None:
+            self.func = getattr(importlib.import_module(self.module), self.function)
+        return self.func
+
+    @property
+    def __doc__(self):
+        return self.load().__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
 
 class CommandManager:
     
-    def __init__(self, lab, lab_name, devices, actions, plans, processes, action_logger, plan_logger, spawn_terminals=True):
+    def __init__(self, lab, lab_name, devices, actions, plans, processes, action_logger, plan_logger, spawn_terminals=True,
+                 output_window=None, plan_checkpoint=None, groups=None, lab_folder=None,
+                 snapshot_keys=None, alert_collector=None):
         self.lab = lab
         self.lab_name = lab_name
+        self.lab_folder = lab_folder
         self.devices = devices
         self.actions = actions
         self.plans = plans
@@ -25,25 +69,75 @@ class CommandManager:
         self.plan_logger = plan_logger
         self.stop_event = Event()
         self.spawn_terminals = spawn_terminals
-
-        setup_history_and_completion(self)
+        # (head_bytes, tail_bytes) of command output kept in memory and logs
+        self.output_window = output_window or (DEFAULT_HEAD_BYTES, DEFAULT_TAIL_BYTES)
+        # PlanCheckpoint used by 'plan --resume' (None disables checkpoints)
+        self.plan_checkpoint = plan_checkpoint
+        # Index resolving selectors (type:, image:, link:, name:, @group)
+        self.device_index = DeviceIndex(devices, groups)
+        # Snapshot keys computed at startup ({machine: key}), see 'snapshot'
+        self.snapshot_keys = snapshot_keys if snapshot_keys is not None else {}
+        # Per-machine locks: commands from the CLI and the remote API touching
+        # the same machines run one after the other, the others concurrently
+        self.machine_locks = {name: RLock() for name in lab.machines.keys()}
+        # Correlation ids and timestamps of the executed commands, and the
+        # collector of IDS/SIEM alerts matched to them (None: no 'alerts' section)
+        self.command_journal = CommandJournal()
+        self.alert_collector = alert_collector
+        # Ring-buffer packet captures of collision domains, see 'capture'
+        self.capture_manager = CaptureManager(lab, devices, self.device_index)
+        # Headless console capture replacing the terminals (see start_lab.py --headless)
+        self.console_capture = None
+        # Sampler of the CPU/memory peaks of the devices (None: no 'resources' section)
+        self.resource_sampler = None
 
         # Commands
-        self.cmd_commands = {
-            "help": cmd_help,
-            "exit": cmd_exit,
-            "status": cmd_status,
-            "terminal": cmd_terminal,
-            "deploy": cmd_deploy,
-            "undeploy": cmd_undeploy,
-            "restart": cmd_restart,
-            "action" : cmd_action,
-            "plan" : cmd_plan
-        }
-    
+        self.cmd_commands = {name: LazyCommand(*target) for name, target in COMMANDS.items()}
+
+    def command_machines(self, command_name, args=None):
+        """
+        Return the machines a command operates on (in lab order).
+        Plans lock every machine used by their steps.
+        """
+        args = args or []
+        lab_machines = list(self.machine_locks.keys())
+        if command_name in UNLOCKED_COMMANDS:
+            return []
+
+        if command_name == "exec":
+            # the shell command after '--' does not name machines ('ps -a')
+            from src.command_system.commands.exec import split_exec_args
+            args, _ = split_exec_args(args)
+
+        if command_name == "plan":
+            plan_names = list(self.plans.keys()) if "-a" in args else args
+            machines = {
+                step.get("machine")
+                for plan_name in plan_names if plan_name in self.plans
+                for _, _, plan in expand_matrix(plan_name, self.plans[plan_name])
+                for section in ("need", "actions")
+                for step in plan.get(section, [])
+            }
+        elif "-a" in args and command_name in ALL_MACHINES_COMMANDS:
+            machines = set(lab_machines)
+        else:
+            machines = set()
+            for token in args:
+                if token in self.machine_locks:
+                    machines.add(token)
+                elif is_selector(token):
+                    machines.update(self.device_index.resolve(token) or [])
+        return [name for name in lab_machines if name in machines]
+
     def run_command(self, command_name, args=None):
+        """Run a command holding the locks of its machines; returns what the command returned."""
         cmd = self.cmd_commands.get(command_name)
         if cmd:
-            cmd(args=args, cmd_manager=self)
+            with ExitStack() as locks:
+                # Locks are taken in lab order, so concurrent commands cannot deadlock
+                for name in self.command_machines(command_name, args):
+                    locks.enter_context(self.machine_locks[name])
+                with tracer.span(f"command:{command_name}", cat="command", args=args or []):
+                    return cmd(args=args, cmd_manager=self)
         else:
             print(f"No such command: {command_name}")
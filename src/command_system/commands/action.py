@@ -1,24 +1,78 @@
-from src.command_system.utils import handle_errors
-from Kathara.manager.Kathara import Kathara
+from src.command_system.utils import handle_errors, pop_option
+from src.backend.manager import get_manager
+from src.tracing.tracer import tracer
+from src.metrics import metrics
+from src.command_system.output_capture import command_capture, close_command_capture, output_log_fields
+from src.command_system.selectors import is_selector
+from src.command_system.fanout import run_concurrently
+from src.alerts.correlation import correlation_log_fields
 import time
 import re
 
+def _exec_stream(cmd_manager, machine_name, command, on_output):
+    """
+    Execute a shell command on the given machine using the active lab manager,
+    passing its (stdout, stderr) chunks to on_output as they arrive.
+    The command gets a correlation id in the command journal (see
+    src/alerts/correlation.py) when the manager has one.
+    Returns (exit code, error message or None).
+    """
+    journal = getattr(cmd_manager, "command_journal", None)
+    with tracer.span("exec", cat="exec", machine=machine_name, command=command) as span:
+        start = time.perf_counter()
+        record = journal.begin(machine_name, command) if journal is not None else None
+        code = 1
+        try:
+            stream = get_manager().exec(
+                machine_name=machine_name,
+                command=["sh", "-c", command],
+                lab=cmd_manager.lab,
+                stream=True
+            )
+            for stdout, stderr in stream:
+                on_output(stdout, stderr)
+            code = stream.exit_code()
+            span.set(exit_code=code)
+            metrics.commands_total.inc(machine=machine_name, result="Success" if code == 0 else "Fail")
+            return code, None
+        except Exception as e:
+            print(f"Exception while executing action on {machine_name}: {e}\n")
+            span.set(exit_code=1, exec_error=str(e))
+            metrics.exec_errors_total.inc(machine=machine_name)
+            metrics.commands_total.inc(machine=machine_name, result="Fail")
+            return 1, str(e)
+        finally:
+            metrics.command_duration.observe(time.perf_counter() - start, machine=machine_name)
+            if record is not None:
+                journal.end(record, code)
+
 def exec_command(cmd_manager, machine_name, command):
     """
-    Execute a shell command on the given machine using Kathara.
-    Returns a tuple (stdout, stderr, code).
+    Execute a shell command on the given machine and return its complete
+    output as a tuple (stdout, stderr, code).
     """
-    try:
-        stdout, stderr, code = Kathara.get_instance().exec(
-            machine_name=machine_name,
-            command=["sh", "-c", command],
-            lab=cmd_manager.lab,
-            stream=False
-        )
-        return stdout, stderr, code
-    except Exception as e:
-        print(f"Exception while executing action on {machine_name}: {e}\n")
-        return None, str(e), 1  
+    stdout, stderr = [], []
+
+    def collect(out, err):
+        stdout.append(out or b"")
+        stderr.append(err or b"")
+
+    code, error = _exec_stream(cmd_manager, machine_name, command, collect)
+    if error is not None:
+        return None, error, code
+    return b"".join(stdout), b"".join(stderr), code
+
+def exec_captured(cmd_manager, machine_name, command, label, expected=None, with_stderr=True):
+    """
+    Execute a shell command on the given machine, feeding its output to a
+    bounded capture while it runs (see src/command_system/output_capture.py).
+    Returns (OutputCapture of the output to log, code).
+    """
+    capture = command_capture(cmd_manager, machine_name, label, expected, with_stderr)
+    code, error = _exec_stream(cmd_manager, machine_name, command, capture.feed)
+    if error is not None:
+        capture.feed(None, error)
+    return close_command_capture(cmd_manager, capture), code
 
 def substitute_params(text: str, override_params: dict, warn_missing=True):
     """
@@ -49,13 +103,20 @@ def cmd_action(args, cmd_manager):
     """
     Execute actions defined in actions.yaml for the selected machines.
 
-    Usage: action <machine1> <action1> <action2> <machine2> <action1>
+    Usage: action <machine1|selector> <action1> <action2> <machine2|selector> <action1> [--workers=N]
 
     Examples:
       action kali test          -> runs 'test' on kali using defaults
       action kali -a            -> runs all actions on kali
       action kali test r1 -a    -> runs 'test' on kali and all actions on r1
       action kali -a r2 testr2  -> runs all actions on kali and 'testr2' on r2
+      action type:router check  -> runs 'check' on every router, concurrently
+      action link:B1 testping   -> runs 'testping' on every device attached to B1
+      action @servers check     -> runs 'check' on the group 'servers' (lab_conf.yaml)
+
+    Selectors: type:<type>, image:<glob>, link:<domain>, name:<glob>, group:<name> or @<name>.
+    Machines matched by a selector run concurrently (group max_workers, or --workers=N,
+    default 4) and their results are aggregated into one summary.
 
     Notes on parameters:
       - Parameters defined in the action as <$KEY:DEFAULT> will be substituted.
@@ -66,14 +127,22 @@ def cmd_action(args, cmd_manager):
         print("You must specify at least one machine name.")
         return
 
+    try:
+        workers, args = pop_option(args, "--workers")
+    except ValueError as e:
+        print(e)
+        return
+
     lab_devices = list(cmd_manager.lab.machines.keys())
-    if args[0] not in lab_devices:
-        print(f"Syntax error: first argument must be a machine. Got '{args[0]}'")
+    device_index = cmd_manager.device_index
+    if args[0] not in lab_devices and not is_selector(args[0]):
+        print(f"Syntax error: first argument must be a machine or a selector. Got '{args[0]}'")
         return
 
-    # Build targets: { machine: [ (action_name, cli_params) ] }
+    # Build targets: { machine_or_selector: [ (action_name, cli_params) ] }
     targets = {}
-    current_machine = None
+    selections = {}
+    current_target = None
     i = 0
     n = len(args)
 
@@ -82,24 +151,37 @@ def cmd_action(args, cmd_manager):
 
         # Machine selection
         if token in lab_devices:
-            current_machine = token
-            targets.setdefault(current_machine, [])
+            current_target = token
+            targets.setdefault(current_target, [])
+            selections[current_target] = [token]
+            i += 1
+            continue
+
+        # Selector: type:, image:, link:, name:, group: or @group
+        if is_selector(token):
+            machines = device_index.resolve(token)
+            if not machines:
+                print(f"Selector '{token}' matches no machine.")
+                return
+            current_target = token
+            targets.setdefault(current_target, [])
+            selections[current_target] = machines
             i += 1
             continue
 
         # '-a' means: run all actions for this machine
         if token == "-a":
-            if current_machine is None:
+            if current_target is None:
                 print("Syntax error: '-a' must follow a machine.")
                 return
             for action_name in cmd_manager.actions.keys():
-                targets[current_machine].append((action_name, {}))
+                targets[current_target].append((action_name, {}))
             i += 1
             continue
 
         # CLI parameter $KEY=VALUE
         if token.startswith("$"):
-            if current_machine is None or not targets[current_machine]:
+            if current_target is None or not targets[current_target]:
                 print(f"Syntax error: parameter '{token}' without an action.")
                 return
             if "=" not in token:
@@ -107,47 +189,103 @@ def cmd_action(args, cmd_manager):
                 return
             key, value = token.split("=", 1)
             # Attach to last action of this machine
-            last_action, last_params = targets[current_machine][-1]
+            last_action, last_params = targets[current_target][-1]
             new_params = last_params.copy()
             new_params[key] = value
-            targets[current_machine][-1] = (last_action, new_params)
+            targets[current_target][-1] = (last_action, new_params)
             i += 1
             continue
 
         # Token = action name
-        if current_machine is None:
+        if current_target is None:
             print(f"Syntax error: action '{token}' without a machine.")
             return
 
         if token not in cmd_manager.actions:
             print(f"\nAction '{token}' not found. Skipping.")
         else:
-            targets[current_machine].append((token, {}))
+            targets[current_target].append((token, {}))
 
         i += 1
 
     # Execute each action for each machine
-    for machine, action_list in targets.items():
-        for action_name, cli_params in action_list:
-            result, total_time, commands_log = run_action(cmd_manager, machine, action_name, cli_params=cli_params)
-
-            cmd_manager.action_logger.save_action_log_yaml(
-                machine=machine,
-                action_result=result,
-                total_time=round(total_time, 2),
-                action_name=action_name,
-                commands=commands_log
-            )
+    for target, action_list in targets.items():
+        machines = selections[target]
+        if len(machines) == 1:
+            run_action_list(cmd_manager, machines[0], action_list)
+            continue
+
+        max_workers = workers or device_index.max_workers(target)
+        print(f"\nRunning {len(action_list)} action(s) on {len(machines)} machines "
+              f"selected by '{target}' ({max_workers} workers)")
+        results = run_concurrently(machines, lambda m: run_action_list(cmd_manager, m, action_list), max_workers)
+        print_fanout_summary(target, results)
 
-            print(f"\nACTION {action_name} on {machine}: {result}, see logs for more info\n")
+
+def run_action_list(cmd_manager, machine, action_list):
+    """
+    Run actions sequentially on one machine and save their logs.
+    Returns [(action_name, result, total_time)].
+    """
+    results = []
+    for action_name, cli_params in action_list:
+        result, total_time, commands_log = run_action(cmd_manager, machine, action_name, cli_params=cli_params)
+
+        cmd_manager.action_logger.save_action_log_yaml(
+            machine=machine,
+            action_result=result,
+            total_time=round(total_time, 2),
+            action_name=action_name,
+            commands=commands_log
+        )
+
+        print(f"\nACTION {action_name} on {machine}: {result}, see logs for more info\n")
+        results.append((action_name, result, round(total_time, 2)))
+    return results
+
+
+def print_fanout_summary(target, results):
+    """
+    Print one aggregated summary of the per-machine results of a selector.
+    """
+    counts = {}
+    lines = []
+    for machine, machine_results in results.items():
+        if isinstance(machine_results, Exception):
+            counts["Error"] = counts.get("Error", 0) + 1
+            lines.append(f"  {machine:<20} {'-':<20} Error    {machine_results}")
+            continue
+        for action_name, result, total_time in machine_results:
+            counts[result] = counts.get(result, 0) + 1
+            lines.append(f"  {machine:<20} {action_name:<20} {result:<8} {total_time}s")
+
+    totals = ", ".join(f"{count} {result}" for result, count in sorted(counts.items()))
+    print(f"\nSUMMARY '{target}' ({len(results)} machines): {totals}")
+    print("\n".join(lines) + "\n")
 
 
 def run_action(cmd_manager, machine, action_name, cli_params=None):
+    """
+    Traced entry point of the action engine, see _run_action.
+    Returns: (result, total_time, commands_log)
+    """
+    with tracer.span(f"action:{action_name}", cat="action", machine=machine, action=action_name,
+                     params=cli_params or {}) as span:
+        with metrics.timed(metrics.action_duration, machine=machine):
+            result, action_time, commands_log = _run_action(cmd_manager, machine, action_name, cli_params)
+        span.set(result=result)
+        metrics.actions_total.inc(machine=machine, action=action_name, result=result)
+        return result, action_time, commands_log
+
+
+def _run_action(cmd_manager, machine, action_name, cli_params=None):
     """
     Execute a single action with support for:
       - Simple commands
       - Compound commands (AND/OR)
       - Calls to sub-actions
+      - Traffic load steps (see traffic_load.py)
+      - Polling steps (see wait_until.py)
     Each command tuple is (cmd_str, expected, params) where:
       - cmd_str = the shell command
       - expected = expected output (optional)
@@ -219,25 +357,26 @@ def run_action(cmd_manager, machine, action_name, cli_params=None):
                     print(f"    expected: {expected}")
 
                 start = time.time()
-                stdout, stderr, code = exec_command(cmd_manager, machine, display_cmd)
+                capture, code = exec_captured(cmd_manager, machine, display_cmd, f"{action_name}_{label}", expected)
                 elapsed = round(time.time() - start, 2)
                 action_time += elapsed
                 commands_log[parent_label]["group_time"] = round(commands_log[parent_label]["group_time"] + elapsed, 2)
 
-                output = stdout.decode().strip() if stdout else (stderr.strip() if stderr else "")
                 commands_log[parent_label][label] = {
                     "command": display_cmd,
                     "expected": expected,
-                    "output": output,
+                    "output": capture.text,
+                    **output_log_fields(capture),
+                    **correlation_log_fields(),
                     "command_time": elapsed,
                     "result": "Success"
                 }
 
-                if code != 0 or (expected and operator == "AND" and expected not in output):
+                if code != 0 or (expected and operator == "AND" and not capture.matched):
                     success = False
                     commands_log[parent_label][label]["result"] = "Fail"
                     break
-                if operator == "OR" and expected and expected in output:
+                if operator == "OR" and expected and capture.matched:
                     success = True
                     break
 
@@ -280,6 +419,27 @@ def run_action(cmd_manager, machine, action_name, cli_params=None):
             print(f"\nAction {called_action} completed successfully. Returning to {action_name}\n")
             continue
 
+        # CASE: traffic load (IDS throughput/drop benchmark)
+        if command[0] == "traffic_load":
+            from src.command_system.traffic_load import run_traffic_load
+            result, elapsed, load_log = run_traffic_load(cmd_manager, machine, command[1], combined_params)
+            action_time += round(elapsed, 2)
+            commands_log[idx] = load_log
+            if result != "Success":
+                return ("Fail", action_time, commands_log)
+            continue
+
+        # CASE: wait until a probe command succeeds (exponential backoff)
+        if command[0] == "wait_until":
+            from src.command_system.wait_until import run_wait_until
+            result, elapsed, wait_log = run_wait_until(cmd_manager, machine, command[1], combined_params,
+                                                       label=f"{action_name}_{idx}")
+            action_time += elapsed
+            commands_log[idx] = wait_log
+            if result != "Success":
+                return ("Fail", action_time, commands_log)
+            continue
+
         # CASE: simple command
         if len(command) == 2:
             cmd_str, expected = command
@@ -312,20 +472,21 @@ def run_action(cmd_manager, machine, action_name, cli_params=None):
 
 
         start = time.time()
-        stdout, stderr, code = exec_command(cmd_manager, machine, display_cmd)
+        capture, code = exec_captured(cmd_manager, machine, display_cmd, f"{action_name}_{idx}", expected)
         elapsed = round(time.time() - start, 2)
         action_time += elapsed
 
-        output = stdout.decode().strip() if stdout else (stderr.strip() if stderr else "")
         commands_log[idx] = {
             "command": display_cmd,
             "expected": expected,
-            "output": output,
+            "output": capture.text,
+            **output_log_fields(capture),
+            **correlation_log_fields(),
             "command_time": elapsed,
             "result": "Success"
         }
 
-        if code != 0 or (expected and expected not in output):
+        if code != 0 or (expected and not capture.matched):
             commands_log[idx]["result"] = "Fail"
             return ("Fail", action_time, commands_log)
 
@@ -0,0 +1,79 @@
+import time
+from datetime import datetime
+from src.command_system.utils import handle_errors, pop_option
+from src.alerts.index import alert_filter
+
+FILTER_KEYS = ("rule", "src", "dst", "source", "signature")
+DEFAULT_LAST = 20
+
+
+def parse_alert_filters(tokens):
+    """
+    Parse 'key:value' filter tokens (rule, src, dst, source, signature/msg).
+    Raises ValueError on unknown tokens.
+    """
+    filters = {}
+    for token in tokens:
+        key, sep, value = token.partition(":")
+        key = "signature" if key == "msg" else key
+        if not sep or key not in FILTER_KEYS or not value:
+            raise ValueError(f"Invalid filter '{token}' (use {', '.join(k + ':' for k in FILTER_KEYS)})")
+        filters[key] = value
+    return filters
+
+
+def format_alert(alert):
+    stamp = datetime.fromtimestamp(alert["time"]).strftime("%H:%M:%S.%f")[:-3]
+    flow = f"{alert.get('src') or '?'} -> {alert.get('dst') or '?'}"
+    return f"{stamp}  {alert['source']:<8} {str(alert['rule']):<14} {flow:<33} {alert['signature']}"
+
+
+@handle_errors
+def cmd_alerts(args, cmd_manager):
+    """
+    Show the IDS/SIEM alerts ingested from the sources of the 'alerts'
+    section of lab_conf.yaml (Snort on r5, Wazuh manager...).
+    Usage: alerts [filters] [--last=N] [--since=SECONDS] [--stats]
+
+    Filters: rule:<gid:sid|sid> src:<ip> dst:<ip> source:<snort|wazuh> msg:<regex>
+    Examples:
+      alerts                          -> last 20 alerts
+      alerts source:snort --last=50   -> last 50 Snort alerts
+      alerts dst:192.168.2.10 --since=60
+      alerts rule:10000011            -> alerts of SID 10000011
+      alerts --stats                  -> alerts per source and rule, and source status
+    """
+    collector = getattr(cmd_manager, "alert_collector", None)
+    if collector is None:
+        print("No alert sources: add an 'alerts' section to lab_conf.yaml.")
+        return
+
+    try:
+        last, args = pop_option(args, "--last")
+        since, args = pop_option(args, "--since", cast=float)
+        stats = "--stats" in args
+        filters = parse_alert_filters([token for token in args if token != "--stats"])
+    except ValueError as e:
+        print(e)
+        return
+
+    if stats:
+        print(f"\n{len(collector.index)} alerts in memory ({collector.index.total} ingested)")
+        for source in collector.sources:
+            where = f"{source.machine}:{source.path}" if hasattr(source, "machine") else source.path
+            print(f"  {source.name:<10} {where:<50} alerts: {source.count}  offset: {source.offset}  "
+                  f"errors: {source.errors}")
+        print()
+        for (source, rule, signature), count in collector.index.stats()[:last or DEFAULT_LAST]:
+            print(f"  {count:>6}  {source:<8} {str(rule):<14} {signature}")
+        return
+
+    found = collector.index.query(
+        alert_filter(**filters, since=time.time() - since if since else None),
+        limit=last or DEFAULT_LAST
+    )
+    if not found:
+        print("No alerts.")
+        return
+    for alert in found:
+        print(format_alert(alert))
@@ -0,0 +1,114 @@
+import time
+from datetime import datetime
+from src.command_system.utils import handle_errors, pop_option
+from src.command_system.fanout import run_concurrently
+from src.command_system.selectors import DEFAULT_MAX_WORKERS
+from src.capture.ring import capture_output_path
+
+
+def parse_capture_time(value):
+    """Epoch seconds or a time of today (HH:MM:SS)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.strptime(value, "%H:%M:%S")
+    return datetime.now().replace(hour=parsed.hour, minute=parsed.minute, second=parsed.second,
+                                  microsecond=0).timestamp()
+
+
+def _capture_links(args, capture_manager, default):
+    """Links named in args, '-a' for every link ('default' when args is empty)."""
+    if "-a" in args:
+        return capture_manager.links()
+    links = [token for token in args if not token.startswith("--")]
+    return links or default
+
+
+@handle_errors
+def cmd_capture(args, cmd_manager):
+    """
+    Capture the traffic of collision domains into ring files on the lab machines.
+    Usage:
+      capture start <link1> <link2> ... [--seconds=60] [--size=10] [--files=20]
+      capture stop <link1> ...
+      capture status
+      capture extract <link1> ... --last=SECONDS | --from=TIME [--to=TIME]
+
+    Each capture runs tcpdump on a router attached to the link (any machine
+    with tcpdump otherwise) and writes a new segment every --seconds or
+    --size MB, keeping the last --files segments. 'extract' writes the packets
+    of a time window (epoch or HH:MM:SS) to logs/captures/cli/.
+    Use '-a' for every collision domain.
+    Examples:
+      capture start B1 B2 --seconds=30
+      capture extract B1 --last=120
+    """
+    captures = cmd_manager.capture_manager
+    if not args:
+        print("Usage: capture start|stop|status|extract <links> [options]")
+        return
+    action, args = args[0], args[1:]
+
+    if action == "status":
+        if not captures.sessions:
+            print("No running captures.")
+            return
+        for link, session in list(captures.sessions.items()):
+            segments = session.segments()
+            size = sum(s[2] for s in segments) / 1e6
+            oldest = datetime.fromtimestamp(segments[0][0]).strftime("%H:%M:%S") if segments else "-"
+            state = "running" if session.running() else "stopped"
+            print(f"  {link:<8} {session.machine}:{session.iface:<12} {state:<8} segments: {len(segments)}"
+                  f"/{session.files}  {size:.1f} MB  since {oldest}")
+        return
+
+    try:
+        if action == "start":
+            options = {}
+            for option, key in (("--seconds", "seconds"), ("--size", "size_mb"), ("--files", "files")):
+                value, args = pop_option(args, option)
+                if value is not None:
+                    options[key] = value
+            links = _capture_links(args, captures, [])
+            if not links:
+                print("You must specify at least one link.")
+                return
+            results = run_concurrently(links, lambda link: captures.start(link, **options), DEFAULT_MAX_WORKERS)
+            for link, outcome in results.items():
+                if isinstance(outcome, Exception):
+                    print(f"Error: Failed to capture {link}: {outcome}")
+                else:
+                    print(f"{link}: capturing on {outcome.machine} ({outcome.iface}) into {outcome.directory}")
+
+        elif action == "stop":
+            for link in _capture_links(args, captures, list(captures.sessions.keys())):
+                print(f"{link}: stopped" if captures.stop(link) else f"{link}: not captured")
+
+        elif action == "extract":
+            last, args = pop_option(args, "--last", cast=float)
+            start, args = pop_option(args, "--from", cast=parse_capture_time)
+            end, args = pop_option(args, "--to", cast=parse_capture_time)
+            end = end or time.time()
+            start = end - last if last else start
+            if start is None:
+                print("Specify the window with --last=SECONDS or --from=TIME.")
+                return
+            links = _capture_links(args, captures, list(captures.sessions.keys()))
+
+            def extract(link):
+                path = capture_output_path(cmd_manager.lab_folder, "cli", link, start)
+                return path, captures.extract(link, start, end, path)
+
+            results = run_concurrently(links, extract, DEFAULT_MAX_WORKERS)
+            for link, outcome in results.items():
+                if isinstance(outcome, Exception):
+                    print(f"Error: Failed to extract {link}: {outcome}")
+                elif outcome[1] is None:
+                    print(f"{link}: no segment covers the window")
+                else:
+                    print(f"{link}: {outcome[1]} packets -> {outcome[0]}")
+        else:
+            print(f"Unknown capture action: {action}")
+    except ValueError as e:
+        print(e)
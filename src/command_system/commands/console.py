@@ -0,0 +1,45 @@
+import re
+import time
+from src.command_system.utils import handle_errors, pop_option
+from src.command_system.selectors import resolve_machine_args
+
+DEFAULT_LINES = 50
+
+
+@handle_errors
+def cmd_console(args, cmd_manager):
+    """
+    Show the console output of devices captured in headless mode (start_lab.py --headless).
+    Usage: console <machine|selector> ... [--since=SECONDS] [--lines=N] [--grep=REGEX]
+    Examples:
+      console tomcat                  -> last 50 console lines of tomcat
+      console tomcat --since=600      -> console lines of the last 10 minutes
+      console -a --grep=error         -> lines matching 'error' on every device
+    """
+    capture = getattr(cmd_manager, "console_capture", None)
+    if capture is None:
+        print("Consoles are not captured: start the lab with --headless.")
+        return
+
+    try:
+        since, args = pop_option(args, "--since", cast=float)
+        lines, args = pop_option(args, "--lines")
+        pattern, args = pop_option(args, "--grep", cast=lambda value: re.compile(value, re.IGNORECASE))
+    except (ValueError, re.error) as e:
+        print(e)
+        return
+    if not args:
+        print("You must specify at least one machine name.")
+        return
+
+    for machine in resolve_machine_args(args, cmd_manager):
+        log = capture.logs.get(machine)
+        if log is None:
+            print(f"{machine}: console not captured.")
+            continue
+        found = log.read(since=time.time() - since if since else None)
+        if pattern is not None:
+            found = [line for line in found if pattern.search(line)]
+        found = found[-(lines or DEFAULT_LINES):]
+        print(f"\n==== {machine} ({log.directory}) ====")
+        print("\n".join(found) if found else "(no output)")
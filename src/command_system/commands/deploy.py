@@ -1,6 +1,8 @@
 from src.command_system.utils import handle_errors
-from Kathara.manager.Kathara import Kathara
+from src.command_system.selectors import resolve_machine_args
+from src.backend.manager import get_manager, supports_terminals
 from src.lab_manager.utils.spawn_terminal import spawn_terminal
+from src.metrics import metrics
 
 @handle_errors
 def cmd_deploy(args, cmd_manager):
@@ -12,23 +14,26 @@ def cmd_deploy(args, cmd_manager):
         print("You must specify at least one machine name.")
         return
     
-    if len(args) == 1 and args[0] == "-a":
-        args = list(cmd_manager.lab.machines.keys())
+    # '-a', machine names and selectors, as in 'undeploy' (unknown names are reported)
+    machines = resolve_machine_args(args, cmd_manager)
 
     deployed = []
-    for name in args:
+    for name in machines:
         try:
-            stats_gen = Kathara.get_instance().get_machine_stats(name, lab=cmd_manager.lab)
+            stats_gen = get_manager().get_machine_stats(name, lab=cmd_manager.lab)
             stats = next(stats_gen, None)
             
             if stats is not None:
                 print(f"{name} is already running.")
                 continue
 
-            Kathara.get_instance().deploy_lab(lab=cmd_manager.lab, selected_machines=[name])
+            with metrics.timed(metrics.deploy_duration, scope="machine"):
+                get_manager().deploy_lab(lab=cmd_manager.lab, selected_machines=[name])
+            metrics.machine_up.set(1, machine=name)
             # spawn terminal if needed
             dev = cmd_manager.devices.get(name)
-            if dev and (cmd_manager.spawn_terminals or dev.get("spawn_terminal", False)):
+            headless = cmd_manager.console_capture is not None
+            if dev and supports_terminals() and not headless and (cmd_manager.spawn_terminals or dev.get("spawn_terminal", False)):
                 p = spawn_terminal(name, cmd_manager.lab_name)
                 cmd_manager.processes[name] = p
             deployed.append(name)
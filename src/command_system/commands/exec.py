@@ -0,0 +1,112 @@
+import difflib
+import time
+from src.command_system.utils import handle_errors, pop_option
+from src.command_system.selectors import resolve_machine_args
+from src.command_system.fanout import run_concurrently
+from src.command_system.commands.action import exec_command
+
+# One round of execs for a whole range: most labs have fewer machines
+DEFAULT_EXEC_WORKERS = 32
+DEFAULT_MAX_LINES = 20
+MAX_LISTED_MACHINES = 8
+
+
+def split_exec_args(args):
+    """Split 'exec' arguments at '--' into (machine arguments, command)."""
+    if "--" not in args:
+        return args, ""
+    i = args.index("--")
+    return args[:i], " ".join(args[i + 1:])
+
+
+def _text(data):
+    if isinstance(data, bytes):
+        return data.decode(errors="replace")
+    return data or ""
+
+
+def group_outputs(results):
+    """
+    Group machines with identical (exit code, output).
+    Returns [(code, output, [machines])], largest group first.
+    """
+    groups = {}
+    for machine, (code, output) in results.items():
+        groups.setdefault((code, output), []).append(machine)
+    return sorted(((code, output, machines) for (code, output), machines in groups.items()),
+                  key=lambda group: -len(group[2]))
+
+
+def format_machines(machines):
+    listed = ", ".join(machines[:MAX_LISTED_MACHINES])
+    more = len(machines) - MAX_LISTED_MACHINES
+    return f"{listed}, +{more} more" if more > 0 else listed
+
+
+def _indent(lines, max_lines):
+    shown = lines[:max_lines]
+    if len(lines) > max_lines:
+        shown.append(f"... {len(lines) - max_lines} more lines")
+    return "\n".join(f"    {line}" for line in shown)
+
+
+@handle_errors
+def cmd_exec(args, cmd_manager):
+    """
+    Run one shell command concurrently on many machines and group identical outputs.
+    Usage: exec <machine|selector> ... [--workers=N] [--lines=N] [--full] -- <command>
+
+    Machines with the same exit code and output are printed once; groups with
+    the exit code of the largest group are shown as a diff against it (--full
+    prints them as they are). --lines limits the lines printed per group (default 20).
+    Examples:
+      exec -a -- ip route
+      exec type:router -- vtysh -c 'show ip ospf neighbor'
+      exec @agents -- pgrep -c wazuh-agentd
+    """
+    machine_args, command = split_exec_args(args)
+    try:
+        workers, machine_args = pop_option(machine_args, "--workers")
+        max_lines, machine_args = pop_option(machine_args, "--lines")
+    except ValueError as e:
+        print(e)
+        return
+    full = "--full" in machine_args
+    machine_args = [token for token in machine_args if token != "--full"]
+
+    if not machine_args or not command:
+        print("Usage: exec <machine|selector> ... -- <command>")
+        return
+    machines = resolve_machine_args(machine_args, cmd_manager)
+    if not machines:
+        print("No machines to run the command on.")
+        return
+
+    def run(machine):
+        stdout, stderr, code = exec_command(cmd_manager, machine, command)
+        return code, (_text(stdout) + _text(stderr)).rstrip("\n")
+
+    start = time.time()
+    results = run_concurrently(machines, run, workers or DEFAULT_EXEC_WORKERS)
+    elapsed = time.time() - start
+    outputs = {
+        machine: (1, f"exec error: {outcome}") if isinstance(outcome, Exception) else outcome
+        for machine, outcome in results.items()
+    }
+
+    groups = group_outputs(outputs)
+    max_lines = max_lines or DEFAULT_MAX_LINES
+    reference_code, reference = groups[0][0], groups[0][1].splitlines()
+    print(f"\n{command}  ({len(machines)} machines, {len(groups)} distinct outputs, {elapsed:.2f}s)\n")
+    for n, (code, output, members) in enumerate(groups):
+        status = "OK" if code == 0 else f"exit {code}"
+        print(f"{len(members)} machine{'s' if len(members) > 1 else ''}: {status}  [{format_machines(members)}]")
+        lines = output.splitlines()
+        # outputs differing from the largest group with the same exit code: show the diff
+        if n > 0 and not full and code == reference_code and reference and lines:
+            diff = list(difflib.unified_diff(reference, lines, lineterm="", n=1))[2:]
+            if diff:
+                lines = diff
+        if lines:
+            print(_indent(lines, max_lines))
+        print()
@@ -1,5 +1,6 @@
 from src.command_system.utils import handle_errors
-from Kathara.manager.Kathara import Kathara
+from src.lab_manager.teardown import Teardown
+from src.metrics import metrics
 import os
 import sys
 
@@ -7,6 +8,8 @@ import sys
 def cmd_exit(args=None, cmd_manager=None):
     """
     Stop the lab and close all terminals.
+    Machines are stopped concurrently, force-killed after their deadline,
+    and the lab is verified to leave no containers or networks behind.
     """
     if cmd_manager is None:
         print("Error: manager not provided to cmd_exit")
@@ -15,6 +18,20 @@ def cmd_exit(args=None, cmd_manager=None):
     # Ferma il loop principale
     cmd_manager.stop_event.set()
 
+    # Stop reading alerts from machines being removed
+    if getattr(cmd_manager, "alert_collector", None) is not None:
+        cmd_manager.alert_collector.stop()
+
+    # Compress the open console segments (headless mode)
+    if getattr(cmd_manager, "console_capture", None) is not None:
+        cmd_manager.console_capture.stop()
+
+    # Record the usage peaks of this run for the next resource plans
+    if getattr(cmd_manager, "resource_sampler", None) is not None:
+        cmd_manager.resource_sampler.sample()
+        if cmd_manager.resource_sampler.stop():
+            print(f"Resource peaks saved to {cmd_manager.resource_sampler.peaks_file}")
+
     # Termina tutti i terminali aperti
     for name, p in cmd_manager.processes.items():
         if p and p.poll() is None:
@@ -23,8 +40,14 @@ def cmd_exit(args=None, cmd_manager=None):
     # Undeploy lab
     try:
         print("Stopping and removing lab...")
-        Kathara.get_instance().undeploy_lab(lab_name=cmd_manager.lab.name)
-        print("Lab stopped and removed.")
+        teardown = Teardown(cmd_manager.lab, cmd_manager.processes)
+        with metrics.timed(metrics.undeploy_duration, scope="lab"):
+            teardown.run(list(cmd_manager.lab.machines.keys()), whole_lab=True)
+        teardown.report()
+        if any(outcome == "failed" for outcome, _ in teardown.results.values()):
+            print("Lab stopped with errors, check the machines listed above.")
+        else:
+            print("Lab stopped and removed.")
     except KeyboardInterrupt:
         raise
     except Exception as e:
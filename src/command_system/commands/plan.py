@@ -1,17 +1,38 @@
+import contextvars
 import time
+from datetime import datetime
 from src.command_system.utils import handle_errors
-from src.command_system.commands.action import exec_command, run_action
+from src.command_system.commands.action import exec_captured, run_action
+from src.tracing.tracer import tracer
+from src.metrics import metrics
+from src.command_system.output_capture import output_log_fields
+from src.backend.manager import get_machine_started_at
+from src.alerts.correlation import attach_detection, command_scope, correlation_log_fields, latency_distribution
+from src.command_system.fanout import run_concurrently
+from src.command_system.plan_parser import expand_matrix
+from src.alerts.index import alert_filter
+from src.capture.ring import capture_output_path
+
+# Start time of the plan being run by this thread (expect_alert 'since: plan')
+_plan_started = contextvars.ContextVar("plan_started", default=None)
 
 @handle_errors
 def cmd_plan(args, cmd_manager):
     """
     Execute plans defined in the file plans.yaml.
-    Usage: plan <plan1> <plan2> (at least 1 plan)
+    Usage: plan <plan1> <plan2> (at least 1 plan) [--resume]
     Examples:
       plan test                 -> runs plan 'test' (machine defined inside plans.yaml)
       plan -a                   -> runs all plans
+      plan test --resume        -> skips steps already completed in the current deployment
     """
 
+    if not args:
+        print("You must specify at least one plan.")
+        return
+
+    resume = "--resume" in args
+    args = [token for token in args if token != "--resume"]
     if not args:
         print("You must specify at least one plan.")
         return
@@ -42,10 +63,14 @@ def cmd_plan(args, cmd_manager):
     # EXECUTE PLANS
     # -------------------------
     for plan_name in plans_to_run:
+        if cmd_manager.plans[plan_name].get("matrix"):
+            run_matrix_plan(cmd_manager, plan_name, resume=resume)
+            continue
+
         print(f"\nExecuting PLAN '{plan_name}'\n")
 
         start = time.time()
-        result, total_time, plan_log = run_plan(cmd_manager, plan_name)
+        result, total_time, plan_log = run_plan(cmd_manager, plan_name, resume=resume)
 
         # save the plan log using PlanLogger
         cmd_manager.plan_logger.save_plan_log_yaml(
@@ -61,18 +86,36 @@ def cmd_plan(args, cmd_manager):
 # -------------------------
 # RUN PLAN
 # -------------------------
-def run_plan(cmd_manager, plan_name):
+def run_plan(cmd_manager, plan_name, resume=False, plan=None):
     """
     Executes a plan and returns:
       (result, total_time, plan_log)
     result ∈ {"Success", "Fail"}
+    With resume=True, steps checkpointed by a previous run are skipped if
+    still valid in the current deployment.
+    plan is the definition to run instead of cmd_manager.plans[plan_name]
+    (an instance of a matrix plan).
     """
+    with tracer.span(f"plan:{plan_name}", cat="plan", plan=plan_name, resume=resume) as span:
+        with metrics.timed(metrics.plan_duration, plan=plan_name):
+            result, total_time, plan_log = _run_plan(cmd_manager, plan_name, resume, plan)
+        span.set(result=result)
+        metrics.plans_total.inc(plan=plan_name, result=result)
+        return result, total_time, plan_log
+
 
-    if plan_name not in cmd_manager.plans:
+def _run_plan(cmd_manager, plan_name, resume=False, plan=None):
+
+    plan = plan if plan is not None else cmd_manager.plans.get(plan_name)
+    if plan is None:
         return ("Fail", 0, {})
 
-    plan = cmd_manager.plans[plan_name]
     start_plan = time.time()
+    _plan_started.set(start_plan)
+
+    checkpoint = getattr(cmd_manager, "plan_checkpoint", None)
+    if checkpoint is not None and not resume:
+        checkpoint.clear(plan_name)
 
     # -------------------------
     # INITIALIZE PLAN LOG
@@ -89,38 +132,241 @@ def run_plan(cmd_manager, plan_name):
     }
 
     # -------------------------
-    # EXECUTE PREREQUISITES (NEED)
+    # PACKET CAPTURE OF THE PLAN LINKS
     # -------------------------
-    for idx, step in enumerate(plan.get("need", []), 1):
-        result = run_plan_step(cmd_manager, step, plan_log["need"]["steps"], idx)
+    capture = plan.get("capture")
+    started_captures = _start_plan_captures(cmd_manager, plan_name, capture) if capture else []
 
-        # update global success of need
-        if result != "Success":
-            plan_log["need"]["success"] = False
-            return ("Fail", round(time.time() - start_plan, 2), plan_log)
+    # -------------------------
+    # EXECUTE PREREQUISITES (NEED), THEN MAIN ACTIONS
+    # -------------------------
+    plan_result = "Success"
+    step_scopes = []
+    step_windows = []
+    for section in ("need", "actions"):
+        for idx, step in enumerate(plan.get(section, []), 1):
+            # commands of the step, matched to IDS/SIEM alerts at the end of the plan
+            step_start = time.time()
+            with command_scope(f"{plan_name}:{section}:{idx}") as scope:
+                result = run_checkpointed_step(cmd_manager, plan_name, section, step,
+                                               plan_log[section]["steps"], idx, resume,
+                                               plan.get("parameters"))
+            step_scopes.append((section, idx, scope))
+            step_windows.append((section, idx, step_start, time.time(), result))
+            metrics.plan_steps_total.inc(plan=plan_name, section=section, type=step["type"], result=result)
+
+            # update global success of the section
+            if result != "Success":
+                plan_log[section]["success"] = False
+                plan_result = "Fail"
+                break
+
+            # check global plan timeout
+            if plan.get("plan_timeout") and time.time() - start_plan > plan["plan_timeout"]:
+                plan_log[section]["success"] = False
+                plan_result = "Fail"
+                break
+        if plan_result != "Success":
+            break
+
+    total_time = round(time.time() - start_plan, 2)
 
-        # check global plan timeout
-        if plan.get("plan_timeout") and time.time() - start_plan > plan["plan_timeout"]:
-            plan_log["need"]["success"] = False
-            return ("Fail", round(time.time() - start_plan, 2), plan_log)
+    # -------------------------
+    # DETECTION LATENCY (alerts matched to the commands of each step)
+    # -------------------------
+    collector = getattr(cmd_manager, "alert_collector", None)
+    if collector is not None:
+        plan_steps = {(section, idx): step for section in ("need", "actions")
+                      for idx, step in enumerate(plan.get(section, []), 1)}
+        attach_detection(collector, cmd_manager.devices, plan_log, step_scopes, plan_steps)
 
     # -------------------------
-    # EXECUTE MAIN ACTIONS
+    # TRAFFIC OF FAILED / ALERTED STEPS
     # -------------------------
-    for idx, step in enumerate(plan.get("actions", []), 1):
-        result = run_plan_step(cmd_manager, step, plan_log["actions"]["steps"], idx)
+    if capture:
+        _extract_step_captures(cmd_manager, plan_name, capture, plan_log, step_windows)
+        for link in started_captures:
+            cmd_manager.capture_manager.stop(link)
+
+    return (plan_result, total_time, plan_log)
+
+
+def _start_plan_captures(cmd_manager, plan_name, capture):
+    """
+    Start the captures of the plan 'capture' option not already running.
+    Returns the links started (stopped again at the end of the plan).
+    """
+    captures = cmd_manager.capture_manager
+    started = []
+    for link in capture["links"]:
+        if link in captures.sessions:
+            continue
+        try:
+            captures.start(link, **capture["options"])
+            started.append(link)
+        except Exception as e:
+            print(f"[WARNING] Plan '{plan_name}': cannot capture {link}: {e}")
+    return started
+
+
+def _extract_step_captures(cmd_manager, plan_name, capture, plan_log, step_windows):
+    """
+    Write the traffic of the selected steps ('extract': failed, alerted, all)
+    from the capture rings to logs/captures/<plan>/ and list the files in
+    the step logs under 'capture'.
+    """
+    mode = capture["extract"]
+    if mode == "none":
+        return
+    captures = cmd_manager.capture_manager
+    for section, idx, start, end, result in step_windows:
+        step_log = plan_log[section]["steps"].get(idx)
+        if not isinstance(step_log, dict):
+            continue
+        alerted = (step_log.get("detection") or {}).get("alerts", 0) > 0 or (
+            step_log.get("type") == "expect_alert" and result == "Success")
+        if not (mode == "all" or (mode == "failed" and result != "Success")
+                or (mode == "alerted" and (alerted or result != "Success"))):
+            continue
+        window_start, window_end = start - capture["pad"], end + capture["pad"]
+        files = {}
+        for link in capture["links"]:
+            if link not in captures.sessions:
+                continue
+            path = capture_output_path(cmd_manager.lab_folder, plan_name, link, window_start)
+            path = path.replace(".pcap", f"_{section}{idx}.pcap")
+            try:
+                packets = captures.extract(link, window_start, window_end, path)
+            except Exception as e:
+                print(f"[WARNING] Plan '{plan_name}': cannot extract {link} for step {section}:{idx}: {e}")
+                continue
+            if packets is not None:
+                files[link] = {"file": path, "packets": packets}
+        if files:
+            step_log["capture"] = files
+
+
+# -------------------------
+# MATRIX PLAN
+# -------------------------
+def run_matrix_plan(cmd_manager, plan_name, resume=False):
+    """
+    Run every instance of a matrix plan (one per combination of the matrix
+    values), at most 'max_parallel' at a time. Each instance gets its own
+    log in logs/plans/<plan_name>/, then a summary with success rate and
+    timing statistics is saved next to them.
+    Returns the summary.
+    """
+    plan = cmd_manager.plans[plan_name]
+    instances = expand_matrix(plan_name, plan)
+    print(f"\nExecuting PLAN '{plan_name}': {len(instances)} instances, {plan['max_parallel']} in parallel\n")
+
+    # captures are shared by the instances: started once, stopped at the end
+    capture = plan.get("capture")
+    started_captures = _start_plan_captures(cmd_manager, plan_name, capture) if capture else []
+
+    def run_instance(n):
+        instance_name, combination, instance_plan = instances[n]
+        result, total_time, plan_log = run_plan(cmd_manager, instance_name, resume=resume, plan=instance_plan)
+        log_file = cmd_manager.plan_logger.save_plan_log_yaml(
+            plan_name=instance_name,
+            plan_result=result,
+            total_time=round(total_time, 2),
+            steps=plan_log,
+            folder=plan_name,
+            extra={"matrix": combination}
+        )
+        print(f"PLAN {instance_name} {combination}: {result} ({total_time:.2f}s)")
+        return result, total_time, log_file
+
+    start = time.time()
+    try:
+        results = run_concurrently(range(len(instances)), run_instance, max(1, plan["max_parallel"]))
+    finally:
+        for link in started_captures:
+            cmd_manager.capture_manager.stop(link)
+
+    rows = []
+    for (instance_name, combination, _), outcome in zip(instances, results.values()):
+        if isinstance(outcome, Exception):
+            rows.append({"instance": instance_name, "parameters": combination, "result": "Fail",
+                         "error": str(outcome)})
+        else:
+            result, total_time, log_file = outcome
+            rows.append({"instance": instance_name, "parameters": combination, "result": result,
+                         "time": round(total_time, 2), "log": log_file})
+
+    succeeded = sum(1 for row in rows if row["result"] == "Success")
+    times = [row["time"] for row in rows if "time" in row]
+    summary = {
+        "matrix": plan["matrix"],
+        "max_parallel": plan["max_parallel"],
+        "total_time": round(time.time() - start, 2),
+        "instances": len(rows),
+        "succeeded": succeeded,
+        "failed": len(rows) - succeeded,
+        "success_rate": round(succeeded / len(rows), 3) if rows else 0.0,
+        "instance_time": {**latency_distribution(times),
+                          "mean": round(sum(times) / len(times), 3) if times else None},
+        "results": rows,
+    }
+    cmd_manager.plan_logger.save_plan_summary_yaml(plan_name, summary)
 
-        # update global success of actions
-        if result != "Success":
-            plan_log["actions"]["success"] = False
-            return ("Fail", round(time.time() - start_plan, 2), plan_log)
+    print(f"\nPLAN {plan_name}: {succeeded}/{len(rows)} instances succeeded ({summary['success_rate']:.0%}), "
+          f"{summary['total_time']}s, see logs for more info\n")
+    return summary
 
-        # check global plan timeout
-        if plan.get("plan_timeout") and time.time() - start_plan > plan["plan_timeout"]:
-            plan_log["actions"]["success"] = False
-            return ("Fail", round(time.time() - start_plan, 2), plan_log)
 
-    return ("Success", round(time.time() - start_plan, 2), plan_log)
+# -------------------------
+# CHECKPOINTED STEP
+# -------------------------
+def run_checkpointed_step(cmd_manager, plan_name, section, step, log_section, idx, resume=False,
+                          plan_parameters=None):
+    """
+    Run a plan step, skipping it when resuming and a valid checkpoint exists.
+    Successful steps are checkpointed together with a fingerprint of the step,
+    of the action it runs and of the start time of the target machine.
+    """
+    checkpoint = getattr(cmd_manager, "plan_checkpoint", None)
+    # alerts of a previous run do not satisfy an expect_alert step
+    if checkpoint is None or step["type"] == "expect_alert":
+        return run_plan_step(cmd_manager, step, log_section, idx)
+
+    key = f"{section}:{idx}"
+    definition = action_definitions(cmd_manager.actions, step.get("name")) if step["type"] == "action" else None
+    fingerprint = checkpoint.fingerprint(step, definition, plan_parameters)
+
+    started_at = None
+    if resume:
+        started_at = get_machine_started_at(step["machine"], cmd_manager.lab)
+        saved_log = checkpoint.get_satisfied(plan_name, key, fingerprint, started_at)
+        if saved_log is not None:
+            print(f"Step {key} already completed on {step['machine']}, skipping (resume)")
+            log_section[idx] = {**saved_log, "resumed": True}
+            return "Success"
+
+    result = run_plan_step(cmd_manager, step, log_section, idx)
+    # only successful steps can be resumed, a failed one just replaces its checkpoint
+    if result == "Success" and started_at is None:
+        started_at = get_machine_started_at(step["machine"], cmd_manager.lab)
+    checkpoint.record(plan_name, key, fingerprint, step["machine"], started_at, result, log_section.get(idx, {}))
+    return result
+
+
+def action_definitions(actions, action_name):
+    """
+    Definitions of an action and of the actions it calls, recursively:
+    {name: definition}, so that editing a called action invalidates the checkpoint.
+    """
+    definitions = {}
+    pending = [action_name]
+    while pending:
+        name = pending.pop()
+        if name in definitions or name not in actions:
+            continue
+        definitions[name] = actions[name]
+        pending.extend(command[1] for command in actions[name]["commands"] if command[0] == "call")
+    return definitions
 
 
 # -------------------------
@@ -130,6 +376,13 @@ def run_plan_step(cmd_manager, step, log_section, idx):
     """
     Executes a single plan step.
     """
+    with tracer.span(f"step:{idx}", cat="plan", type=step.get("type"), machine=step.get("machine")) as span:
+        result = _run_plan_step(cmd_manager, step, log_section, idx)
+        span.set(result=result)
+        return result
+
+
+def _run_plan_step(cmd_manager, step, log_section, idx):
 
     machine = step["machine"]
     expected = step.get("expected", "Success")
@@ -176,18 +429,19 @@ def run_plan_step(cmd_manager, step, log_section, idx):
             command = command.replace(k, str(v))
 
         start = time.time()
-        stdout, stderr, code = exec_command(cmd_manager, machine, command)
+        capture, code = exec_captured(cmd_manager, machine, command, f"plan_step_{idx}", expected, with_stderr=False)
         elapsed = round(time.time() - start, 2)
 
-        output = stdout.decode().strip() if stdout else ""
-        result = "Success" if code == 0 and (not expected or expected in output) else "Fail"
+        result = "Success" if code == 0 and (not expected or capture.matched) else "Fail"
 
         log_section[idx] = {
             "type": "command",
             "command": command,
             "machine": machine,
             "expected": expected,
-            "output": output,
+            "output": capture.text,
+            **output_log_fields(capture),
+            **correlation_log_fields(),
             "time": elapsed,
             "result": result
         }
@@ -200,6 +454,26 @@ def run_plan_step(cmd_manager, step, log_section, idx):
 
         return result
 
+    # -------------------------
+    # STEP = WAIT UNTIL (probe command with backoff)
+    # -------------------------
+    if step["type"] == "wait_until":
+        from src.command_system.wait_until import run_wait_until
+        probe = dict(step["probe"])
+        for key in ("command", "expected"):
+            for k, v in parameters.items():
+                if probe[key]:
+                    probe[key] = str(probe[key]).replace(k, str(v))
+        result, _, wait_log = run_wait_until(cmd_manager, machine, probe, label=f"plan_step_{idx}")
+        log_section[idx] = {"type": "wait_until", "machine": machine, **wait_log}
+        return result
+
+    # -------------------------
+    # STEP = EXPECT ALERT
+    # -------------------------
+    if step["type"] == "expect_alert":
+        return _expect_alert(cmd_manager, step, log_section, idx)
+
     # -------------------------
     # UNKNOWN STEP
     # -------------------------
@@ -208,3 +482,57 @@ def run_plan_step(cmd_manager, step, log_section, idx):
         "error": f"Unsupported step type: {step}"
     }
     return "Fail"
+
+
+# -------------------------
+# EXPECT ALERT
+# -------------------------
+def _expect_alert(cmd_manager, step, log_section, idx):
+    """
+    Block until an ingested alert matches the step filters or the step
+    timeout expires. Alerts count from the start of the plan (since: plan),
+    of the step (since: step) or from N seconds before the step (since: N).
+    """
+    filters = {}
+    for key, value in step["filters"].items():
+        value = str(value)
+        for k, v in step.get("parameters", {}).items():
+            value = value.replace(k, str(v))
+        filters[key] = value
+
+    start = time.time()
+    since = step.get("since", "plan")
+    if since == "plan":
+        since_time = _plan_started.get() or start
+    elif since == "step":
+        since_time = start
+    else:
+        since_time = start - float(since)
+
+    log_section[idx] = {
+        "type": "expect_alert",
+        "filters": filters,
+        "since": datetime.fromtimestamp(since_time).isoformat(timespec="milliseconds"),
+        "timeout": step["timeout"],
+    }
+    collector = getattr(cmd_manager, "alert_collector", None)
+    if collector is None:
+        log_section[idx].update(result="Fail", error="No alert sources (missing 'alerts' in lab_conf.yaml)")
+        print("expect_alert: no alert sources configured")
+        return "Fail"
+
+    print(f"Waiting up to {step['timeout']}s for an alert matching {filters}")
+    alert = collector.index.wait_for(alert_filter(**filters, since=since_time), float(step["timeout"]))
+    log_section[idx]["time"] = round(time.time() - start, 2)
+    if alert is None:
+        log_section[idx].update(result="Fail", error="No matching alert before the deadline")
+        return "Fail"
+
+    log_section[idx].update(
+        result="Success",
+        alert={k: alert.get(k) for k in ("source", "rule", "signature", "src", "dst", "host")},
+        alert_time=datetime.fromtimestamp(alert["time"]).isoformat(timespec="milliseconds"),
+        latency=round(alert["time"] - since_time, 3),
+    )
+    print(f"Alert received: [{alert['source']}] {alert['signature']}")
+    return "Success"
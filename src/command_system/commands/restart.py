@@ -1,21 +1,88 @@
-from src.command_system.utils import handle_errors
-from Kathara.manager.Kathara import Kathara
+import time
+from src.command_system.utils import handle_errors, CommandFailure
+from src.command_system.selectors import resolve_machine_args
+from src.command_system.fanout import run_concurrently
+from src.lab_manager.snapshots import soft_restart, restore_snapshot, snapshot_tag, image_exists, device_snapshot_key
+from src.lab_manager.utils.spawn_terminal import spawn_terminal
+from src.backend.manager import supports_terminals
 
 @handle_errors
 def cmd_restart(args, cmd_manager):
     """
     Restart machines in the lab.
-    Usage: restart <machine1> <machine2>
+    Usage: restart [--soft | --snapshot] <machine1> <machine2>
     Example: restart pc1 caldera
+
+    Modes:
+      (default)    undeploy and deploy the machines again (full rebuild)
+      --soft       restart the existing containers in parallel and re-run only
+                   the startup script (network attachments and files are kept)
+      --snapshot   redeploy each machine from its committed post-startup image,
+                   running only the startup steps not stored in the image
     """
     if not args:
         print("You must specify at least one machine name.")
         return
+
+    mode = "full"
+    for flag in ("--soft", "--snapshot"):
+        if flag in args:
+            mode = flag[2:]
+            args = [a for a in args if a != flag]
+
     if len(args) == 1 and args[0] == "-a":
         print("\nRestarting all machines:")
-        args = list(cmd_manager.lab.machines.keys())
-    #print(args)  
-    cmd_manager.run_command("undeploy",args)
-    cmd_manager.run_command("deploy",args)
+    if mode == "full":
+        #print(args)
+        undeployed = cmd_manager.run_command("undeploy",args)
+        deployed = cmd_manager.run_command("deploy",args)
+        # report a failed step to the caller (API jobs)
+        return next((r for r in (undeployed, deployed) if isinstance(r, CommandFailure)), None)
+
+    machines = resolve_machine_args(args, cmd_manager)
+    if not machines:
+        print("No machines to restart.")
+        return
+
+    if mode == "soft":
+        results = run_concurrently(machines, lambda name: ("soft", _timed(soft_restart, name, cmd_manager.lab,
+                                                                          cmd_manager.lab_folder)), len(machines))
+    else:
+        results = run_concurrently(machines, lambda name: _restart_from_snapshot(name, cmd_manager), len(machines))
+
+    for name, outcome in results.items():
+        if isinstance(outcome, Exception):
+            print(f"Error: Failed to restart machine {name}: {outcome}")
+        else:
+            used, elapsed = outcome
+            print(f"{name}: restarted ({used}) in {elapsed:.2f}s")
+
+
+def _timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def _restart_from_snapshot(name, cmd_manager):
+    """
+    Restore one machine from the snapshot matching its current key (as
+    start_lab.py --from-snapshot), falling back to a soft restart when the
+    image, assets or startup file changed since the last snapshot.
+    """
+    key = device_snapshot_key(cmd_manager.lab, cmd_manager.lab_folder, name, cmd_manager.devices)
+    tag = snapshot_tag(cmd_manager.lab_name, name, key)
+    if not image_exists(name, cmd_manager.lab, tag):
+        print(f"No up-to-date snapshot image {tag} for {name}, performing a soft restart.")
+        return "soft", _timed(soft_restart, name, cmd_manager.lab, cmd_manager.lab_folder)
 
+    p = cmd_manager.processes.get(name)
+    if p and p.poll() is None:
+        p.terminate()
+    elapsed = _timed(restore_snapshot, name, cmd_manager.lab, tag, cmd_manager.lab_folder)
 
+    dev = cmd_manager.devices.get(name)
+    headless = cmd_manager.console_capture is not None
+    if dev and supports_terminals() and not headless and (cmd_manager.spawn_terminals or dev.get("spawn_terminal", False)):
+        cmd_manager.processes[name] = spawn_terminal(name, cmd_manager.lab_name)
+    return "snapshot", elapsed
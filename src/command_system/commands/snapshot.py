@@ -0,0 +1,54 @@
+import time
+from src.command_system.utils import handle_errors
+from src.command_system.selectors import resolve_machine_args, DEFAULT_MAX_WORKERS
+from src.command_system.fanout import run_concurrently
+from src.backend.manager import get_local_image_id
+from src.lab_manager.snapshots import commit_snapshot, device_snapshot_key, snapshot_tag, LATEST_KEY
+
+@handle_errors
+def cmd_snapshot(args, cmd_manager):
+    """
+    Commit the state of running machines into snapshot images.
+    Usage: snapshot <machine1> <machine2> ...
+    Example: snapshot -a
+
+    Run it once the startup scripts have completed. Images are tagged
+    katharange-snapshot/<lab>-<machine>:<key>, where key is a hash of the
+    device image, assets and startup file, and also as ':latest'.
+    Use 'start_lab.py --from-snapshot' to deploy them, or 'restart --snapshot'.
+    """
+    if not args:
+        print("You must specify at least one machine name.")
+        return
+
+    machines = resolve_machine_args(args, cmd_manager)
+    if not machines:
+        print("No machines to snapshot.")
+        return
+
+    results = run_concurrently(machines, lambda name: _snapshot_machine(name, cmd_manager), DEFAULT_MAX_WORKERS)
+    for name, outcome in results.items():
+        if isinstance(outcome, Exception):
+            print(f"Error: Failed to snapshot machine {name}: {outcome}")
+        else:
+            tag, elapsed = outcome
+            print(f"{name}: {tag} ({elapsed:.2f}s)" if elapsed is not None else f"{name}: {tag} is up to date")
+
+
+def _snapshot_machine(name, cmd_manager):
+    """
+    Commit one machine unless an image with its current key already exists.
+    Returns (tag, seconds spent committing or None).
+    """
+    key = cmd_manager.snapshot_keys.get(name)
+    if key is None:
+        key = device_snapshot_key(cmd_manager.lab, cmd_manager.lab_folder, name, cmd_manager.devices)
+        cmd_manager.snapshot_keys[name] = key
+
+    tag = snapshot_tag(cmd_manager.lab_name, name, key)
+    if get_local_image_id(tag):
+        return tag, None
+
+    start = time.time()
+    commit_snapshot(name, cmd_manager.lab, tag, aliases=(LATEST_KEY,))
+    return tag, time.time() - start
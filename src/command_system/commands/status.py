@@ -1,13 +1,15 @@
 from src.command_system.utils import handle_errors
-from Kathara.manager.Kathara import Kathara
+from src.command_system.fanout import run_concurrently
+from src.backend.manager import get_manager
+
+# Stats queries wait on the backend (one per machine, on several hosts for
+# multi-host labs): fetch them all at once, print them in order
+DEFAULT_STATUS_WORKERS = 16
+
 
 def get_stats(machine, cmd_manager):
-    stats_gen = Kathara.get_instance().get_machine_stats(machine, lab=cmd_manager.lab)
-    stats = next(stats_gen, None)
-    if stats:
-        print(stats)
-    else:
-        print(f"{machine}: Not running")
+    stats_gen = get_manager().get_machine_stats(machine, lab=cmd_manager.lab)
+    return next(stats_gen, None)
 
 @handle_errors
 def cmd_status(args, cmd_manager):
@@ -25,10 +27,11 @@ def cmd_status(args, cmd_manager):
         args = list(cmd_manager.lab.machines.keys())
     
     #Specific machines case
-    for name in args:
-        try:
-            get_stats(name, cmd_manager)
-        except KeyboardInterrupt:
-            raise    
-        except:
-            print(f"{name}: Status not found")
\ No newline at end of file
+    results = run_concurrently(args, lambda name: get_stats(name, cmd_manager), DEFAULT_STATUS_WORKERS)
+    for name, stats in results.items():
+        if isinstance(stats, Exception):
+            print(f"{name}: Status not found")
+        elif stats:
+            print(stats)
+        else:
+            print(f"{name}: Not running")
@@ -1,4 +1,4 @@
-from Kathara.manager.Kathara import Kathara
+from src.backend.manager import get_manager, supports_terminals
 from src.lab_manager.utils.spawn_terminal import spawn_terminal
 
 def cmd_terminal(args, cmd_manager):
@@ -14,6 +14,10 @@ def cmd_terminal(args, cmd_manager):
         print("You must specify at least one machine name.")
         return
 
+    if not supports_terminals():
+        print("Terminals are not available with the current backend.")
+        return
+
     spawned = []
 
     if len(args) == 1 and args[0] == "-a":
@@ -22,7 +26,7 @@ def cmd_terminal(args, cmd_manager):
     try:
         for name in args:
             # Skip machines not running or not in lab
-            stats_gen = Kathara.get_instance().get_machine_stats(name, lab=cmd_manager.lab)
+            stats_gen = get_manager().get_machine_stats(name, lab=cmd_manager.lab)
             stats = next(stats_gen, None)
             if stats is None or name not in cmd_manager.lab.machines:
                 print(f"{name}: Machine not running or not found.")
@@ -1,42 +1,38 @@
-from src.command_system.utils import handle_errors
-from Kathara.manager.Kathara import Kathara
+from src.command_system.utils import handle_errors, pop_option
+from src.command_system.selectors import resolve_machine_args
+from src.lab_manager.teardown import Teardown, DEFAULT_TIMEOUT, DEFAULT_WORKERS
 
 @handle_errors
 def cmd_undeploy(args, cmd_manager):
     """
     Undeploy specific machines in the lab.
-    Usage: undeploy <machine1> <machine2> ...
+    Usage: undeploy <machine1> <machine2> ... [--timeout=SECONDS] [--workers=N]
+
+    Machines are stopped concurrently (default 8 at a time). A machine still
+    running after the timeout (default 30s) is force-killed.
     """
+    try:
+        timeout, args = pop_option(args or [], "--timeout", float)
+        workers, args = pop_option(args, "--workers")
+    except ValueError as e:
+        print(e)
+        return
+
     if not args:
         print("You must specify at least one machine name.")
         return
 
-    if len(args) == 1 and args[0] == "-a":
-        args = list(cmd_manager.lab.machines.keys())
-    
-    undeployed = []
-    for name in args:
-        try:
-            stats_gen = Kathara.get_instance().get_machine_stats(name, lab=cmd_manager.lab)
-            stats = next(stats_gen, None)
-            
-            if stats is None:
-                print(f"{name} is already stopped.")
-                continue
-
-            Kathara.get_instance().undeploy_lab(lab=cmd_manager.lab, selected_machines=[name])
-            # terminate terminal if it exists
-            p = cmd_manager.processes.get(name)
-            if p and p.poll() is None:
-                p.terminate()
-                print(f"Terminal for {name} closed.")
-            undeployed.append(name)
-        except KeyboardInterrupt:
-            raise
-        except Exception as e:
-            print(f"Error: Failed to undeploy machine {name}: {e}")
+    machines = resolve_machine_args(args, cmd_manager)
+    teardown = Teardown(cmd_manager.lab, cmd_manager.processes,
+                        timeout=timeout or DEFAULT_TIMEOUT, max_workers=workers or DEFAULT_WORKERS)
+    results = teardown.run(machines)
 
+    for name, (outcome, _) in results.items():
+        if outcome == "not running":
+            print(f"{name} is already stopped.")
+    undeployed = [name for name in machines if results.get(name, ("",))[0] in ("removed", "killed")]
     if undeployed:
+        teardown.report()
         print(f"Machines undeployed: {', '.join(undeployed)}")
     else:
-        print("No machines were undeployed")
\ No newline at end of file
+        print("No machines were undeployed")
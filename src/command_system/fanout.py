@@ -0,0 +1,29 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_concurrently(items, func, max_workers):
+    """
+    Run func(item) for every item with at most max_workers threads.
+    Returns {item: result} in the order of items. Exceptions raised by func
+    are returned as results so that one failing machine does not hide the others.
+    """
+    items = list(items)
+    if not items:
+        return {}
+
+    def call(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return e
+
+    if max_workers <= 1 or len(items) == 1:
+        return {item: call(item) for item in items}
+
+    # Each worker runs in a copy of the caller context (e.g. the output
+    # routing of a remote API job)
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        results = list(executor.map(lambda pair: pair[0].run(call, pair[1]), zip(contexts, items)))
+    return dict(zip(items, results))
@@ -0,0 +1,184 @@
+import gzip
+import os
+from datetime import datetime
+
+DEFAULT_HEAD_BYTES = 8192
+DEFAULT_TAIL_BYTES = 8192
+
+
+class OutputCapture:
+    """
+    Bounded capture of a command output stream.
+
+    Keeps at most head_bytes + tail_bytes in memory. When the stream is larger,
+    the full output is spilled to a gzip sidecar file (created lazily at
+    spill_path, or the path returned by spill_path when it is a function)
+    and only the head/tail window is kept for logs.
+    The expected string is searched incrementally over the complete stream,
+    including matches spanning two chunks.
+    """
+
+    def __init__(self, head_bytes=DEFAULT_HEAD_BYTES, tail_bytes=DEFAULT_TAIL_BYTES,
+                 expected=None, spill_path=None):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spill_path = spill_path
+        self.expected = expected.encode() if isinstance(expected, str) and expected else None
+        self.matched = self.expected is None
+        self.total_bytes = 0
+        self.buffer = bytearray()
+        self.head = None
+        self.tail = bytearray()
+        self.spill = None
+        self._carry = b""
+
+    @property
+    def truncated(self):
+        return self.head is not None
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        self.total_bytes += len(chunk)
+        self._match(chunk)
+
+        if self.head is None:
+            self.buffer += chunk
+            if len(self.buffer) <= self.head_bytes + self.tail_bytes:
+                return
+            # Window exceeded: keep head, start spilling the full stream
+            self.head = bytes(self.buffer[:self.head_bytes])
+            self.tail = bytearray(self.buffer[-self.tail_bytes:]) if self.tail_bytes else bytearray()
+            self._open_spill()
+            self._write_spill(self.buffer)
+            self.buffer = bytearray()
+            return
+
+        self._write_spill(chunk)
+        if self.tail_bytes:
+            self.tail += chunk[-self.tail_bytes:]
+            del self.tail[:-self.tail_bytes]
+
+    def close(self):
+        if callable(self.spill_path):
+            # the window was never exceeded: nothing was spilled
+            self.spill_path = None
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+    @property
+    def data(self):
+        """Captured bytes: full output if small, head + omission marker + tail otherwise."""
+        if self.head is None:
+            return bytes(self.buffer)
+        omitted = self.total_bytes - len(self.head) - len(self.tail)
+        return self.head + f"\n... [{omitted} bytes omitted] ...\n".encode() + bytes(self.tail)
+
+    @property
+    def text(self):
+        """Output for logs: full output if small, head/tail window otherwise."""
+        if self.head is None:
+            return self.buffer.decode(errors="replace").strip()
+        omitted = self.total_bytes - len(self.head) - len(self.tail)
+        marker = f"\n... [{omitted} bytes omitted"
+        marker += f", full output in {self.spill_path}]" if self.spill_path else "]"
+        return (self.head.decode(errors="replace") + marker + " ...\n"
+                + self.tail.decode(errors="replace")).strip()
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _match(self, chunk):
+        if self.matched:
+            return
+        window = self._carry + chunk
+        if self.expected in window:
+            self.matched = True
+            self._carry = b""
+            return
+        keep = len(self.expected) - 1
+        self._carry = window[-keep:] if keep else b""
+
+    def _open_spill(self):
+        if callable(self.spill_path):
+            self.spill_path = self.spill_path()
+        if not self.spill_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            self.spill = gzip.open(self.spill_path, "wb")
+        except OSError as e:
+            print(f"[WARNING] Cannot write output file {self.spill_path}: {e}")
+            self.spill_path = None
+
+    def _write_spill(self, data):
+        if self.spill is not None:
+            self.spill.write(data)
+
+
+class CommandCapture:
+    """
+    Bounded captures of the stdout and stderr streams of one command.
+    The output used for logs and expected matching is stdout when the
+    command printed any, stderr otherwise.
+    """
+
+    def __init__(self, stdout, stderr=None):
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def feed(self, stdout, stderr):
+        self.stdout.feed(stdout)
+        if self.stderr is not None:
+            self.stderr.feed(stderr)
+
+    def close(self):
+        for capture in (self.stdout, self.stderr):
+            if capture is not None:
+                capture.close()
+
+    @property
+    def output(self):
+        if self.stdout.total_bytes or self.stderr is None:
+            return self.stdout
+        return self.stderr
+
+
+def command_capture(cmd_manager, machine, label, expected=None, with_stderr=True):
+    """
+    CommandCapture with the session's head/tail window. Outputs larger than
+    the window are spilled next to the action logs of the machine.
+    """
+    head_bytes, tail_bytes = getattr(cmd_manager, "output_window", (DEFAULT_HEAD_BYTES, DEFAULT_TAIL_BYTES))
+    action_logger = getattr(cmd_manager, "action_logger", None)
+
+    def capture(suffix):
+        def spill_path():
+            # resolved when the window is exceeded, so small outputs create no folder
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            return os.path.join(action_logger.get_output_dir(machine), f"{timestamp}_{label}{suffix}.gz")
+        return OutputCapture(head_bytes, tail_bytes, expected=expected,
+                             spill_path=spill_path if action_logger is not None else None)
+
+    return CommandCapture(capture(".out"), capture(".err") if with_stderr else None)
+
+
+def close_command_capture(cmd_manager, capture):
+    """Close the captures and hand the spilled files to the log owner; returns the output capture."""
+    capture.close()
+    action_logger = getattr(cmd_manager, "action_logger", None)
+    for stream in (capture.stdout, capture.stderr):
+        if stream is not None and stream.truncated and stream.spill_path and action_logger is not None:
+            action_logger.set_owner(stream.spill_path)
+    return capture.output
+
+
+def output_log_fields(capture):
+    """Extra log fields describing a truncated output."""
+    if not capture.truncated:
+        return {}
+    fields = {"output_bytes": capture.total_bytes}
+    if capture.spill_path:
+        fields["output_file"] = capture.spill_path
+    return fields
@@ -1,4 +1,12 @@
+import copy
+import itertools
 import yaml
+from src.command_system.wait_until import normalize_wait_until
+
+# Steps whose traffic is extracted from the plan captures
+CAPTURE_EXTRACT_MODES = ("failed", "alerted", "all", "none")
+# Plan instances of a matrix run at the same time
+DEFAULT_MAX_PARALLEL = 4
 
 
 def parse_plans(filename: str):
@@ -9,6 +17,24 @@ def parse_plans(filename: str):
     parsed_plans = {}
 
     def normalize_plan_step(step: dict):
+        # wait for an IDS/SIEM alert (no machine needed)
+        if "expect_alert" in step:
+            filters = step["expect_alert"]
+            if not isinstance(filters, dict) or not filters:
+                raise ValueError(f"'expect_alert' must be a dict of filters: {step}")
+            unknown = set(filters) - {"rule", "src", "dst", "source", "signature"}
+            if unknown:
+                raise ValueError(f"Unknown expect_alert filters {sorted(unknown)}: {step}")
+            return {
+                "type": "expect_alert",
+                "machine": None,
+                "filters": filters,
+                "since": step.get("since", "plan"),
+                "timeout": step.get("timeout", 30),
+                "expected": step.get("expected", "Success"),
+                "parameters": step.get("parameters", {})
+            }
+
         if "machine" not in step:
             raise ValueError(f"Plan step missing 'machine': {step}")
 
@@ -18,6 +44,9 @@ def parse_plans(filename: str):
             "expected": step.get("expected", "Success"),
             "parameters": step.get("parameters", {})
         }
+        # optional alert expected for the step (see src/alerts/correlation.py)
+        if step.get("detect"):
+            base["detect"] = step["detect"]
 
         if "action" in step:
             return {
@@ -33,8 +62,50 @@ def parse_plans(filename: str):
                 **base
             }
 
+        if "wait_until" in step:
+            # 'expected' and 'timeout' of the step are the ones of the probe
+            probe = step["wait_until"] if isinstance(step["wait_until"], dict) else {"command": step["wait_until"]}
+            probe = {**probe, **{k: step[k] for k in ("expected", "timeout") if k in step}}
+            return {
+                "type": "wait_until",
+                "probe": normalize_wait_until(probe),
+                **base
+            }
+
         raise ValueError(f"Unsupported plan step: {step}")
 
+    def normalize_capture(plan_name, capture):
+        if not capture:
+            return None
+        if isinstance(capture, (str, list)):
+            capture = {"links": capture}
+        if not isinstance(capture, dict) or not capture.get("links"):
+            raise ValueError(f"'capture' in plan '{plan_name}' must list the links to capture")
+        extract = capture.get("extract", "alerted")
+        if extract not in CAPTURE_EXTRACT_MODES:
+            raise ValueError(f"'capture.extract' in plan '{plan_name}' must be one of {CAPTURE_EXTRACT_MODES}")
+        links = capture["links"]
+        return {
+            "links": [str(link) for link in (links if isinstance(links, list) else [links])],
+            "options": {key: int(capture[option]) for option, key in
+                        (("seconds", "seconds"), ("size", "size_mb"), ("files", "files")) if option in capture},
+            "extract": extract,
+            "pad": float(capture.get("pad", 5)),
+        }
+
+    def normalize_matrix(plan_name, matrix):
+        if not matrix:
+            return None
+        if not isinstance(matrix, dict):
+            raise ValueError(f"'matrix' in plan '{plan_name}' must map parameters to lists of values")
+        normalized = {}
+        for name, values in matrix.items():
+            values = values if isinstance(values, list) else [values]
+            if not values:
+                raise ValueError(f"'matrix.{name}' in plan '{plan_name}' has no values")
+            normalized[str(name)] = values
+        return normalized
+
     for plan_name, plan_data in plans.items():
         if not isinstance(plan_data, dict):
             raise ValueError(f"Plan '{plan_name}' must be a dict")
@@ -42,6 +113,9 @@ def parse_plans(filename: str):
         parsed_plans[plan_name] = {
             "plan_timeout": plan_data.get("plan_timeout"),
             "parameters": plan_data.get("parameters", {}),
+            "capture": normalize_capture(plan_name, plan_data.get("capture")),
+            "matrix": normalize_matrix(plan_name, plan_data.get("matrix")),
+            "max_parallel": int(plan_data.get("max_parallel", DEFAULT_MAX_PARALLEL)),
             "need": [],
             "actions": []
         }
@@ -57,3 +131,48 @@ def parse_plans(filename: str):
                 )
     return parsed_plans
 
+
+
+def _substitute(value, combination):
+    """Replace the matrix parameters in every string of a step."""
+    if isinstance(value, str):
+        # longest names first, so '$IP' does not replace the start of '$IP6'
+        for name in sorted(combination, key=len, reverse=True):
+            value = value.replace(name, str(combination[name]))
+        return value
+    if isinstance(value, dict):
+        return {k: _substitute(v, combination) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, combination) for v in value]
+    return value
+
+
+def expand_matrix(plan_name: str, plan: dict):
+    """
+    Expand a plan with a 'matrix' into one independent plan per combination
+    of the matrix values. Returns [(instance_name, combination, plan)];
+    a plan without matrix is returned as its only instance.
+
+    Matrix parameters are replaced in every step field (machine, command,
+    filters, parameter values) and passed as parameters to the actions;
+    parameters set on a step take precedence.
+    """
+    if not plan.get("matrix"):
+        return [(plan_name, {}, plan)]
+
+    names = list(plan["matrix"])
+    instances = []
+    for n, values in enumerate(itertools.product(*(plan["matrix"][name] for name in names)), 1):
+        combination = dict(zip(names, values))
+        instance = copy.deepcopy(plan)
+        instance["matrix"] = None
+        instance["parameters"] = {**plan.get("parameters", {}), **combination}
+        for section in ("need", "actions"):
+            steps = []
+            for step in plan.get(section, []):
+                step = _substitute(step, combination)
+                step["parameters"] = {**combination, **step.get("parameters", {})}
+                steps.append(step)
+            instance[section] = steps
+        instances.append((f"{plan_name}-{n}", combination, instance))
+    return instances
@@ -0,0 +1,131 @@
+import fnmatch
+
+SELECTOR_KINDS = ("type", "image", "link", "name", "group")
+DEFAULT_MAX_WORKERS = 4
+
+
+class DeviceIndex:
+    """
+    Precomputed index of lab devices used to resolve machine selectors.
+
+    Selector syntax:
+      type:<type>     devices with the given type (e.g. type:router)
+      image:<glob>    devices whose image matches (e.g. image:kathara/*)
+      link:<name>     devices attached to a collision domain (e.g. link:B1)
+      name:<glob>     devices whose name matches (e.g. name:tomcat*)
+      group:<name>    devices of a group declared in lab_conf.yaml (alias: @<name>)
+    """
+
+    def __init__(self, devices: dict, groups: dict = None):
+        self.names = list(devices.keys())
+        self.by_type = {}
+        self.by_image = {}
+        self.by_link = {}
+        for name, dev in devices.items():
+            self.by_type.setdefault(str(dev.get("type")), []).append(name)
+            self.by_image.setdefault(dev.get("image"), []).append(name)
+            for link in (dev.get("interfaces") or {}).values():
+                members = self.by_link.setdefault(str(link), [])
+                if name not in members:
+                    members.append(name)
+
+        self.groups = {}
+        self.group_workers = {}
+        for group_name, group in (groups or {}).items():
+            if isinstance(group, dict):
+                members = group.get("members", [])
+                self.group_workers[group_name] = group.get("max_workers")
+            else:
+                members = group or []
+            self.groups[group_name] = self._resolve_members(group_name, members)
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _resolve_members(self, group_name, members):
+        resolved = []
+        for member in members:
+            member = str(member)
+            if member in self.names:
+                names = [member]
+            elif is_selector(member) and not member.startswith(("group:", "@")):
+                names = self.resolve(member) or []
+            else:
+                print(f"[WARNING] Group '{group_name}': unknown member '{member}' ignored.")
+                names = []
+            resolved.extend(n for n in names if n not in resolved)
+        return resolved
+
+    def _ordered(self, names):
+        """Return names in lab configuration order."""
+        selected = set(names)
+        return [n for n in self.names if n in selected]
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def resolve(self, selector: str):
+        """
+        Return the machines matching a selector (in lab order), or None if the
+        token is not a selector.
+        """
+        if selector.startswith("@"):
+            kind, value = "group", selector[1:]
+        elif ":" in selector and selector.split(":", 1)[0] in SELECTOR_KINDS:
+            kind, value = selector.split(":", 1)
+        else:
+            return None
+
+        if kind == "type":
+            return list(self.by_type.get(value, []))
+        if kind == "link":
+            return list(self.by_link.get(value, []))
+        if kind == "group":
+            return list(self.groups.get(value, []))
+        if kind == "image":
+            return self._ordered(n for image, names in self.by_image.items()
+                                 if image and fnmatch.fnmatchcase(image, value) for n in names)
+        if kind == "name":
+            return [n for n in self.names if fnmatch.fnmatchcase(n, value)]
+        return None
+
+    def max_workers(self, selector: str, default=DEFAULT_MAX_WORKERS):
+        """Worker limit for a selector: the group's max_workers if declared."""
+        group_name = None
+        if selector.startswith("@"):
+            group_name = selector[1:]
+        elif selector.startswith("group:"):
+            group_name = selector.split(":", 1)[1]
+        limit = self.group_workers.get(group_name) if group_name else None
+        return int(limit) if limit else default
+
+    def completions(self):
+        """Selector tokens offered by tab completion."""
+        tokens = [f"type:{t}" for t in self.by_type if t != "None"]
+        tokens += [f"link:{link}" for link in self.by_link]
+        tokens += [f"@{g}" for g in self.groups]
+        return tokens
+
+
+def is_selector(token: str):
+    return token.startswith("@") or (":" in token and token.split(":", 1)[0] in SELECTOR_KINDS)
+
+
+def resolve_machine_args(args, cmd_manager):
+    """
+    Expand CLI machine arguments ('-a', machine names and selectors) into a
+    list of machine names without duplicates. Unknown names are reported and skipped.
+    """
+    lab_machines = list(cmd_manager.lab.machines.keys())
+    if len(args) == 1 and args[0] == "-a":
+        return lab_machines
+
+    machines = []
+    for token in args:
+        if token in lab_machines:
+            names = [token]
+        elif is_selector(token):
+            names = cmd_manager.device_index.resolve(token) or []
+            if not names:
+                print(f"Selector '{token}' matches no machine.")
+        else:
+            print(f"{token}: Machine not found.")
+            names = []
+        machines.extend(n for n in names if n not in machines)
+    return machines
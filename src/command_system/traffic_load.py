@@ -0,0 +1,229 @@
+import re
+import threading
+import time
+
+# Kernel NFQUEUE counters: the inline Snort on r5 reads packets from NFQUEUE,
+# so packets queued and dropped before Snort are visible without touching Snort
+DEFAULT_SAMPLER = "cat /proc/net/netfilter/nfnetlink_queue"
+DEFAULT_COUNTERS = {"packets": "packets", "drops": "drops"}
+
+DEFAULTS = {
+    "ids": "r5",
+    "protocol": "udp",
+    "port": 80,
+    "size": 512,
+    "flows": 1,
+    "duration": 10,
+    "rates": [1000],
+    "sample_interval": 2,
+    "settle": 2,
+    "probe": True,
+    "max_drop_pct": None,
+}
+
+GENERATOR_FLAGS = {"udp": "--udp", "tcp": "-S", "icmp": "--icmp"}
+
+RTT_PATTERN = re.compile(r"min/avg/max[^=]*=\s*[\d.]+/([\d.]+)/")
+COUNTER_PATTERN = re.compile(r"^\s*([A-Za-z_][\w.\- ]*?)\s*[:=]\s*(\d+)\s*$")
+
+
+def normalize_traffic_load(config: dict):
+    """
+    Fill a traffic_load step from actions.yaml with defaults and validate it.
+    Raises ValueError on invalid steps (reported when actions.yaml is parsed).
+    """
+    if not isinstance(config, dict) or "target" not in config:
+        raise ValueError(f"traffic_load step requires a 'target': {config}")
+    step = {**DEFAULTS, **config}
+    if not isinstance(step["rates"], list):
+        step["rates"] = [step["rates"]]
+    if step["protocol"] not in GENERATOR_FLAGS and "generator" not in step:
+        raise ValueError(f"traffic_load: unsupported protocol '{step['protocol']}' (udp, tcp, icmp)")
+    step["rule_sets"] = step.get("rule_sets") or {step.get("rule_set", "current"): None}
+    step["counters"] = {**DEFAULT_COUNTERS, **(step.get("counters") or {})}
+    step.setdefault("sampler", DEFAULT_SAMPLER)
+    return step
+
+
+def _exec(cmd_manager, machine, command):
+    # Imported on first use: the action parser only needs normalize_traffic_load
+    from src.command_system.commands.action import exec_command
+    return exec_command(cmd_manager, machine, command)
+
+
+def parse_counters(text: str):
+    """
+    Parse counters from the sampler output.
+    /proc/net/netfilter/nfnetlink_queue lines give 'packets' (id_sequence),
+    'drops' (queue_dropped + user_dropped) and 'backlog'; any other output is
+    read as 'name: value' lines (e.g. Snort 'received: 123').
+    """
+    counters = {}
+    for line in (text or "").splitlines():
+        fields = line.split()
+        if len(fields) >= 8 and all(f.isdigit() for f in fields[:8]):
+            counters["packets"] = counters.get("packets", 0) + int(fields[7])
+            counters["drops"] = counters.get("drops", 0) + int(fields[5]) + int(fields[6])
+            counters["backlog"] = counters.get("backlog", 0) + int(fields[2])
+            continue
+        match = COUNTER_PATTERN.match(line)
+        if match:
+            name = match.group(1).strip().replace(" ", "_")
+            counters[name] = counters.get(name, 0) + int(match.group(2))
+    return counters
+
+
+def build_generator_command(step, rate):
+    """
+    Shell command generating `rate` packets/s towards the target, split
+    across `flows` parallel hping3 processes for `duration` seconds.
+    A custom 'generator' template may use {target} {port} {size} {rate}
+    {flows} {flow_rate} {interval_us} {duration}.
+    """
+    flows = max(1, int(step["flows"]))
+    flow_rate = max(1, int(rate) // flows)
+    values = {
+        "target": step["target"], "port": step["port"], "size": step["size"], "rate": rate,
+        "flows": flows, "flow_rate": flow_rate, "interval_us": max(1, 1_000_000 // flow_rate),
+        "duration": step["duration"],
+    }
+    if step.get("generator"):
+        return step["generator"].format(**values)
+    proto = GENERATOR_FLAGS[step["protocol"]]
+    port = f"-p {values['port']} " if step["protocol"] != "icmp" else ""
+    return (
+        f"for i in $(seq 1 {flows}); do "
+        f"timeout {values['duration']} hping3 {proto} {port}-d {values['size']} "
+        f"-i u{values['interval_us']} -q {values['target']} >/dev/null 2>&1 & "
+        f"done; wait; echo traffic_load_done"
+    )
+
+
+class CounterSampler:
+    def __init__(self, cmd_manager, ids, command, interval):
+        """
+        Periodically run the sampler command on the IDS machine in background.
+        """
+        self.cmd_manager = cmd_manager
+        self.ids = ids
+        self.command = command
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        stdout, stderr, code = _exec(self.cmd_manager, self.ids, self.command)
+        text = stdout.decode(errors="replace") if isinstance(stdout, bytes) else (stdout or "")
+        counters = parse_counters(text) if code == 0 else {}
+        self.samples.append({"t": round(time.time(), 3), **counters})
+        return counters
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+
+def _probe_latency(cmd_manager, machine, target, count):
+    """Average RTT (ms) through the IDS measured with ping while the load runs."""
+    stdout, _, code = _exec(cmd_manager, machine, f"ping -q -c {count} -i 0.2 {target}")
+    text = stdout.decode(errors="replace") if isinstance(stdout, bytes) else (stdout or "")
+    match = RTT_PATTERN.search(text)
+    return float(match.group(1)) if match else None
+
+
+def _measure_rate(cmd_manager, machine, step, rate):
+    """Run one load step and return its point of the throughput/drop curve."""
+    packets_key, drops_key = step["counters"]["packets"], step["counters"]["drops"]
+    sampler = CounterSampler(cmd_manager, step["ids"], step["sampler"], step["sample_interval"])
+    before = sampler.sample()
+    sampler.start()
+
+    latency = {}
+    probe = None
+    if step["probe"]:
+        count = max(1, int(float(step["duration"]) / 0.2) - 1)
+        probe = threading.Thread(
+            target=lambda: latency.update(ms=_probe_latency(cmd_manager, machine, step["target"], count)),
+            daemon=True
+        )
+        probe.start()
+
+    start = time.time()
+    _, stderr, code = _exec(cmd_manager, machine, build_generator_command(step, rate))
+    elapsed = time.time() - start
+    if probe:
+        probe.join()
+    sampler.stop()
+    after = sampler.sample()
+
+    packets = after.get(packets_key, 0) - before.get(packets_key, 0)
+    drops = after.get(drops_key, 0) - before.get(drops_key, 0)
+    seen = packets + drops
+    return {
+        "rate_pps": rate,
+        "throughput_pps": round(packets / elapsed, 1) if elapsed else 0.0,
+        "drops": drops,
+        "drop_pct": round(100.0 * drops / seen, 2) if seen else 0.0,
+        "latency_ms": latency.get("ms"),
+        "duration": round(elapsed, 2),
+        "generator_exit_code": code,
+        "samples": sampler.samples,
+    }, code
+
+
+def run_traffic_load(cmd_manager, machine, step, params):
+    """
+    Execute a traffic_load step from `machine`: for every rule set (activated
+    on the IDS with its command) and every rate, generate the load, sample the
+    IDS counters and record a throughput/drop/latency point.
+    Returns (result, elapsed, log).
+    """
+    from src.command_system.commands.action import substitute_params
+
+    step = {k: substitute_params(v, params) if isinstance(v, str) else v for k, v in step.items()}
+    start = time.time()
+    result = "Success"
+    curves = {}
+
+    for rule_set, activate in step["rule_sets"].items():
+        if activate:
+            print(f"[traffic_load] activating rule set '{rule_set}' on {step['ids']}")
+            _, stderr, code = _exec(cmd_manager, step["ids"], substitute_params(activate, params))
+            if code != 0:
+                print(f"[traffic_load] rule set '{rule_set}' activation failed: {stderr}")
+                curves[rule_set] = {"error": f"activation failed (exit code {code})"}
+                result = "Fail"
+                continue
+            time.sleep(float(step["settle"]))
+
+        curves[rule_set] = []
+        for rate in step["rates"]:
+            print(f"[traffic_load] {machine} -> {step['target']}: {rate} pps, {step['flows']} flows, "
+                  f"{step['duration']}s (rule set '{rule_set}')")
+            point, code = _measure_rate(cmd_manager, machine, step, rate)
+            curves[rule_set].append(point)
+            print(f"    throughput: {point['throughput_pps']} pps  drop: {point['drop_pct']}%  "
+                  f"latency: {point['latency_ms']} ms")
+            if code != 0:
+                result = "Fail"
+            if step["max_drop_pct"] is not None and point["drop_pct"] > float(step["max_drop_pct"]):
+                result = "Fail"
+
+    log = {
+        "traffic_load": {k: v for k, v in step.items() if k not in ("rule_sets",)},
+        "rule_sets": list(step["rule_sets"].keys()),
+        "curves": curves,
+        "command_time": round(time.time() - start, 2),
+        "result": result,
+    }
+    return result, time.time() - start, log
@@ -2,9 +2,18 @@
 import functools
 import atexit
 import os
-import readline
 import re
 
+class CommandFailure:
+    """Returned by a command whose error was reported by handle_errors (see API jobs)."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def __str__(self):
+        return self.error
+
+
 def handle_errors(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
@@ -12,10 +21,31 @@ def handle_errors(func):
             return func(*args, **kwargs)
         except KeyboardInterrupt:
             print("\nOperation interrupted by user (Ctrl+C).")
+            return CommandFailure("interrupted")
         except Exception as e:
             print(f"\nUnexpected error in {func.__name__}: {e}")
+            return CommandFailure(str(e) or type(e).__name__)
     return wrapper
 
+def pop_option(args, option, cast=int):
+    """
+    Remove '--option=value' tokens from args.
+    Returns (value, remaining_args); value is None if absent.
+    Raises ValueError if the value cannot be converted with cast.
+    """
+    value = None
+    remaining = []
+    for token in args:
+        if token.startswith(f"{option}="):
+            raw = token.split("=", 1)[1]
+            try:
+                value = cast(raw)
+            except ValueError:
+                raise ValueError(f"Invalid {option.lstrip('-')} value: {raw}")
+        else:
+            remaining.append(token)
+    return value, remaining
+
 def sanitize_filename(file_name: str) -> str:
     file_base = os.path.basename(file_name)
     file_clean = re.sub(r'[^A-Za-z0-9_-]', '', file_base)
@@ -29,6 +59,8 @@ def completer(cmd_manager, text, state):
         - If the first command is 'help', suggest other commands
         - Otherwise, suggest machine names
     """
+    import readline
+
     buffer = readline.get_line_buffer()
     tokens = buffer.strip().split()
     options = []
@@ -42,21 +74,24 @@ def completer(cmd_manager, text, state):
             # Second token after "help": suggest commands
             options = [cmd for cmd in cmd_manager.cmd_commands.keys() if cmd.startswith(text)]
         else:
-            # For other commands: suggest machine names
+            # For other commands: suggest machine names and selectors
             options = [m for m in cmd_manager.lab.machines.keys() if m.startswith(text)]
+            if hasattr(cmd_manager, "device_index"):
+                options += [s for s in cmd_manager.device_index.completions() if s.startswith(text)]
 
     if state < len(options):
         return options[state]
     return None
 
 
-import readline
-
 def setup_history_and_completion(cmd_manager):
     """
     Setup tab completion and in-memory command history for the current session.
     No persistent history is stored on disk.
     """
+    # readline is loaded with the interactive CLI only (not by parsers, API or benchmarks)
+    import readline
+
     # Clear any previous in-memory history
     readline.clear_history()
 
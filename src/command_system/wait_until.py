@@ -0,0 +1,102 @@
+import random
+import time
+
+DEFAULTS = {
+    "expected": None,
+    "timeout": 120,
+    "interval": 1,
+    "max_interval": 15,
+    "factor": 2,
+    "jitter": 0.2,
+}
+
+
+def normalize_wait_until(config):
+    """
+    Fill a wait_until step (actions.yaml or plans.yaml) with defaults and
+    validate it. A string is the probe command alone.
+    Raises ValueError on invalid steps.
+    """
+    if isinstance(config, str):
+        config = {"command": config}
+    if not isinstance(config, dict) or not config.get("command"):
+        raise ValueError(f"wait_until step requires a 'command': {config}")
+    step = {**DEFAULTS, **config}
+    for key in ("timeout", "interval", "max_interval", "factor", "jitter"):
+        try:
+            step[key] = float(step[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"wait_until: invalid '{key}' value: {step[key]}")
+    if step["interval"] <= 0 or step["factor"] < 1 or not 0 <= step["jitter"] < 1:
+        raise ValueError(f"wait_until: interval must be > 0, factor >= 1 and 0 <= jitter < 1: {config}")
+    return step
+
+
+def backoff_delays(step):
+    """
+    Delays between probes: interval, interval*factor, ... capped at
+    max_interval, each randomized by +/- jitter so that many waiting steps
+    do not probe in lockstep.
+    """
+    delay = step["interval"]
+    while True:
+        yield delay * random.uniform(1 - step["jitter"], 1 + step["jitter"])
+        delay = min(delay * step["factor"], step["max_interval"])
+
+
+def run_wait_until(cmd_manager, machine, step, params=None, label="wait_until"):
+    """
+    Run the probe command of a wait_until step on `machine` until it exits 0
+    and its output matches 'expected' (if set), retrying with exponential
+    backoff until 'timeout' seconds have passed.
+    Returns (result, elapsed, log).
+    """
+    # Imported here: the action and plan parsers only need normalize_wait_until
+    from src.command_system.commands.action import exec_captured, substitute_params
+    from src.command_system.output_capture import output_log_fields
+    from src.alerts.correlation import correlation_log_fields
+
+    params = params or {}
+    command = substitute_params(step["command"], params)
+    expected = substitute_params(step["expected"], params) if step["expected"] else None
+    stop_event = getattr(cmd_manager, "stop_event", None)
+
+    print(f"[wait_until] {machine}: {command}")
+    print(f"    expected: {expected}  timeout: {step['timeout']:g}s")
+
+    start = time.time()
+    deadline = start + step["timeout"]
+    delays = backoff_delays(step)
+    attempts = 0
+    while True:
+        attempts += 1
+        capture, code = exec_captured(cmd_manager, machine, command, label, expected)
+        satisfied = code == 0 and (not expected or capture.matched)
+        remaining = deadline - time.time()
+        if satisfied or remaining <= 0:
+            break
+        wait = min(next(delays), remaining)
+        if stop_event is None:
+            time.sleep(wait)
+        elif stop_event.wait(wait):
+            # the lab is being stopped: give up without waiting for the deadline
+            break
+
+    elapsed = round(time.time() - start, 2)
+    result = "Success" if satisfied else "Fail"
+    print(f"    {'satisfied' if satisfied else 'not satisfied'} after {attempts} attempts ({elapsed}s)")
+
+    log = {
+        "wait_until": command,
+        "expected": expected,
+        "output": capture.text,
+        **output_log_fields(capture),
+        **correlation_log_fields(),
+        "attempts": attempts,
+        "time_to_satisfy": elapsed if satisfied else None,
+        "command_time": elapsed,
+        "result": result,
+    }
+    if not satisfied:
+        log["error"] = f"Condition not satisfied within {step['timeout']:g}s"
+    return result, elapsed, log
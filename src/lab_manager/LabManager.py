@@ -3,14 +3,28 @@ import re
 import sys
 import yaml
 import argparse
+from src.tracing.tracer import tracer
+from src.lab_manager.snort_rules import parse_rule_config
+from src.alerts.collector import parse_alert_config
+from src.logs.console_logger import parse_console_config
+from src.lab_manager.resources import parse_resource_config
+from src.lab_manager.placement import parse_hosts_config
 
 
 class LabManager:
 
     def __init__(self, script_dir, lab_folder, lab_name):    
         self.script_dir = script_dir
+        self.lab_folder = lab_folder
         self.conf_file = os.path.join(lab_folder, "lab_conf.yaml")
         self.lab_name = lab_name
+        self.groups = {}
+        self.shared_assets = {}
+        self.snort_rules = None
+        self.alerts = None
+        self.console_logs = None
+        self.resources = None
+        self.hosts = None
 
     
     def load_lab(self):
@@ -18,13 +32,20 @@ class LabManager:
         Parse the YAML lab configuration file and return lab info + devices.
         """
         if self.conf_file:
-            with open(self.conf_file, "r") as f:
+            with tracer.span("parse_lab_conf", file=self.conf_file), open(self.conf_file, "r") as f:
                 data = yaml.safe_load(f)
         else:
             print("[ERROR] lab_conf.yaml not found.")
             return 
         lab_info = data.get("lab", {})
         devices = data.get("devices", {})
+        self.groups = data.get("groups") or {}
+        self.shared_assets = self._parse_shared_assets(data.get("shared_assets") or {})
+        self.snort_rules = parse_rule_config(data.get("snort_rules"), self.lab_folder)
+        self.alerts = parse_alert_config(data.get("alerts"))
+        self.console_logs = parse_console_config(data.get("console_logs"))
+        self.resources = parse_resource_config(data.get("resources"), self.lab_folder)
+        self.hosts = parse_hosts_config(data.get("hosts"), data.get("overlay"))
 
         # Normalize devices structure into a dictionary
         parsed_devices = {}
@@ -37,14 +58,89 @@ class LabManager:
                 "addresses": cfg.get("addresses", None),
                 "options": cfg.get("options") or {},
                 "spawn_terminal": cfg.get("spawn_terminal", False),
+                "host": cfg.get("host"),
             }
 
         return lab_info, parsed_devices
 
+    def _parse_shared_assets(self, shared_assets):
+        """
+        Normalize the 'shared_assets' section:
+            { name: {"path": <absolute host path>, "mount": <container path>,
+                     "mode": "ro"|"rw", "devices": [names/selectors] or None} }
+        'path' is relative to the lab folder, 'mount' defaults to /<basename of path>.
+        """
+        parsed = {}
+        for asset_name, cfg in shared_assets.items():
+            if isinstance(cfg, str):
+                cfg = {"path": cfg}
+            if not isinstance(cfg, dict) or not cfg.get("path"):
+                print(f"[WARNING] Shared asset '{asset_name}' must define a 'path', ignored.")
+                continue
+            path = os.path.abspath(os.path.join(self.lab_folder, cfg["path"]))
+            if not os.path.exists(path):
+                print(f"[WARNING] Shared asset '{asset_name}' not found: {path}")
+                continue
+            mode = cfg.get("mode", "ro")
+            if mode not in ("ro", "rw"):
+                print(f"[WARNING] Shared asset '{asset_name}': invalid mode '{mode}', using 'ro'.")
+                mode = "ro"
+            devices = cfg.get("devices")
+            parsed[asset_name] = {
+                "path": path,
+                "mount": cfg.get("mount") or f"/{os.path.basename(path.rstrip(os.sep))}",
+                "mode": mode,
+                "devices": [str(d) for d in devices] if devices else None,
+            }
+        return parsed
+
+    def get_shared_asset(self, path):
+        """
+        Return the shared asset declared for a host path (that start_lab.py
+        would otherwise copy into a device), or None.
+        """
+        path = os.path.abspath(path)
+        for asset in self.shared_assets.values():
+            if asset["path"] == path:
+                return asset
+        return None
+
+    def get_device_shared_assets(self, name, device_index):
+        """Return the shared assets whose 'devices' list selects the device."""
+        assets = []
+        for asset in self.shared_assets.values():
+            for member in asset["devices"] or []:
+                if member == name or name in (device_index.resolve(member) or []):
+                    assets.append(asset)
+                    break
+        return assets
+
+    @staticmethod
+    def mount_shared_asset(device, asset):
+        """Bind-mount a shared asset into a device instead of copying it."""
+        device.add_meta("volume", f"{asset['path']}|{asset['mount']}|{asset['mode']}")
+
+    def get_output_window(self, lab_info):
+        """
+        Return (head_bytes, tail_bytes) from the optional 'output_window' key of
+        the lab section, or None to use the defaults.
+        """
+        window = lab_info.get("output_window")
+        if not window:
+            return None
+        if not isinstance(window, dict):
+            print("[WARNING] 'output_window' must be a dict with 'head' and 'tail' (bytes). Using defaults.")
+            return None
+        return int(window.get("head", 8192)), int(window.get("tail", 8192))
+
     def prepare_startup_file(self, startup_file, name, dev, lab):
         """
         Create or update a startup file for a device.
         """
+        with tracer.span("prepare_startup_file", device=name):
+            self._prepare_startup_file(startup_file, name, dev, lab)
+
+    def _prepare_startup_file(self, startup_file, name, dev, lab):
         addresses = dev.get("addresses")
 
         if addresses:
@@ -0,0 +1,140 @@
+import os
+import re
+
+from src.lab_manager.LabManager import LabManager
+from src.command_system.action_parser import parse_actions
+from src.command_system.plan_parser import parse_plans, expand_matrix
+from src.command_system.selectors import DeviceIndex
+from src.lab_manager.resources import ResourceBudgetError, load_peaks, plan_resources, format_mem
+from src.lab_manager.placement import (device_weights, place_devices, cross_host_links, plan_overlay,
+                                       devices_by_host, print_placement)
+
+IFACE_PATTERN = re.compile(r"^eth\d+$")
+
+
+def _is_parameter(value):
+    return "$" in str(value) or "<" in str(value)
+
+
+def validate_devices(devices):
+    """Errors of the 'devices' section (images, interfaces, addresses)."""
+    errors = []
+    for name, dev in devices.items():
+        if not dev["image"]:
+            errors.append(f"device '{name}': missing 'image'")
+        interfaces = dev["interfaces"] or {}
+        for iface in interfaces:
+            if not IFACE_PATTERN.match(str(iface)):
+                errors.append(f"device '{name}': invalid interface '{iface}' (expected ethN)")
+        for iface in dev["addresses"] or {}:
+            if iface not in interfaces:
+                errors.append(f"device '{name}': address for '{iface}', which is not connected to a link")
+    return errors
+
+
+def validate_plans(plans, actions, devices):
+    """Errors of plan steps naming unknown machines or actions (matrix instances included)."""
+    errors = []
+    for plan_name, plan in plans.items():
+        for instance_name, _, instance in expand_matrix(plan_name, plan):
+            for section in ("need", "actions"):
+                for step in instance.get(section, []):
+                    machine = step.get("machine")
+                    if machine is not None and machine not in devices and not _is_parameter(machine):
+                        errors.append(f"plan '{instance_name}': unknown machine '{machine}'")
+                    if step["type"] == "action" and step["name"] not in actions and not _is_parameter(step["name"]):
+                        errors.append(f"plan '{instance_name}': unknown action '{step['name']}'")
+    for action_name, action in actions.items():
+        for command in action["commands"]:
+            if command[0] == "call" and command[1] not in actions:
+                errors.append(f"action '{action_name}': calls unknown action '{command[1]}'")
+    return list(dict.fromkeys(errors))
+
+
+def print_deployment(lab_info, devices, resource_plan):
+    """Devices, collision domains and limits that start_lab.py would deploy."""
+    links = {}
+    print(f"\nLab {lab_info.get('description')}: {len(devices)} devices")
+    for name, dev in devices.items():
+        limits = ""
+        if resource_plan:
+            limits = f"  cpus: {resource_plan[name]['cpus']:g}  mem: {format_mem(resource_plan[name]['mem'])}"
+        print(f"  {name:<20} {dev['image']:<36} {str(dev['type']):<10}{limits}")
+        for iface, link in (dev["interfaces"] or {}).items():
+            links.setdefault(str(link), []).append(f"{name}:{iface}")
+    print(f"\nCollision domains: {len(links)}")
+    for link, members in sorted(links.items()):
+        print(f"  {link:<10} {', '.join(members)}")
+
+
+def check_lab_config(script_dir, lab_folder, dry_run=False):
+    """
+    Validate the configuration of a lab without touching Docker: lab_conf.yaml,
+    actions.yaml, plans.yaml and the resource budget. With dry_run, also print
+    what would be deployed. Returns the exit status (0: valid).
+    """
+    errors = []
+    lab_manager = LabManager(script_dir, lab_folder, lab_name=None)
+    try:
+        lab_info, devices = lab_manager.load_lab()
+    except Exception as e:
+        print(f"lab_conf.yaml: {e}")
+        return 1
+    errors += validate_devices(devices)
+    DeviceIndex(devices, lab_manager.groups)
+
+    actions, plans = {}, {}
+    for file_name, parser in (("actions.yaml", parse_actions), ("plans.yaml", parse_plans)):
+        path = os.path.join(lab_folder, file_name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            parsed = {str(k): v for k, v in parser(path).items()}
+        except Exception as e:
+            errors.append(f"{file_name}: {e}")
+            continue
+        if file_name == "actions.yaml":
+            actions = parsed
+        else:
+            plans = parsed
+    errors += validate_plans(plans, actions, devices)
+
+    # Placement uses the host sizes of the configuration only (daemons are not queried)
+    placement, capacities, placement_report = None, None, None
+    if lab_manager.hosts:
+        hosts = lab_manager.hosts["hosts"]
+        capacities = {name: (cfg["cpus"], cfg["mem"]) if cfg["cpus"] and cfg["mem"] else None
+                      for name, cfg in hosts.items()}
+        try:
+            weights = device_weights(devices, lab_manager.resources)
+            placement = place_devices(devices, hosts, weights, capacities)
+            cross_links = cross_host_links(devices, placement)
+            placement_report = (placement, hosts, weights, cross_links, plan_overlay(cross_links, lab_manager.hosts))
+        except ValueError as e:
+            errors.append(f"hosts: {e}")
+            placement = None
+
+    resource_plan = None
+    if lab_manager.resources:
+        peaks = load_peaks(lab_manager.resources["peaks_file"])
+        try:
+            resource_plan = {}
+            for _, host_devices, capacity in devices_by_host(devices, placement, capacities):
+                resource_plan.update(plan_resources(lab_manager.resources, host_devices, host=capacity, peaks=peaks)[0])
+        except ResourceBudgetError as e:
+            errors.append(str(e))
+            resource_plan = None
+
+    if dry_run:
+        print_deployment(lab_info, devices, resource_plan)
+        if placement_report:
+            print()
+            print_placement(*placement_report)
+    if errors:
+        print(f"\n{len(errors)} configuration error{'s' if len(errors) > 1 else ''}:")
+        for error in errors:
+            print(f"  {error}")
+        return 1
+    print(f"\nConfiguration OK: {len(devices)} devices, {len(actions)} actions, {len(plans)} plans"
+          + ("\nDry run: nothing deployed." if dry_run else ""))
+    return 0
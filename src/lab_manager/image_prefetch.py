@@ -0,0 +1,76 @@
+import threading
+import time
+
+from src.backend.manager import get_manager
+from src.tracing.tracer import tracer
+
+DEFAULT_WORKERS = 4
+
+
+class ImagePrefetcher:
+    def __init__(self, images, max_workers=DEFAULT_WORKERS):
+        """
+        Check (and pull if missing) the lab images in background threads.
+
+        Parameters:
+        - images: image names, duplicates are checked once
+        - max_workers: images checked or pulled at the same time
+
+        Progress is printed per image. wait(image) blocks only until that
+        image is available and re-raises the error of a failed check.
+        """
+        self.images = list(dict.fromkeys(images))
+        self.max_workers = max(1, max_workers)
+        self.slots = threading.Semaphore(self.max_workers)
+        self.done = {image: threading.Event() for image in self.images}
+        self.errors = {}
+        self.durations = {}
+        self.print_lock = threading.Lock()
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _report(self, message):
+        with self.print_lock:
+            print(message)
+
+    def _check(self, image):
+        with self.slots:
+            start = time.time()
+            try:
+                with tracer.span("check_image", image=image):
+                    get_manager().check_image(image)
+                self.durations[image] = time.time() - start
+                self._report(f"[image] {image} ready ({self.durations[image]:.1f}s)")
+            except Exception as e:
+                self.errors[image] = e
+                self.durations[image] = time.time() - start
+                self._report(f"[image] {image} failed: {e}")
+            finally:
+                self.done[image].set()
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def start(self):
+        """Start checking every image in background (daemon threads)."""
+        if self.images:
+            self._report(f"Checking {len(self.images)} images in background...")
+        for image in self.images:
+            threading.Thread(target=self._check, args=(image,), name=f"prefetch:{image}", daemon=True).start()
+        return self
+
+    def wait(self, image):
+        """
+        Block until the image is checked. Images not known to the prefetcher
+        are checked inline. Raises the error of a failed check.
+        """
+        event = self.done.get(image)
+        if event is None:
+            get_manager().check_image(image)
+            return
+        if not event.is_set():
+            with tracer.span("wait_image", image=image):
+                event.wait()
+        if image in self.errors:
+            raise self.errors[image]
+
+    def pending(self):
+        """Images still being checked or pulled."""
+        return [image for image, event in self.done.items() if not event.is_set()]
@@ -0,0 +1,208 @@
+import re
+from urllib.parse import urlsplit
+
+from src.lab_manager.resources import DEFAULT_PROFILES, device_profile, parse_size
+
+DEFAULT_OVERLAY = {"image": "kathara/base", "port": 4789, "vni": 4000}
+# A host accepts devices up to its share of the total weight plus this margin
+# when a neighbour is already there (keeps collision domains together)
+LOCALITY_SLACK = 0.15
+
+
+def parse_hosts_config(config, overlay=None):
+    """
+    Normalize the optional 'hosts' section of lab_conf.yaml:
+        { name: {"endpoint": docker url, "address": ip reachable by the other
+                 hosts, "cpus": n, "mem": size} }
+    and the optional 'overlay' section (gateway image, base UDP port and VNI).
+    Returns None if the section is missing.
+    """
+    if not config:
+        return None
+    if not isinstance(config, dict):
+        print("[WARNING] 'hosts' must map host names to Docker endpoints, ignored.")
+        return None
+    hosts = {}
+    for name, cfg in config.items():
+        if isinstance(cfg, str):
+            cfg = {"endpoint": cfg}
+        if not isinstance(cfg, dict) or not cfg.get("endpoint"):
+            raise ValueError(f"Host '{name}' must define an 'endpoint' (e.g. tcp://10.0.0.2:2375)")
+        endpoint = str(cfg["endpoint"])
+        address = cfg.get("address") or urlsplit(endpoint).hostname
+        hosts[str(name)] = {
+            "endpoint": endpoint,
+            "address": address,
+            "cpus": float(cfg["cpus"]) if cfg.get("cpus") else None,
+            "mem": parse_size(cfg["mem"]) if cfg.get("mem") else None,
+        }
+    return {"hosts": hosts, "overlay": {**DEFAULT_OVERLAY, **(overlay or {})}}
+
+
+def device_weights(devices, resources=None):
+    """Placement weight of every device: the weight of its resource profile."""
+    config = resources or {"profiles": DEFAULT_PROFILES, "devices": {}}
+    weights = {}
+    for name, dev in devices.items():
+        _, profile = device_profile(config, dev.get("image"))
+        override = config["devices"].get(name, {})
+        weights[name] = float(override.get("weight", profile.get("weight", 1)))
+    return weights
+
+
+def host_shares(hosts, capacities=None):
+    """
+    Fraction of the lab weight each host should run: proportional to its
+    memory, else its CPUs, else equal. capacities: {host: (cpus, mem)} read
+    from the daemons, used where the configuration does not set them.
+    """
+    capacities = capacities or {}
+    for index, key in ((1, "mem"), (0, "cpus")):
+        values = {name: cfg[key] or (capacities.get(name) or (None, None))[index] for name, cfg in hosts.items()}
+        if all(values.values()):
+            total = sum(values.values())
+            return {name: value / total for name, value in values.items()}
+    return {name: 1 / len(hosts) for name in hosts}
+
+
+def place_devices(devices, hosts, weights, capacities=None):
+    """
+    Assign every device to a host. Devices pinned with 'host' keep it; the
+    others are visited link by link (breadth first from the heaviest device)
+    and go to the host holding most of their link neighbours while it stays
+    within its share of the total weight, else to the least loaded host.
+    Returns {device: host}.
+    """
+    shares = host_shares(hosts, capacities)
+    total = sum(weights.values()) or 1
+    load = {name: 0.0 for name in hosts}
+    placement = {}
+    for name, dev in devices.items():
+        if dev.get("host"):
+            if dev["host"] not in hosts:
+                raise ValueError(f"Device '{name}' is pinned to unknown host '{dev['host']}'")
+            placement[name] = dev["host"]
+            load[dev["host"]] += weights[name]
+
+    members = {}
+    for name, dev in devices.items():
+        for link in (dev.get("interfaces") or {}).values():
+            members.setdefault(str(link), []).append(name)
+
+    def neighbours(name):
+        return {other for link in (devices[name].get("interfaces") or {}).values()
+                for other in members[str(link)] if other != name}
+
+    def ratio(host, extra=0.0):
+        return (load[host] + extra) / (shares[host] * total)
+
+    pending = sorted((n for n in devices if n not in placement), key=lambda n: -weights[n])
+    queue = []
+    while pending or queue:
+        if not queue:
+            queue.append(pending[0])
+        name = queue.pop(0)
+        if name in placement:
+            continue
+        pending.remove(name)
+        near = {}
+        for other in neighbours(name):
+            if other in placement:
+                near[placement[other]] = near.get(placement[other], 0) + 1
+        fitting = [h for h in near if ratio(h, weights[name]) <= 1 + LOCALITY_SLACK]
+        if fitting:
+            host = max(fitting, key=lambda h: (near[h], -ratio(h)))
+        else:
+            host = min(hosts, key=lambda h: ratio(h, weights[name]))
+        placement[name] = host
+        load[host] += weights[name]
+        queue.extend(sorted((n for n in neighbours(name) if n not in placement), key=lambda n: -weights[n]))
+    return {name: placement[name] for name in devices}
+
+
+def cross_host_links(devices, placement):
+    """Collision domains with devices on more than one host: {link: [hosts]}."""
+    links = {}
+    for name, dev in devices.items():
+        for link in (dev.get("interfaces") or {}).values():
+            hosts = links.setdefault(str(link), [])
+            if placement[name] not in hosts:
+                hosts.append(placement[name])
+    return {link: sorted(hosts) for link, hosts in links.items() if len(hosts) > 1}
+
+
+def plan_overlay(cross_links, hosts_config):
+    """
+    Overlay gateways stitching the cross-host collision domains: one device
+    per (link, host), attached to the link and bridging it into a VXLAN
+    tunnel (one VNI per link) to the gateways of the other hosts. Each
+    gateway listens on its own UDP port, published on its host.
+    Returns {gateway name: {"host", "link", "vni", "port", "peers": [(address, port)]}}.
+    """
+    hosts, overlay = hosts_config["hosts"], hosts_config["overlay"]
+    host_index = {name: i for i, name in enumerate(hosts)}
+    gateways = {}
+    for link_index, (link, link_hosts) in enumerate(sorted(cross_links.items())):
+        if not all(hosts[host]["address"] for host in link_hosts):
+            raise ValueError(f"Link '{link}' spans hosts without an 'address': set it for unix endpoints")
+        ports = {host: int(overlay["port"]) + link_index * len(hosts) + host_index[host] for host in link_hosts}
+        for host in link_hosts:
+            name = re.sub(r"[^a-z0-9_]", "_", f"ovl_{link}_{host}".lower())
+            gateways[name] = {
+                "host": host,
+                "link": link,
+                "vni": int(overlay["vni"]) + link_index,
+                "port": ports[host],
+                "peers": [(hosts[peer]["address"], ports[peer]) for peer in link_hosts if peer != host],
+            }
+    return gateways
+
+
+def gateway_startup(gateway):
+    """Startup lines of an overlay gateway (eth0: the link, bridged interface: the underlay)."""
+    lines = [f"ip link add vx0 type vxlan id {gateway['vni']} dstport {gateway['port']}"]
+    lines += [f"bridge fdb append 00:00:00:00:00:00 dev vx0 dst {address} port {port}"
+              for address, port in gateway["peers"]]
+    lines += [
+        "ip link add br0 type bridge",
+        "ip link set eth0 master br0",
+        "ip link set vx0 master br0",
+        "ip link set eth0 up",
+        "ip link set vx0 up",
+        "ip link set br0 up",
+    ]
+    return lines
+
+
+def add_overlay_gateways(lab, gateways, image):
+    """Create the overlay gateway machines in the lab."""
+    for name, gateway in gateways.items():
+        machine = lab.new_machine(name, image=image, bridged=True, ports=[f"{gateway['port']}:{gateway['port']}/udp"])
+        machine.add_meta("type", "overlay")
+        lab.connect_machine_to_link(name, gateway["link"], machine_iface_number=0)
+        lab.create_file_from_list(gateway_startup(gateway), f"{name}.startup")
+
+
+def devices_by_host(devices, placement, capacities=None):
+    """
+    (host, {device: config}, (cpus, mem) or None) for every host, or a single
+    (None, devices, None) group without placement: the resource budget of each
+    host is planned for its own devices.
+    """
+    if not placement:
+        return [(None, devices, None)]
+    groups = {}
+    for name, host in placement.items():
+        if name in devices:
+            groups.setdefault(host, {})[name] = devices[name]
+    return [(host, group, (capacities or {}).get(host)) for host, group in groups.items()]
+
+
+def print_placement(placement, hosts, weights, cross_links, gateways):
+    print(f"Devices placed on {len(hosts)} hosts:")
+    for host, cfg in hosts.items():
+        names = [name for name, h in placement.items() if h == host and name in weights]
+        print(f"  {host:<12} {cfg['endpoint']:<32} weight {sum(weights[n] for n in names):<6g} {', '.join(names)}")
+    for link, link_hosts in sorted(cross_links.items()):
+        vni = next(g["vni"] for g in gateways.values() if g["link"] == link)
+        print(f"  overlay {link:<10} VNI {vni}: {' <-> '.join(link_hosts)}")
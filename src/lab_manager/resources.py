@@ -0,0 +1,311 @@
+import fnmatch
+import json
+import os
+import re
+import threading
+import time
+
+from src.backend.manager import get_manager
+
+# Image profiles: relative weight of the device in the host budget, memory
+# floor, and the JVM options variable sized from the memory limit (heap ratio)
+DEFAULT_PROFILES = {
+    "wazuh/wazuh-indexer*": {"weight": 6, "min_mem": "1g", "jvm_env": "OPENSEARCH_JAVA_OPTS", "heap": 0.5},
+    "wazuh/wazuh-manager*": {"weight": 3, "min_mem": "512m"},
+    "wazuh/wazuh-dashboard*": {"weight": 2, "min_mem": "512m"},
+    "caldera*": {"weight": 3, "min_mem": "512m"},
+    "snort*": {"weight": 3, "min_mem": "256m"},
+    "kali*": {"weight": 2, "min_mem": "256m"},
+    "*": {"weight": 1, "min_mem": "64m"},
+}
+DEFAULT_RESERVE = {"cpus": 1, "mem": "1g"}
+DEFAULT_MIN_CPUS = 0.25
+# Recorded peaks are used as memory floors with this margin
+PEAK_HEADROOM = 1.25
+PEAKS_FILE = os.path.join(".cache", "resources", "peaks.json")
+DEFAULT_SAMPLE_INTERVAL = 5
+MIB = 1024 * 1024
+
+SIZE_PATTERN = re.compile(r"^\s*([\d.]+)\s*([kmgt]?)(i?b?)\s*$", re.IGNORECASE)
+USAGE_PATTERN = re.compile(r"([\d.]+)\s*([KMGT]?i?B)", re.IGNORECASE)
+
+
+class ResourceBudgetError(ValueError):
+    pass
+
+
+def parse_size(value):
+    """Bytes of a size ('512m', '2g', '1.5GB', '300MiB' or a number of bytes)."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = SIZE_PATTERN.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    number, unit = float(match.group(1)), match.group(2).lower()
+    return int(number * 1024 ** " kmgt".index(unit or " "))
+
+
+def format_mem(size):
+    """Docker memory limit in MiB ('1536m')."""
+    return f"{int(size // MIB)}m"
+
+
+def host_resources():
+    """(cpus, memory bytes) of the host running the containers."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    mem = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    mem = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    if mem is None:
+        mem = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return cpus, mem
+
+
+def parse_resource_config(config, lab_folder):
+    """
+    Normalize the optional 'resources' section of lab_conf.yaml.
+    Profiles of the section are matched before the default ones.
+    Returns None if the section is missing.
+    """
+    if not config:
+        return None
+    if not isinstance(config, dict):
+        print("[WARNING] 'resources' must be a dict, resource planning disabled.")
+        return None
+    reserve = {**DEFAULT_RESERVE, **(config.get("reserve") or {})}
+    profiles = {str(k): v or {} for k, v in (config.get("profiles") or {}).items()}
+    return {
+        "reserve_cpus": float(reserve["cpus"]),
+        "reserve_mem": parse_size(reserve["mem"]),
+        "host_cpus": config.get("host_cpus"),
+        "host_mem": parse_size(config["host_mem"]) if config.get("host_mem") else None,
+        "profiles": {**profiles, **{k: v for k, v in DEFAULT_PROFILES.items() if k not in profiles}},
+        "devices": {str(k): v or {} for k, v in (config.get("devices") or {}).items()},
+        "peaks_file": os.path.join(lab_folder, config.get("peaks_file", PEAKS_FILE)),
+        "sample_interval": float(config.get("sample_interval", DEFAULT_SAMPLE_INTERVAL)),
+    }
+
+
+def device_profile(config, image):
+    """(pattern, profile) of the first profile whose image glob matches."""
+    for pattern, profile in config["profiles"].items():
+        if fnmatch.fnmatch(image or "", pattern):
+            return pattern, profile
+    return "*", DEFAULT_PROFILES["*"]
+
+
+def load_peaks(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _share(total, weights, floors, fixed):
+    """
+    Split `total` between devices proportionally to their weight, raising
+    the devices below their floor to it and sharing the rest among the others.
+    Devices in `fixed` get their fixed amount. Returns {device: amount}.
+    """
+    result = dict(fixed)
+    remaining = total - sum(fixed.values())
+    pending = {d: w for d, w in weights.items() if d not in fixed}
+    while pending:
+        weight_sum = sum(pending.values()) or 1
+        below = {d for d, w in pending.items() if remaining * w / weight_sum < floors[d]}
+        if not below:
+            result.update({d: remaining * w / weight_sum for d, w in pending.items()})
+            break
+        for d in below:
+            result[d] = floors[d]
+            remaining -= floors[d]
+            del pending[d]
+    return result
+
+
+def plan_resources(config, devices, host=None, peaks=None):
+    """
+    Compute the CPU and memory limits of every device from the host budget
+    (host resources minus the reserve), the image profiles and the per-device
+    overrides. Memory floors are raised to the recorded peaks of the image.
+    Raises ResourceBudgetError if the floors and fixed limits do not fit.
+
+    Returns {device: {"cpus", "mem", "envs", "profile"}} and the budget.
+    """
+    host_cpus, host_mem = host or host_resources()
+    host_cpus = float(config["host_cpus"] or host_cpus)
+    host_mem = config["host_mem"] or host_mem
+    # CPU limits are shared ceilings: the reserve never leaves less than one CPU
+    budget_cpus = max(host_cpus - config["reserve_cpus"], min(host_cpus, 1))
+    budget_mem = host_mem - config["reserve_mem"]
+    peaks = peaks or {}
+
+    weights, mem_floors, cpu_floors, fixed_mem, fixed_cpus, profiles = {}, {}, {}, {}, {}, {}
+    for name, dev in devices.items():
+        pattern, profile = device_profile(config, dev.get("image"))
+        override = config["devices"].get(name, {})
+        merged = {**profile, **override}
+        profiles[name] = (pattern, merged)
+        weights[name] = float(merged.get("weight", 1))
+        peak = peaks.get(dev.get("image"), {})
+        mem_floors[name] = max(parse_size(merged.get("min_mem", "64m")), int(peak.get("mem", 0) * PEAK_HEADROOM))
+        cpu_floors[name] = float(merged.get("min_cpus", DEFAULT_MIN_CPUS))
+        if "mem" in override:
+            fixed_mem[name] = parse_size(override["mem"])
+        if "cpus" in override:
+            fixed_cpus[name] = float(override["cpus"])
+
+    errors = []
+    needed_mem = sum(fixed_mem.values()) + sum(f for d, f in mem_floors.items() if d not in fixed_mem)
+    if budget_mem <= 0 or needed_mem > budget_mem:
+        errors.append(f"memory: devices need at least {format_mem(needed_mem)} "
+                      f"but the budget is {format_mem(max(budget_mem, 0))} "
+                      f"(host {format_mem(host_mem)} - reserve {format_mem(config['reserve_mem'])})")
+    if budget_cpus <= 0 or sum(fixed_cpus.values()) > budget_cpus:
+        errors.append(f"cpus: fixed limits sum to {sum(fixed_cpus.values()):g} "
+                      f"but the budget is {max(budget_cpus, 0):g} (host {host_cpus:g} - reserve {config['reserve_cpus']:g})")
+    if errors:
+        raise ResourceBudgetError("Resource budget impossible on this host:\n  " + "\n  ".join(errors))
+
+    mem = _share(budget_mem, weights, mem_floors, fixed_mem)
+    free_cpus = budget_cpus - sum(fixed_cpus.values())
+    shared = {d: w for d, w in weights.items() if d not in fixed_cpus}
+    if sum(cpu_floors[d] for d in shared) > free_cpus:
+        # CPU limits are ceilings and may be overcommitted: every device keeps
+        # its weight share (at least its floor), so heavy devices are not
+        # pinned to the floor with the others
+        weight_sum = sum(shared.values()) or 1
+        cpus = {**fixed_cpus, **{d: max(cpu_floors[d], free_cpus * w / weight_sum) for d, w in shared.items()}}
+    else:
+        cpus = _share(budget_cpus, weights, cpu_floors, fixed_cpus)
+
+    plan = {}
+    for name in devices:
+        pattern, profile = profiles[name]
+        envs = {}
+        if profile.get("jvm_env"):
+            heap = max(64, int(mem[name] * float(profile.get("heap", 0.5)) // MIB))
+            envs[profile["jvm_env"]] = f"-Xms{heap}m -Xmx{heap}m"
+        plan[name] = {
+            "cpus": round(min(cpus[name], host_cpus), 2),
+            "mem": int(mem[name]),
+            "envs": envs,
+            "profile": pattern,
+        }
+    return plan, {"cpus": budget_cpus, "mem": budget_mem}
+
+
+def apply_resource_plan(devices, plan):
+    """
+    Set the limits of the plan in the device options (Kathara 'cpus', 'mem'
+    and 'envs'), replacing the JVM variables pinned in lab_conf.yaml.
+    """
+    for name, limits in plan.items():
+        options = devices[name].setdefault("options", {})
+        options["cpus"] = limits["cpus"]
+        options["mem"] = format_mem(limits["mem"])
+        if limits["envs"]:
+            envs = [env for env in options.get("envs") or [] if env.split("=", 1)[0] not in limits["envs"]]
+            options["envs"] = envs + [f"{key}={value}" for key, value in limits["envs"].items()]
+
+
+def print_resource_plan(plan, budget):
+    print(f"Resource budget: {budget['cpus']:g} CPUs, {format_mem(budget['mem'])} memory")
+    for name, limits in plan.items():
+        envs = " ".join(f"{k}='{v}'" for k, v in limits["envs"].items())
+        print(f"  {name:<20} cpus: {limits['cpus']:<6g} mem: {format_mem(limits['mem']):<8} "
+              f"[{limits['profile']}] {envs}")
+
+
+def parse_usage(stats):
+    """(cpus, memory bytes) used by a machine, from Kathara machine stats."""
+    cpu = re.match(r"\s*([\d.]+)", str(getattr(stats, "cpu_usage", "") or ""))
+    mem = USAGE_PATTERN.search(str(getattr(stats, "mem_usage", "") or ""))
+    cpus = float(cpu.group(1)) / 100 if cpu else 0.0
+    used = 0
+    if mem:
+        unit = mem.group(2).upper().replace("I", "").rstrip("B")
+        used = int(float(mem.group(1)) * 1024 ** " KMGT".index(unit or " "))
+    return cpus, used
+
+
+class PeakSampler:
+    def __init__(self, lab, devices, peaks_file, interval=DEFAULT_SAMPLE_INTERVAL):
+        """
+        Sample the CPU and memory usage of the devices while the lab runs and
+        merge the peaks of each image into peaks_file on stop(), so that the
+        next resource plans start from the usage actually observed.
+        """
+        self.lab = lab
+        self.images = {name: dev.get("image") for name, dev in devices.items()}
+        self.peaks_file = peaks_file
+        self.interval = interval
+        self.peaks = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def sample(self):
+        for name in self.images:
+            try:
+                stats = next(get_manager().get_machine_stats(name, lab=self.lab), None)
+            except Exception:
+                continue
+            if stats is None:
+                continue
+            cpus, mem = parse_usage(stats)
+            peak = self.peaks.setdefault(name, {"cpus": 0.0, "mem": 0})
+            peak["cpus"] = max(peak["cpus"], cpus)
+            peak["mem"] = max(peak["mem"], mem)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name="resource-peaks", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop sampling and save the peaks per image: the peak of this run,
+        or the mean with the previous record if that was higher.
+        """
+        self.stop_event.set()
+        if not self.peaks:
+            return None
+        recorded = load_peaks(self.peaks_file)
+        by_image = {}
+        for name, peak in self.peaks.items():
+            image = self.images[name]
+            current = by_image.setdefault(image, {"cpus": 0.0, "mem": 0})
+            current["cpus"] = max(current["cpus"], peak["cpus"])
+            current["mem"] = max(current["mem"], peak["mem"])
+        for image, peak in by_image.items():
+            previous = recorded.get(image, {})
+            recorded[image] = {
+                "cpus": round(max(peak["cpus"], (peak["cpus"] + previous.get("cpus", 0)) / 2), 3),
+                "mem": int(max(peak["mem"], (peak["mem"] + previous.get("mem", 0)) / 2)),
+                "runs": previous.get("runs", 0) + 1,
+                "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+        try:
+            os.makedirs(os.path.dirname(self.peaks_file), exist_ok=True)
+            with open(self.peaks_file, "w") as f:
+                json.dump(recorded, f, indent=2, sort_keys=True)
+        except OSError as e:
+            print(f"[WARNING] Could not save resource peaks: {e}")
+            return None
+        return self.peaks_file
@@ -0,0 +1,234 @@
+import base64
+import hashlib
+import json
+import os
+import re
+
+from src.backend.manager import get_manager, get_local_image_id
+
+# Startup lines whose effect is stored in a post-startup snapshot (package
+# installs, copies...) end with this marker and are skipped when booting from
+# one. Unmarked lines always run: only the author knows whether a line writes
+# to the image or to runtime state (/tmp, /var/run, processes, routes).
+SKIP_MARKER = "# snapshot:skip"
+# Shell compound blocks: marked lines inside them are kept, so that removing
+# a line never leaves an empty or unbalanced block
+BLOCK_OPEN = re.compile(r"^(?!\s*elif\b).*(\b(then|do)|\{|^\s*case\b.*\bin)\s*(#.*)?$")
+BLOCK_CLOSE = re.compile(r"^\s*(fi|done|esac|\})(\s|;|&|\||>|$)")
+
+RUNTIME_STARTUP_PATH = "/tmp/katharange_{name}.startup"
+LATEST_KEY = "latest"
+KEY_LENGTH = 16
+
+
+def _docker_name(value):
+    return re.sub(r"[^a-z0-9_.-]", "-", str(value).lower()).strip("-.") or "lab"
+
+
+def snapshot_tag(lab_name, machine_name, key=LATEST_KEY):
+    """
+    Docker image tag of a machine snapshot: katharange-snapshot/<lab>-<machine>:<key>
+    """
+    return f"katharange-snapshot/{_docker_name(lab_name)}-{_docker_name(machine_name)}:{key}"
+
+
+def filter_startup_for_snapshot(lines):
+    """
+    Drop the startup lines marked '# snapshot:skip', whose effect is already
+    stored in a snapshot image. Marked lines opening or inside an
+    if/for/while/case block or a function, and continuations of a previous
+    line, are kept.
+    """
+    kept = []
+    depth = 0
+    continued = False
+    for line in lines:
+        stripped = line.rstrip()
+        if BLOCK_CLOSE.match(stripped):
+            depth = max(depth - 1, 0)
+        opens = BLOCK_OPEN.match(stripped) is not None
+        if not (stripped.endswith(SKIP_MARKER) and depth == 0 and not continued and not opens):
+            kept.append(line)
+        if opens:
+            depth += 1
+        continued = stripped.endswith("\\")
+    return kept
+
+
+def get_startup_lines(lab, machine_name, lab_folder=None):
+    """
+    Return the startup file of a machine as deployed (from the lab filesystem),
+    falling back to <lab_folder>/startups/<machine>.startup.
+    """
+    startup_name = f"{machine_name}.startup"
+    fs = getattr(lab, "fs", None)
+    try:
+        if fs is not None and fs.exists(startup_name):
+            return fs.readtext(startup_name).splitlines()
+    except Exception:
+        pass
+    if lab_folder:
+        startup_file = os.path.join(lab_folder, "startups", startup_name)
+        if os.path.isfile(startup_file):
+            with open(startup_file, "r", encoding="utf-8") as f:
+                return f.read().splitlines()
+    return []
+
+
+def device_input_paths(lab_folder, name, dev, lab_has_wazuh, startup_lines):
+    """
+    Host files copied into a device at creation (same rules as start_lab.py):
+    its assets, the Caldera agents, the Wazuh agent package and Snort rules.
+    """
+    paths = []
+    if dev.get("assets") is None:
+        paths.append(os.path.join(lab_folder, "assets", name))
+        paths.append(os.path.join(lab_folder, "assets", "routers", name))
+    else:
+        paths.extend(os.path.abspath(asset_path) for asset_path in dev["assets"])
+
+    content = "\n".join(startup_lines)
+    image = dev["image"].lower()
+    if "init_caldera" in content:
+        paths.append(os.path.join(lab_folder, "assets", "agents"))
+    if "wazuh" in content or ("snort" in image and lab_has_wazuh):
+        paths.append(os.path.join(lab_folder, "assets", "wazuh-agent_4.9.0-1_amd64.deb"))
+    if "snort" in image:
+        paths.append(os.path.join(lab_folder, "assets", "snort3"))
+    return [p for p in paths if os.path.exists(p)]
+
+
+def _hash_path(digest, path):
+    """Feed relative names and contents of a file or directory tree into digest."""
+    if os.path.isfile(path):
+        files = [(os.path.basename(path), path)]
+    else:
+        files = []
+        for root, dirs, filenames in os.walk(path):
+            dirs.sort()
+            for filename in sorted(filenames):
+                full_path = os.path.join(root, filename)
+                files.append((os.path.relpath(full_path, path), full_path))
+    for rel_path, full_path in files:
+        digest.update(rel_path.encode())
+        with open(full_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+
+def compute_snapshot_key(dev, startup_lines, input_paths):
+    """
+    Hash of everything a post-startup snapshot depends on: the base image
+    (name and local id), the machine options, the startup file and the
+    content of every copied asset. Any change gives a new key, so stale
+    snapshots are never used.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "image": dev["image"],
+        "image_id": get_local_image_id(dev["image"]),
+        "options": dev.get("options") or {},
+        "startup": list(startup_lines),
+    }, sort_keys=True, default=str).encode())
+    for path in input_paths:
+        digest.update(path.encode())
+        _hash_path(digest, path)
+    return digest.hexdigest()[:KEY_LENGTH]
+
+
+def device_snapshot_key(lab, lab_folder, name, devices):
+    """
+    Snapshot key of a device from its current startup file and inputs.
+    """
+    dev = devices[name]
+    lab_has_wazuh = any("wazuh" in d["image"].lower() for d in devices.values())
+    startup_lines = get_startup_lines(lab, name, lab_folder)
+    return compute_snapshot_key(
+        dev, startup_lines, device_input_paths(lab_folder, name, dev, lab_has_wazuh, startup_lines)
+    )
+
+
+def image_exists(machine_name, lab, tag):
+    """
+    True if the image tag exists on the Docker daemon running the lab.
+    The daemon is reached through the machine, or any other running machine.
+    """
+    for name in [machine_name] + [m for m in lab.machines.keys() if m != machine_name]:
+        try:
+            api_object = get_manager().get_machine_api_object(name, lab=lab)
+        except Exception:
+            continue
+        try:
+            api_object.client.images.get(tag)
+            return True
+        except Exception:
+            return False
+    return False
+
+
+def commit_snapshot(machine_name, lab, tag, aliases=()):
+    """
+    Commit the current filesystem of a running machine into an image tag,
+    also tagged with each key in aliases (e.g. 'latest').
+    """
+    repository, _, key = tag.rpartition(":")
+    api_object = get_manager().get_machine_api_object(machine_name, lab=lab)
+    image = api_object.commit(repository=repository, tag=key)
+    for alias in aliases:
+        image.tag(repository, tag=alias)
+    return tag
+
+
+def run_startup_detached(machine_name, lab, lines):
+    """
+    Write startup lines into the machine and run them in background,
+    logging to /var/log/startup.log like a normal boot.
+    """
+    if not any(line.strip() and not line.strip().startswith("#") for line in lines):
+        return 0
+    path = RUNTIME_STARTUP_PATH.format(name=machine_name)
+    payload = base64.b64encode("\n".join(lines).encode()).decode()
+    command = (
+        f"echo {payload} | base64 -d > {path} && "
+        f"(nohup sh {path} > /var/log/startup.log 2>&1 &)"
+    )
+    _, _, code = get_manager().exec(
+        machine_name=machine_name,
+        command=["sh", "-c", command],
+        lab=lab,
+        stream=False
+    )
+    return code
+
+
+def soft_restart(machine_name, lab, lab_folder=None, timeout=10):
+    """
+    Restart the existing container (keeping its network attachments and
+    filesystem) and re-execute the startup script.
+    """
+    api_object = get_manager().get_machine_api_object(machine_name, lab=lab)
+    api_object.restart(timeout=timeout)
+    return run_startup_detached(machine_name, lab, get_startup_lines(lab, machine_name, lab_folder))
+
+
+def restore_snapshot(machine_name, lab, tag, lab_folder=None):
+    """
+    Redeploy a machine from a snapshot image, running only the startup lines
+    not already applied in the image (addresses, routes, services).
+    The machine image and startup file are restored afterwards so that a
+    normal deploy still uses the lab configuration.
+    """
+    machine = lab.get_machine(machine_name)
+    original_image = machine.meta.get("image")
+    startup_name = f"{machine_name}.startup"
+    original_lines = get_startup_lines(lab, machine_name, lab_folder)
+
+    get_manager().undeploy_lab(lab=lab, selected_machines=[machine_name])
+    try:
+        machine.meta["image"] = tag
+        lab.create_file_from_list(filter_startup_for_snapshot(original_lines), startup_name)
+        get_manager().deploy_lab(lab, selected_machines=[machine_name])
+    finally:
+        machine.meta["image"] = original_image
+        if original_lines:
+            lab.create_file_from_list(original_lines, startup_name)
@@ -0,0 +1,329 @@
+import glob
+import hashlib
+import json
+import os
+import re
+
+from src.tracing.tracer import tracer
+
+# Where the subset is copied in the Snort devices and the configuration it overrides
+DEFAULT_MOUNT = "/snort_rules"
+DEFAULT_CONFIG = "/home/snorty/snort3/etc/snort/snort.lua"
+RULES_FILE = "selected.rules"
+LUA_FILE = "rules.lua"
+MANIFEST_FILE = "manifest.json"
+CACHE_DIR = os.path.join(".cache", "snort_rules")
+
+# Startup line launching Snort: the include is inserted just before it
+SNORT_LAUNCH_PATTERN = re.compile(r"(snort3/startup\.sh|bin/snort\b)")
+CVE_PATTERN = re.compile(r"\bCVE-(\d{4})-(\d{4,})\b", re.IGNORECASE)
+FLOWBITS_SETTERS = ("set", "setx", "toggle")
+FLOWBITS_CHECKS = ("isset", "isnotset")
+
+
+def _split_options(body):
+    """Split the option block of a rule on ';' outside quoted strings."""
+    options, current, quoted, escaped = [], "", False, False
+    for char in body:
+        if escaped:
+            current += char
+            escaped = False
+        elif char == "\\":
+            current += char
+            escaped = True
+        elif char == '"':
+            current += char
+            quoted = not quoted
+        elif char == ";" and not quoted:
+            options.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        options.append(current.strip())
+    return options
+
+
+def parse_rule(text, source):
+    """
+    Parse one Snort 3 rule into a dict with the fields used for selection:
+    sid, msg, classtype, references ("cve,2021-41773"), metadata, service
+    and flowbits ([(operation, [names])]).
+    """
+    start, end = text.find("("), text.rfind(")")
+    rule = {"text": text, "source": source, "sid": None, "msg": "", "classtype": "",
+            "references": [], "metadata": "", "service": "", "flowbits": []}
+    for option in _split_options(text[start + 1:end]):
+        key, _, value = option.partition(":")
+        key, value = key.strip(), value.strip()
+        if key == "sid" and value.isdigit():
+            rule["sid"] = int(value)
+        elif key == "msg":
+            rule["msg"] = value.strip('"')
+        elif key == "classtype":
+            rule["classtype"] = value
+        elif key == "reference":
+            rule["references"].append(value.replace(" ", "").lower())
+        elif key == "metadata":
+            rule["metadata"] = value
+        elif key == "service":
+            rule["service"] = value
+        elif key == "flowbits":
+            operation, _, names = value.partition(",")
+            rule["flowbits"].append((operation.strip(), re.split(r"[|&]", names.split(",")[0].strip())))
+    return rule
+
+
+def parse_rules_file(path):
+    """
+    Return the rules of a file. Rules may span several lines (they end with
+    the closing parenthesis); comments and blank lines are skipped.
+    """
+    rules, current = [], []
+    source = os.path.basename(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stripped = line.strip()
+            if not current and (not stripped or stripped.startswith("#")):
+                continue
+            current.append(line.rstrip("\n"))
+            text = "\n".join(current).strip()
+            if "(" in text and text.endswith(")"):
+                rules.append(parse_rule(text, source))
+                current = []
+    return rules
+
+
+def normalize_selector(selector):
+    """
+    Normalize a selector from lab_conf.yaml or found in actions/plans:
+        1234 / "sid:1234"                -> ("sid", "1234")
+        "CVE-2021-41773" / "cve:2021-41773" -> ("reference", "cve,2021-41773")
+        "reference:bugtraq,1234"         -> ("reference", "bugtraq,1234")
+        "classtype:..." "msg:..." "service:..." "metadata:..." "file:..."
+    Returns None for unknown selectors.
+    """
+    if isinstance(selector, int):
+        return "sid", str(selector)
+    selector = str(selector).strip()
+    match = CVE_PATTERN.fullmatch(selector)
+    if match:
+        return "reference", f"cve,{match.group(1)}-{match.group(2)}"
+    key, sep, value = selector.partition(":")
+    key, value = key.strip().lower(), value.strip()
+    if not sep or not value:
+        return None
+    if key == "cve":
+        return "reference", f"cve,{value.lower().removeprefix('cve-')}"
+    if key == "reference":
+        return "reference", value.replace(" ", "").lower()
+    if key in ("sid", "classtype", "msg", "service", "metadata", "file"):
+        return key, value
+    return None
+
+
+def rule_matches(rule, selector):
+    key, value = selector
+    if key == "sid":
+        return str(rule["sid"]) == value
+    if key == "reference":
+        return value in rule["references"]
+    if key == "classtype":
+        return rule["classtype"] == value
+    if key == "file":
+        return rule["source"] == os.path.basename(value)
+    # msg, service, metadata: case-insensitive substring
+    return value.lower() in rule[key].lower()
+
+
+def scheduled_cves(*structures):
+    """
+    CVE identifiers mentioned in the parsed actions and plans (action names,
+    commands, parameters), as ("reference", "cve,YYYY-NNNN") selectors.
+    """
+    found = set()
+
+    def walk(value):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                walk(k)
+                walk(v)
+        elif isinstance(value, (list, tuple, set)):
+            for v in value:
+                walk(v)
+        elif isinstance(value, str):
+            for year, number in CVE_PATTERN.findall(value):
+                found.add(("reference", f"cve,{year}-{number}"))
+
+    for structure in structures:
+        walk(structure)
+    return sorted(found)
+
+
+def add_flowbits_dependencies(rules, selected):
+    """
+    Add the rules setting the flowbits checked by the selected rules,
+    otherwise those rules could never fire.
+    """
+    setters = {}
+    for index, rule in enumerate(rules):
+        for operation, names in rule["flowbits"]:
+            if operation in FLOWBITS_SETTERS:
+                for name in names:
+                    setters.setdefault(name, []).append(index)
+
+    pending = list(selected)
+    while pending:
+        rule = rules[pending.pop()]
+        for operation, names in rule["flowbits"]:
+            if operation not in FLOWBITS_CHECKS:
+                continue
+            for name in names:
+                for index in setters.get(name, []):
+                    if index not in selected:
+                        selected.add(index)
+                        pending.append(index)
+    return selected
+
+
+def parse_rule_config(config, lab_folder):
+    """
+    Normalize the optional 'snort_rules' section of lab_conf.yaml:
+        { "files": [absolute paths], "selectors": [(key, value)],
+          "devices": [names/selectors] or None, "scan_actions": bool,
+          "mount": str, "config": str }
+    Returns None if the section is missing or disabled.
+    """
+    if not config or not isinstance(config, dict) or config.get("enabled", True) is False:
+        return None
+    snort_folder = os.path.join(lab_folder, "assets", "snort3")
+    # Configured files are relative to the Snort folder, the default ones are globbed with it
+    files = [os.path.join(snort_folder, path) for path in config.get("files") or []] \
+        or sorted(glob.glob(os.path.join(snort_folder, "rules", "*.rules")))
+    paths = []
+    for path in files:
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            paths.append(path)
+        else:
+            print(f"[WARNING] snort_rules: rules file not found: {path}")
+
+    selectors = []
+    for selector in [*(config.get("sids") or []), *(config.get("tags") or [])]:
+        normalized = normalize_selector(selector)
+        if normalized is None:
+            print(f"[WARNING] snort_rules: unknown selector '{selector}', ignored.")
+            continue
+        selectors.append(normalized)
+
+    devices = config.get("devices")
+    return {
+        "files": paths,
+        "selectors": selectors,
+        "devices": [str(d) for d in devices] if devices else None,
+        "scan_actions": bool(config.get("scan_actions", True)),
+        "mount": config.get("mount") or DEFAULT_MOUNT,
+        "config": config.get("config") or DEFAULT_CONFIG,
+    }
+
+
+def rule_subset_key(config, selectors):
+    """Hash of the rules files and of the selection: the cache key of a subset."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"selectors": sorted(selectors), "mount": config["mount"]}).encode())
+    for path in config["files"]:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def build_rule_subset(config, lab_folder, actions=None, plans=None):
+    """
+    Select the rules of the scenario and write them, with the Lua include
+    pointing Snort to them, under <lab_folder>/.cache/snort_rules/<key>/.
+    A subset with the same inputs is reused without parsing the rules.
+
+    Returns a dict (key, folder, rules_file, lua_file, selected, total,
+    cached) or None if nothing is configured or no rule matches.
+    """
+    if not config or not config["files"]:
+        return None
+    selectors = list(dict.fromkeys(config["selectors"] + (
+        scheduled_cves(actions or {}, plans or {}) if config["scan_actions"] else []
+    )))
+    if not selectors:
+        print("[WARNING] snort_rules: no SIDs, tags or CVEs to select, using the full ruleset.")
+        return None
+
+    key = rule_subset_key(config, selectors)
+    folder = os.path.join(lab_folder, CACHE_DIR, key)
+    manifest_path = os.path.join(folder, MANIFEST_FILE)
+    subset = {"key": key, "folder": folder, "rules_file": os.path.join(folder, RULES_FILE),
+              "lua_file": os.path.join(folder, LUA_FILE)}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return {**subset, **json.load(f), "cached": True}
+
+    with tracer.span("compile_snort_rules", key=key, selectors=len(selectors)):
+        rules = [rule for path in config["files"] for rule in parse_rules_file(path)]
+        selected = {i for i, rule in enumerate(rules) if any(rule_matches(rule, s) for s in selectors)}
+        matched = len(selected)
+        if not selected:
+            print("[WARNING] snort_rules: no rule matches the selection, using the full ruleset.")
+            return None
+        add_flowbits_dependencies(rules, selected)
+
+        os.makedirs(folder, exist_ok=True)
+        with open(subset["rules_file"], "w", encoding="utf-8") as f:
+            f.write(f"# Rule subset {key}: {len(selected)} of {len(rules)} rules\n")
+            for index in sorted(selected):
+                f.write(rules[index]["text"] + "\n")
+        with open(subset["lua_file"], "w", encoding="utf-8") as f:
+            f.write(f"-- Rule subset {key}, replaces the rules of the ips module\n"
+                    f"ips.rules = [[\n    include {config['mount']}/{RULES_FILE}\n]]\n")
+        manifest = {
+            "selectors": [f"{k}:{v}" for k, v in selectors],
+            "selected": len(selected),
+            "matched": matched,
+            "total": len(rules),
+            "sids": sorted(rules[i]["sid"] for i in selected if rules[i]["sid"] is not None),
+        }
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    return {**subset, **manifest, "cached": False}
+
+
+def rule_subset_devices(config, devices, device_index):
+    """Devices receiving the subset: the configured ones, or those running a Snort image."""
+    if config["devices"] is None:
+        return [name for name, dev in devices.items() if "snort" in (dev["image"] or "").lower()]
+    names = []
+    for member in config["devices"]:
+        for name in ([member] if member in devices else device_index.resolve(member) or []):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def apply_rule_subset(lab, device, name, config, subset, startup_lines):
+    """
+    Copy the subset into the device and add the Lua include to the Snort
+    configuration in its startup file, just before Snort is launched.
+    The line carries the subset key, so snapshots follow rule changes.
+    """
+    device.create_file_from_path(subset["rules_file"], f"{config['mount']}/{RULES_FILE}")
+    device.create_file_from_path(subset["lua_file"], f"{config['mount']}/{LUA_FILE}")
+
+    include_line = (f"echo \"include '{config['mount']}/{LUA_FILE}'\" >> {config['config']}"
+                    f"  # snort rule subset {subset['key']} # snapshot:skip")
+    lines = [line for line in startup_lines if "# snort rule subset" not in line]
+    launch = next((i for i, line in enumerate(lines)
+                   if SNORT_LAUNCH_PATTERN.search(line) and not line.strip().startswith("#")), None)
+    if launch is None:
+        print(f"[WARNING] {name}: Snort launch not found in the startup file, rule subset not enabled.")
+        return False
+    lines.insert(launch, include_line)
+    lab.create_file_from_list(lines, f"{name}.startup")
+    return True
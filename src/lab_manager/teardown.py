@@ -0,0 +1,217 @@
+import threading
+import time
+
+from src.backend.manager import get_manager
+from src.metrics import metrics
+from src.tracing.tracer import tracer
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_WORKERS = 8
+KILL_TIMEOUT = 10
+POLL_INTERVAL = 0.1
+
+
+def running_machines(lab):
+    """
+    Return the names of the lab machines currently running, with a single
+    stats query when the backend supports it.
+    """
+    manager = get_manager()
+    if hasattr(manager, "get_machines_stats"):
+        try:
+            stats = next(manager.get_machines_stats(lab=lab), None) or {}
+            return {s.name for s in stats.values()}
+        except Exception:
+            pass
+    return {name for name in lab.machines.keys()
+            if next(manager.get_machine_stats(name, lab=lab), None) is not None}
+
+
+def remaining_links(lab):
+    """Return the collision domains of the lab still present on the backend."""
+    manager = get_manager()
+    if not hasattr(manager, "get_links_stats"):
+        return set()
+    try:
+        return set((next(manager.get_links_stats(lab=lab), None) or {}).keys())
+    except Exception:
+        return set()
+
+
+def _run_with_deadline(func, timeout):
+    """
+    Run func in a daemon thread. Returns (finished, error): a call still
+    running after timeout is abandoned, never joined, so it cannot block exit.
+    """
+    outcome = {}
+
+    def target():
+        try:
+            func()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get("error")
+
+
+class Teardown:
+    def __init__(self, lab, processes=None, timeout=DEFAULT_TIMEOUT, max_workers=DEFAULT_WORKERS):
+        """
+        Stop lab machines concurrently with a per-machine deadline.
+
+        Parameters:
+        - lab: the deployed lab
+        - processes: {machine: terminal process}, terminals are closed first
+        - timeout: seconds a machine may take to undeploy before it is killed
+        - max_workers: machines undeployed at the same time
+
+        A machine exceeding its deadline (or every pending machine on Ctrl+C)
+        is force-removed through its container. Results are
+        {machine: (outcome, seconds)} with outcome one of 'removed',
+        'killed', 'failed' or 'not running'.
+        """
+        self.lab = lab
+        self.processes = processes if processes is not None else {}
+        self.timeout = timeout
+        self.max_workers = max(1, max_workers)
+        self.results = {}
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _close_terminal(self, name):
+        p = self.processes.get(name)
+        if p and p.poll() is None:
+            p.terminate()
+
+    def _force_remove(self, name):
+        """Kill and remove the container of a machine, bypassing the manager."""
+        def remove():
+            api_object = get_manager().get_machine_api_object(name, lab=self.lab)
+            api_object.remove(force=True)
+
+        finished, error = _run_with_deadline(remove, KILL_TIMEOUT)
+        return finished and (error is None or name not in running_machines(self.lab))
+
+    def _stop_all(self, machines):
+        slots = threading.Semaphore(self.max_workers)
+        states = {name: {"done": threading.Event(), "started": None, "error": None,
+                         "released": False, "lock": threading.Lock()} for name in machines}
+
+        def release(state):
+            with state["lock"]:
+                if not state["released"]:
+                    state["released"] = True
+                    slots.release()
+
+        def stop(name, state):
+            slots.acquire()
+            if state["done"].is_set():
+                release(state)
+                return
+            state["started"] = time.time()
+            try:
+                get_manager().undeploy_lab(lab=self.lab, selected_machines=[name])
+            except Exception as e:
+                state["error"] = e
+            finally:
+                state["done"].set()
+                release(state)
+
+        for name, state in states.items():
+            threading.Thread(target=stop, args=(name, state), daemon=True).start()
+
+        pending = dict(states)
+        interrupted = False
+        while pending:
+            try:
+                time.sleep(POLL_INTERVAL)
+            except KeyboardInterrupt:
+                if interrupted:
+                    raise
+                print("\nTeardown interrupted, killing remaining machines (Ctrl+C again to abort)...")
+                interrupted = True
+
+            now = time.time()
+            for name, state in list(pending.items()):
+                if state["done"].is_set() and state["started"] is not None:
+                    elapsed = now - state["started"]
+                    if state["error"] is None:
+                        self.results[name] = ("removed", elapsed)
+                    else:
+                        print(f"Error: Failed to undeploy machine {name}: {state['error']}")
+                        self.results[name] = ("failed", elapsed)
+                    del pending[name]
+                    continue
+
+                overdue = state["started"] is not None and now - state["started"] > self.timeout
+                if overdue or interrupted:
+                    started = state["started"] or now
+                    state["done"].set()
+                    release(state)
+                    if overdue:
+                        print(f"{name}: undeploy exceeded {self.timeout}s, forcing kill...")
+                    outcome = "killed" if self._force_remove(name) else "failed"
+                    self.results[name] = (outcome, time.time() - started)
+                    del pending[name]
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def run(self, machines, whole_lab=False):
+        """
+        Tear down the given machines and verify they are gone. With whole_lab,
+        the lab networks are removed too and verified.
+        """
+        with tracer.span("teardown", machines=len(machines), whole_lab=whole_lab) as span:
+            for name in machines:
+                self._close_terminal(name)
+
+            running = running_machines(self.lab)
+            for name in machines:
+                if name not in running:
+                    self.results[name] = ("not running", 0.0)
+            self._stop_all([name for name in machines if name in running])
+
+            for name, (outcome, elapsed) in self.results.items():
+                if outcome in ("removed", "killed"):
+                    metrics.undeploy_duration.observe(elapsed, scope="machine")
+                if outcome != "failed":
+                    metrics.machine_up.set(0, machine=name)
+
+            if whole_lab:
+                # Removes the collision domains left once all machines are gone
+                finished, error = _run_with_deadline(
+                    lambda: get_manager().undeploy_lab(lab_name=self.lab.name), self.timeout
+                )
+                if not finished or error:
+                    print(f"[WARNING] Final lab cleanup did not complete: {error or 'timeout'}")
+
+            leftovers = self.verify(machines, whole_lab)
+            span.set(leftovers=len(leftovers))
+        return self.results
+
+    def verify(self, machines, whole_lab=False):
+        """
+        Return the machines (and networks, if whole_lab) still present on the backend.
+        """
+        leftovers = sorted(set(machines) & running_machines(self.lab))
+        for name in leftovers:
+            if self.results.get(name, ("",))[0] != "failed":
+                self.results[name] = ("failed", self.results.get(name, ("", 0.0))[1])
+        if leftovers:
+            print(f"[WARNING] Machines still running: {', '.join(leftovers)}")
+        if whole_lab:
+            links = sorted(remaining_links(self.lab))
+            if links:
+                print(f"[WARNING] Networks still present: {', '.join(links)}")
+                leftovers += links
+        return leftovers
+
+    def report(self):
+        """Print the outcome and time spent per machine, slowest first."""
+        if not self.results:
+            return
+        width = max(len(name) for name in self.results)
+        print("\nTeardown summary:")
+        for name, (outcome, elapsed) in sorted(self.results.items(), key=lambda r: -r[1][1]):
+            print(f"  {name:<{width}}  {outcome:<12} {elapsed:6.2f}s")
@@ -23,13 +23,97 @@ def parse_args(script_dir):
         action="store_true",
         help="Open a terminal for each device."
     )
+    optional_group.add_argument(
+        "--headless",
+        action="store_true",
+        help="Open no terminals: capture the console of every device into rotating,\ncompressed files under <lab>/logs/consoles/ (see the 'console' command)."
+    )
     optional_group.add_argument(
         "--check-ospf",
         action="store_true",
         help="Check OSPF routing tables for convergence."
     )
+    optional_group.add_argument(
+        "--from-snapshot",
+        action="store_true",
+        help="Deploy devices from their post-startup snapshot images (see the 'snapshot' command),\nskipping asset copies and startup steps already applied.\nDevices whose image, assets or startup changed boot normally."
+    )
+    optional_group.add_argument(
+        "--check-config",
+        action="store_true",
+        help="Validate lab_conf.yaml, actions.yaml and plans.yaml and exit\n(Docker and Kathara are not used)."
+    )
+    optional_group.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Validate the configuration and print the devices, links and resource limits\nthat would be deployed, without deploying anything."
+    )
+    optional_group.add_argument(
+        "--backend",
+        choices=["kathara", "fake"],
+        default="kathara",
+        help="Lab backend to use (default: kathara).\n'fake' simulates machines in memory, no Docker needed."
+    )
+    optional_group.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Record every command executed in the machines (output, exit code, latency)\ninto a trace file for replay (gzip-compressed if FILE ends with .gz)."
+    )
+    optional_group.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="Simulate the machines in memory and answer commands from a recorded trace\n(no Docker needed)."
+    )
+    optional_group.add_argument(
+        "--replay-speed",
+        type=float,
+        default=0.0,
+        metavar="FACTOR",
+        help="Time compression of recorded latencies with --replay\n(1 = real time, default 0 = no waiting)."
+    )
+    optional_group.add_argument(
+        "--trace",
+        nargs="?",
+        const="auto",
+        metavar="FILE",
+        help="Record a Chrome trace-event/Perfetto JSON of the lab lifecycle.\nDefault file: <lab>/logs/traces/startup_<timestamp>.json"
+    )
+    optional_group.add_argument(
+        "--metrics-port",
+        type=int,
+        metavar="PORT",
+        help="Expose Prometheus metrics on http://<host>:PORT/metrics."
+    )
+    optional_group.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Address of the metrics endpoint (default: 127.0.0.1)."
+    )
+    optional_group.add_argument(
+        "--api-port",
+        type=int,
+        metavar="PORT",
+        help="Serve the remote control API (HTTP/JSON) on http://<host>:PORT."
+    )
+    optional_group.add_argument(
+        "--api-host",
+        default="127.0.0.1",
+        help="Address of the remote control API (default: 127.0.0.1)."
+    )
+    optional_group.add_argument(
+        "--api-token",
+        default=os.environ.get("KATHARANGE_API_TOKEN"),
+        help="Bearer token required by the remote control API\n(default: $KATHARANGE_API_TOKEN, none if unset).\n"
+             "Mandatory when --api-host is not a loopback address."
+    )
     args = parser.parse_args()
 
+    if args.api_port:
+        from src.api.server import is_loopback_host
+        if not args.api_token and not is_loopback_host(args.api_host):
+            parser.error(f"--api-host {args.api_host} exposes the remote control API (shell commands in "
+                         f"every device) to the network: set --api-token or KATHARANGE_API_TOKEN.")
+
     # Ask for lab_name if not provided
     if not args.lab_name:
         while True:
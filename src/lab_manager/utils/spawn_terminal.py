@@ -1,23 +1,59 @@
 import shlex
+import shutil
 import subprocess
 import sys
 import os
 
+# Same output as Kathara connect_tty(logs=True): startup logs, then a shell
+CONSOLE_SHELL = "cat /var/log/shared.log /var/log/startup.log 2>/dev/null; exec /bin/bash 2>/dev/null || exec /bin/sh"
+
+
+def _container_name(machine_name, lab_name):
+    """Docker container of a machine, or None (other backends, machine not found)."""
+    from src.backend.manager import get_manager
+    try:
+        return get_manager().get_machine_api_object(machine_name, lab_name=lab_name).name
+    except Exception:
+        return None
+
+
+def _docker_host(machine_name):
+    """Docker endpoint of the host running the machine (multi-host labs), or None."""
+    from src.backend.manager import get_manager
+    endpoint_of = getattr(get_manager(), "endpoint_of", None)
+    return endpoint_of(machine_name) if endpoint_of else None
+
+
+def terminal_command(machine_name, lab_name):
+    """
+    Shell command attaching a terminal to the device.
+    The container is resolved here, where Kathara is already loaded, so the
+    terminal runs 'docker exec' instead of importing Kathara again.
+    """
+    container = _container_name(machine_name, lab_name) if shutil.which("docker") else None
+    docker_host = _docker_host(machine_name)
+    if container:
+        host_option = f"-H {shlex.quote(docker_host)} " if docker_host else ""
+        return f"docker {host_option}exec -it {shlex.quote(container)} sh -c {shlex.quote(CONSOLE_SHELL)}"
+    python_path = sys.executable
+    return (
+        (f"DOCKER_HOST={shlex.quote(docker_host)} " if docker_host else "") +
+        f"{shlex.quote(python_path)} -c "
+        f"\"from Kathara.manager.Kathara import Kathara; "
+        f"Kathara.get_instance().connect_tty('{machine_name}', lab_name='{lab_name}', logs=True)\""
+    )
+
+
 def spawn_terminal(machine_name, lab_name):
     """
     Open an xterm window and attach it to the device TTY for interactive use.
     """
-    python_path = sys.executable
     try:
-        cmd = (
-            f"{shlex.quote(python_path)} -c "
-            f"\"from Kathara.manager.Kathara import Kathara; "
-            f"Kathara.get_instance().connect_tty('{machine_name}', lab_name='{lab_name}', logs=True)\""
-        )
+        cmd = terminal_command(machine_name, lab_name)
         # Use preexec_fn=os.setsid to run the xterm in a separate process group
         return subprocess.Popen(
             ["xterm", "-hold", "-e", "bash", "-c", cmd],
             preexec_fn=os.setsid
         )
     except Exception:
-        print("Something went wrong")
\ No newline at end of file
+        print("Something went wrong")
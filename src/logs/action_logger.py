@@ -1,6 +1,7 @@
 import os
 import yaml
 from datetime import datetime
+from src.metrics import metrics
 
 LOG_DIR = "logs"
 
@@ -33,6 +34,28 @@ class ActionLogger:
             pass
 
     # ---------------------- PUBLIC METHODS ----------------------
+    def get_output_dir(self, machine: str):
+        """
+        Return (and create) the folder holding full command outputs that did not
+        fit the in-memory window:
+            <lab_path>/logs/outputs/<machine>/
+        """
+        logs_dir = os.path.join(self.lab_path, LOG_DIR)
+        self._ensure_dir(logs_dir)
+        outputs_dir = os.path.join(logs_dir, "outputs")
+        self._ensure_dir(outputs_dir)
+        machine_dir = os.path.join(outputs_dir, machine)
+        self._ensure_dir(machine_dir)
+        return machine_dir
+
+    def set_owner(self, path: str):
+        """Give a file created by the lab to the original user (sudo)."""
+        uid, gid = self._get_uid_gid()
+        try:
+            os.chown(path, uid, gid)
+        except (PermissionError, FileNotFoundError):
+            pass
+
     def save_action_log_yaml(self, machine: str, action_result: str, action_name: str,
                              total_time: str, commands: dict):
         """
@@ -73,7 +96,7 @@ class ActionLogger:
             }
 
             # Write YAML file
-            with open(filepath, "w") as f:
+            with metrics.timed(metrics.log_write_duration, kind="action"), open(filepath, "w") as f:
                 yaml.dump(data, f, sort_keys=False)
 
             # Set ownership for file
@@ -0,0 +1,239 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from src.backend.manager import get_manager, get_machine_started_at
+
+LOG_DIR = "logs"
+# Kathara writes the output of the startup files there (what 'connect_tty(logs=True)' prints)
+DEFAULT_CONSOLE_COMMAND = "tail -n {lines} -F /var/log/shared.log /var/log/startup.log 2>/dev/null"
+DEFAULT_MAX_MB = 1
+DEFAULT_MAX_AGE = 3600
+DEFAULT_KEEP = 10
+RECONNECT_INTERVAL = 5
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def parse_console_config(config):
+    """
+    Normalize the optional 'console_logs' section of lab_conf.yaml:
+        { "max_mb": n, "max_age": s, "keep": n, "command": str }
+    """
+    config = config if isinstance(config, dict) else {}
+    return {
+        "max_bytes": int(float(config.get("max_mb", DEFAULT_MAX_MB)) * 1024 * 1024),
+        "max_age": float(config.get("max_age", DEFAULT_MAX_AGE)),
+        "keep": int(config.get("keep", DEFAULT_KEEP)),
+        "command": config.get("command", DEFAULT_CONSOLE_COMMAND),
+    }
+
+
+def _set_owner(path):
+    uid = int(os.environ.get("SUDO_UID", os.getuid()))
+    gid = int(os.environ.get("SUDO_GID", os.getgid()))
+    try:
+        os.chown(path, uid, gid)
+    except (PermissionError, FileNotFoundError):
+        pass
+
+
+class RotatingConsoleLog:
+    def __init__(self, directory, machine, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 max_age=DEFAULT_MAX_AGE, keep=DEFAULT_KEEP):
+        """
+        Console stream of one device written as timestamped lines into
+        <directory>/<machine>_<start>.log. A segment is closed and gzipped
+        when it exceeds max_bytes or max_age seconds; only the last `keep`
+        segments are kept. index.jsonl lists the segments with the time of
+        their first and last line, so a time range is found without reading them.
+        """
+        self.directory = directory
+        self.machine = machine
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.partial = b""
+        self.file = None
+        self.segment = None
+        self.closed = False
+        os.makedirs(directory, exist_ok=True)
+        _set_owner(directory)
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, "index.jsonl")
+
+    def _open(self, now):
+        stamp = datetime.fromtimestamp(now).strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{self.machine}_{stamp}.log")
+        if os.path.exists(path) or os.path.exists(path + ".gz"):
+            path = os.path.join(self.directory, f"{self.machine}_{stamp}_{int(now * 1000) % 1000:03d}.log")
+        self.file = open(path, "ab")
+        _set_owner(path)
+        self.segment = {"file": os.path.basename(path) + ".gz", "start": now, "end": now, "lines": 0, "bytes": 0}
+
+    def _rotate(self):
+        """Close, compress and index the current segment, then drop the oldest ones."""
+        if self.file is None:
+            return
+        path = self.file.name
+        self.file.close()
+        self.file = None
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        _set_owner(path + ".gz")
+
+        segments = self.segments() + [self.segment]
+        for old in segments[:-self.keep] if self.keep > 0 else []:
+            try:
+                os.remove(os.path.join(self.directory, old["file"]))
+            except FileNotFoundError:
+                pass
+        with open(self.index_path, "w") as f:
+            for segment in segments[-self.keep:] if self.keep > 0 else segments:
+                f.write(json.dumps(segment) + "\n")
+        _set_owner(self.index_path)
+        self.segment = None
+
+    def _write_line(self, line, now):
+        if self.file is None:
+            self._open(now)
+        elif (self.segment["bytes"] >= self.max_bytes or now - self.segment["start"] >= self.max_age):
+            self._rotate()
+            self._open(now)
+        data = datetime.fromtimestamp(now).strftime(TIME_FORMAT)[:-3].encode() + b" " + line + b"\n"
+        self.file.write(data)
+        self.segment["end"] = now
+        self.segment["lines"] += 1
+        self.segment["bytes"] += len(data)
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def write(self, chunk, now=None):
+        """Append a chunk of the console stream; incomplete lines wait for the next chunk."""
+        if not chunk:
+            return
+        now = now or time.time()
+        with self.lock:
+            if self.closed:
+                return
+            lines = (self.partial + chunk).split(b"\n")
+            self.partial = lines.pop()
+            for line in lines:
+                self._write_line(line.rstrip(b"\r"), now)
+            if self.file is not None:
+                self.file.flush()
+
+    def mark(self, message):
+        """Write a line of the capture itself (reconnections, restarts)."""
+        self.write(f"---- {message} ----\n".encode())
+
+    def segments(self):
+        """Closed segments of the index, oldest first."""
+        try:
+            with open(self.index_path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read(self, since=None, until=None):
+        """
+        Lines (text, with their timestamp prefix) written in [since, until],
+        reading only the segments overlapping the range.
+        """
+        with self.lock:
+            segments = self.segments()
+            if self.file is not None:
+                self.file.flush()
+                segments.append({**self.segment, "file": os.path.basename(self.file.name)})
+        lines = []
+        for segment in segments:
+            if (since and segment["end"] < since) or (until and segment["start"] > until):
+                continue
+            path = os.path.join(self.directory, segment["file"])
+            opener = gzip.open if path.endswith(".gz") else open
+            try:
+                with opener(path, "rt", errors="replace") as f:
+                    lines.extend(line.rstrip("\n") for line in f)
+            except FileNotFoundError:
+                continue
+        if since or until:
+            low = datetime.fromtimestamp(since).strftime(TIME_FORMAT)[:-3] if since else ""
+            high = datetime.fromtimestamp(until).strftime(TIME_FORMAT)[:-3] if until else "~"
+            lines = [line for line in lines if low <= line[:23] <= high]
+        return lines
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.partial:
+                self._write_line(self.partial, time.time())
+                self.partial = b""
+            self._rotate()
+
+
+class ConsoleCapture:
+    def __init__(self, lab, machines, lab_folder, config=None):
+        """
+        Headless replacement of the device terminals: one thread per device
+        follows its console (startup output) through the backend and writes
+        it to a RotatingConsoleLog under <lab_folder>/logs/consoles/<machine>/.
+        A stream that ends (machine restarted or stopped) is reopened.
+        """
+        self.lab = lab
+        self.config = config or parse_console_config(None)
+        self.directory = os.path.join(lab_folder, LOG_DIR, "consoles")
+        self.logs = {
+            name: RotatingConsoleLog(os.path.join(self.directory, name), name, self.config["max_bytes"],
+                                     self.config["max_age"], self.config["keep"])
+            for name in machines
+        }
+        self.stop_event = threading.Event()
+        self.threads = {}
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _follow(self, machine):
+        log = self.logs[machine]
+        seen_start = None
+        while not self.stop_event.is_set():
+            started_at = get_machine_started_at(machine, self.lab)
+            if started_at is None:
+                self.stop_event.wait(RECONNECT_INTERVAL)
+                continue
+            # whole console of a new container, only new lines after a broken stream
+            new_container = started_at != seen_start
+            command = self.config["command"].format(lines="+1" if new_container else "0")
+            if new_container and seen_start is not None:
+                log.mark(f"{machine} restarted at {started_at}")
+            seen_start = started_at
+            try:
+                stream = get_manager().exec(machine_name=machine, command=["sh", "-c", command],
+                                            lab=self.lab, stream=True)
+                for stdout, stderr in stream:
+                    if self.stop_event.is_set():
+                        break
+                    log.write(stdout)
+                    log.write(stderr)
+            except Exception as e:
+                log.mark(f"console stream error: {e}")
+            self.stop_event.wait(RECONNECT_INTERVAL)
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def start(self):
+        for machine in self.logs:
+            thread = threading.Thread(target=self._follow, args=(machine,), name=f"console-{machine}", daemon=True)
+            self.threads[machine] = thread
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop following the consoles and compress the open segments."""
+        self.stop_event.set()
+        for log in self.logs.values():
+            log.close()
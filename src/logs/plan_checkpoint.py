@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import yaml
+from datetime import datetime
+
+LOG_DIR = "logs"
+CHECKPOINT_FILE = "checkpoint.yaml"
+
+
+class PlanCheckpoint:
+    def __init__(self, lab_path: str):
+        """
+        Persist completed plan steps so that a failed plan can be resumed.
+
+        Parameters:
+        - lab_path: root folder where logs (and checkpoints) are saved
+
+        Checkpoints are stored in:
+            <lab_path>/logs/plans/<plan_name>/checkpoint.yaml
+        """
+        self.lab_path = lab_path
+        self.lock = threading.Lock()
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _get_uid_gid(self):
+        """Return UID and GID of the user running the lab, fallback to current user."""
+        uid = int(os.environ.get("SUDO_UID", os.getuid()))
+        gid = int(os.environ.get("SUDO_GID", os.getgid()))
+        return uid, gid
+
+    def _ensure_dir(self, path: str):
+        """
+        Create directory if it doesn't exist and try to set ownership.
+        """
+        os.makedirs(path, exist_ok=True)
+        uid, gid = self._get_uid_gid()
+        try:
+            os.chown(path, uid, gid)
+        except PermissionError:
+            pass
+
+    def _path(self, plan_name: str):
+        return os.path.join(self.lab_path, LOG_DIR, "plans", plan_name, CHECKPOINT_FILE)
+
+    def _load(self, plan_name: str):
+        path = self._path(plan_name)
+        if not os.path.isfile(path):
+            return {"plan_name": plan_name, "steps": {}}
+        try:
+            with open(path, "r") as f:
+                data = yaml.safe_load(f) or {}
+            data.setdefault("steps", {})
+            return data
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable checkpoint {path}: {e}")
+            return {"plan_name": plan_name, "steps": {}}
+
+    def _save(self, plan_name: str, data: dict):
+        plan_dir = os.path.dirname(self._path(plan_name))
+        self._ensure_dir(os.path.join(self.lab_path, LOG_DIR))
+        self._ensure_dir(os.path.join(self.lab_path, LOG_DIR, "plans"))
+        self._ensure_dir(plan_dir)
+        path = self._path(plan_name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            yaml.dump(data, f, sort_keys=False)
+        os.replace(tmp_path, path)
+        uid, gid = self._get_uid_gid()
+        try:
+            os.chown(path, uid, gid)
+        except PermissionError:
+            pass
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    @staticmethod
+    def fingerprint(step: dict, definition=None, parameters=None):
+        """
+        Hash of everything that determines a step outcome: the step itself,
+        the action definitions it runs (called actions included) and the
+        effective parameters.
+        """
+        payload = json.dumps(
+            {"step": step, "definition": definition, "parameters": parameters},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def clear(self, plan_name: str):
+        """Forget all completed steps of a plan."""
+        with self.lock:
+            path = self._path(plan_name)
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def get_satisfied(self, plan_name: str, key: str, fingerprint: str, machine_started_at):
+        """
+        Return the saved log of a completed step if it is still valid, else None.
+        A step is invalid if its fingerprint changed or if the target machine
+        was restarted (or is not running) since it completed.
+        """
+        with self.lock:
+            entry = self._load(plan_name)["steps"].get(key)
+        if not entry or entry.get("result") != "Success":
+            return None
+        if entry.get("fingerprint") != fingerprint:
+            return None
+        if machine_started_at is None or entry.get("machine_started_at") != machine_started_at:
+            return None
+        return entry.get("log")
+
+    def record(self, plan_name: str, key: str, fingerprint: str, machine: str,
+               machine_started_at, result: str, log: dict):
+        """
+        Persist the outcome of a step as soon as it completes.
+        """
+        try:
+            with self.lock:
+                data = self._load(plan_name)
+                data["updated"] = datetime.now().strftime("%Y%m%d_%H%M%S")
+                data["steps"][key] = {
+                    "fingerprint": fingerprint,
+                    "machine": machine,
+                    "machine_started_at": machine_started_at,
+                    "result": result,
+                    "completed_at": datetime.now().strftime("%Y%m%d_%H%M%S"),
+                    "log": log
+                }
+                self._save(plan_name, data)
+        except Exception as e:
+            print(f"[ERROR] Failed to save checkpoint for plan {plan_name}: {e}")
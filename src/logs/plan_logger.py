@@ -1,6 +1,7 @@
 import os
 import yaml
 from datetime import datetime
+from src.metrics import metrics
 
 LOG_DIR = "logs"
 
@@ -34,18 +35,20 @@ class PlanLogger:
 
     # ---------------------- PUBLIC METHODS ----------------------
     def save_plan_log_yaml(self, plan_name: str, plan_result: str,
-                           total_time: str, steps: dict):
+                           total_time: str, steps: dict, folder: str = None, extra: dict = None):
         """
         Save all executed steps of a single plan into one YAML log file.
 
         Automatically creates directories:
-            <lab_path>/logs/plans/<plan_name>/
+            <lab_path>/logs/plans/<folder or plan_name>/
 
         Parameters:
         - plan_name: name of the plan
         - plan_result: final result (Success / Fail)
         - total_time: total execution time
         - steps: dict with 'need' and 'actions' logs
+        - folder: plan folder (the matrix plan of an instance), default plan_name
+        - extra: additional plan-level fields (e.g. the matrix parameters)
         """
 
         try:
@@ -54,7 +57,7 @@ class PlanLogger:
             self._ensure_dir(logs_dir)
 
             # Ensure plan folder
-            plan_dir = os.path.join(logs_dir, "plans", plan_name)
+            plan_dir = os.path.join(logs_dir, "plans", folder or plan_name)
             self._ensure_dir(plan_dir)
 
             # Prepare file path
@@ -68,11 +71,12 @@ class PlanLogger:
                 "timestamp": timestamp,
                 "total_time": total_time,
                 "final_result": plan_result,
+                **(extra or {}),
                 "steps": steps
             }
 
             # Write YAML file
-            with open(filepath, "w") as f:
+            with metrics.timed(metrics.log_write_duration, kind="plan"), open(filepath, "w") as f:
                 yaml.dump(data, f, sort_keys=False)
 
             # Set ownership for file
@@ -89,3 +93,29 @@ class PlanLogger:
             print(f"[ERROR] Failed to save log for plan {plan_name}: {e}")
             traceback.print_exc()
             return None
+
+    def save_plan_summary_yaml(self, plan_name: str, summary: dict):
+        """
+        Save the rollup of the instances of a matrix plan into
+        <lab_path>/logs/plans/<plan_name>/<plan_name>_summary_<timestamp>.yaml
+        """
+        try:
+            plan_dir = os.path.join(self.lab_path, LOG_DIR, "plans", plan_name)
+            self._ensure_dir(os.path.join(self.lab_path, LOG_DIR))
+            self._ensure_dir(plan_dir)
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = os.path.join(plan_dir, f"{plan_name}_summary_{timestamp}.yaml")
+            with open(filepath, "w") as f:
+                yaml.dump({"plan_name": plan_name, "timestamp": timestamp, **summary}, f, sort_keys=False)
+
+            uid, gid = self._get_uid_gid()
+            try:
+                os.chown(filepath, uid, gid)
+            except PermissionError:
+                pass
+            return filepath
+
+        except Exception as e:
+            print(f"[ERROR] Failed to save summary for plan {plan_name}: {e}")
+            return None
@@ -0,0 +1,248 @@
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_sample(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+            cumulative += count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(round(state['sum'], 6))}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics rendered in the Prometheus text exposition format.
+    Collectors are callables run before each render (e.g. to refresh gauges).
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"[WARNING] Metrics collector failed: {e}")
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ---------------------- KATHARANGE METRICS ----------------------
+commands_total = registry.counter(
+    "katharange_commands_total", "Commands executed on lab machines.", ("machine", "result"))
+command_duration = registry.histogram(
+    "katharange_command_duration_seconds", "Duration of commands executed on lab machines.", ("machine",))
+exec_errors_total = registry.counter(
+    "katharange_exec_errors_total", "Exec calls that raised an exception.", ("machine",))
+actions_total = registry.counter(
+    "katharange_actions_total", "Actions executed.", ("machine", "action", "result"))
+action_duration = registry.histogram(
+    "katharange_action_duration_seconds", "Duration of actions.", ("machine",))
+plans_total = registry.counter(
+    "katharange_plans_total", "Plans executed.", ("plan", "result"))
+plan_duration = registry.histogram(
+    "katharange_plan_duration_seconds", "Duration of plans.", ("plan",))
+plan_steps_total = registry.counter(
+    "katharange_plan_steps_total", "Plan steps executed.", ("plan", "section", "type", "result"))
+deploy_duration = registry.histogram(
+    "katharange_deploy_duration_seconds", "Duration of deploy operations.", ("scope",))
+undeploy_duration = registry.histogram(
+    "katharange_undeploy_duration_seconds", "Duration of undeploy operations.", ("scope",))
+log_write_duration = registry.histogram(
+    "katharange_log_write_duration_seconds", "Time spent writing YAML logs.", ("kind",))
+machine_up = registry.gauge(
+    "katharange_machine_up", "1 if the machine is running, 0 otherwise.", ("machine",))
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed(histogram, **labels):
+    """
+    Context manager observing the duration of a block in a histogram.
+    """
+    return _Timer(histogram, labels)
+
+
+def machine_state_collector(cmd_manager, min_interval=5):
+    """
+    Build a collector refreshing katharange_machine_up from machine stats,
+    at most once every min_interval seconds.
+    """
+    from src.backend.manager import get_manager
+
+    last_refresh = [0.0]
+
+    def collect():
+        if time.time() - last_refresh[0] < min_interval:
+            return
+        last_refresh[0] = time.time()
+        for name in cmd_manager.lab.machines.keys():
+            try:
+                running = next(get_manager().get_machine_stats(name, lab=cmd_manager.lab), None) is not None
+            except Exception:
+                running = False
+            machine_up.set(1 if running else 0, machine=name)
+    return collect
+
+
+def _metrics_handler():
+    # http.server is imported only when the endpoint is enabled (--metrics-port)
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep scrapes out of the interactive CLI
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serve the registry on http://<host>:<port>/metrics from a daemon thread.
+    Returns the server (call shutdown() to stop it).
+    """
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), _metrics_handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -1,4 +1,6 @@
-from Kathara.manager.Kathara import Kathara
+from src.backend.manager import get_manager
+from src.tracing.tracer import tracer
+from src.metrics import metrics
 import os
 import re
 import time
@@ -94,12 +96,13 @@ class OSPFManager:
             return True  # No OSPF expectations defined for this router
 
         # Run OSPF route check inside the container
-        stdout, stderr, rc = Kathara.get_instance().exec(
-            machine_name=name,
-            command=["vtysh", "-c", "show ip route ospf"],
-            lab=self.lab,
-            stream=False  # wait for command to finish
-        )
+        with tracer.span("ospf_check", cat="ospf", device=name):
+            stdout, stderr, rc = get_manager().exec(
+                machine_name=name,
+                command=["vtysh", "-c", "show ip route ospf"],
+                lab=self.lab,
+                stream=False  # wait for command to finish
+            )
 
         if rc != 0:
             print(f"[{name}] Command failed: {stderr.decode().strip()}")
@@ -131,27 +134,37 @@ class OSPFManager:
     def check_and_deploy(self):
         
         # Generate dynamic expected_routes
-        expected_routes = self.generate_expected_routes()
-        Kathara.get_instance().deploy_lab(self.lab, selected_machines=self.routers)
+        with tracer.span("ospf_expected_routes", cat="ospf"):
+            expected_routes = self.generate_expected_routes()
+        with tracer.span("deploy_routers", cat="ospf", devices=sorted(self.routers)):
+            with metrics.timed(metrics.deploy_duration, scope="routers"):
+                get_manager().deploy_lab(self.lab, selected_machines=self.routers)
 
         print("\nWaiting for OSPF convergence...")
         converged = False
         timeout = 180
         start_time = time.time()
 
-        while not converged and (time.time() - start_time < timeout):
-            checks = []
-            for name in self.routers:
-                r = self.lab.get_machine(name)
-                checks.append(self.check_ospf(r, expected_routes))
-            if all(checks):
-                converged = True
-            else:
-                time.sleep(5)
+        attempt = 0
+        with tracer.span("ospf_convergence", cat="ospf") as convergence_span:
+            while not converged and (time.time() - start_time < timeout):
+                attempt += 1
+                checks = []
+                with tracer.span("ospf_poll", cat="ospf", attempt=attempt):
+                    for name in self.routers:
+                        r = self.lab.get_machine(name)
+                        checks.append(self.check_ospf(r, expected_routes))
+                if all(checks):
+                    converged = True
+                else:
+                    time.sleep(5)
+            convergence_span.set(converged=converged, attempts=attempt)
 
         if converged:
             print("\nOSPF convergence achieved!")
         else:
             print("\nTimeout reached, OSPF did not fully converge.")
 
-        Kathara.get_instance().deploy_lab(self.lab, excluded_machines=self.routers)
+        with tracer.span("deploy_lab", cat="ospf", excluded=sorted(self.routers)):
+            with metrics.timed(metrics.deploy_duration, scope="lab"):
+                get_manager().deploy_lab(self.lab, excluded_machines=self.routers)
@@ -0,0 +1,94 @@
+"""
+Import-time budget of the CLI entry points, measured in fresh interpreters.
+
+Usage:
+    python -m src.tracing.startup_benchmark [--runs N] [--lab LAB]
+                                            [--budget NAME=MS ...]
+
+Each scenario runs `python -X importtime` and sums the cumulative time of the
+top-level imports (median of the runs). The benchmark fails (exit status 1)
+when a scenario exceeds its budget or imports a module it must not load.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# name -> (arguments after 'python -X importtime', budget in ms, forbidden top-level modules)
+SCENARIOS = {
+    "help": (["start_lab.py", "--help"], 60,
+             {"Kathara", "docker", "readline", "yaml", "http"}),
+    "check-config": (["start_lab.py", "{lab}", "--check-config"], 250,
+                     {"Kathara", "docker", "readline", "http"}),
+    "command-system": (["-c", "import src.command_system.cmd_manager"], 250,
+                       {"Kathara", "docker", "readline", "http"}),
+}
+
+
+def parse_importtime(stderr):
+    """
+    ({module: cumulative µs}, total µs of the top-level imports) from the
+    output of -X importtime.
+    """
+    modules, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+
+def run_scenario(arguments, runs):
+    """Median import time (ms), median wall time (ms) and imported modules of a scenario."""
+    imports, walls, modules = [], [], {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=ROOT,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        walls.append((time.perf_counter() - start) * 1000)
+        modules, total = parse_importtime(result.stderr)
+        imports.append(total / 1000)
+    return statistics.median(imports), statistics.median(walls), modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enforce the import-time budget of the CLI entry points.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (median)")
+    parser.add_argument("--lab", default=os.path.join("labs", "lab"), help="Lab used by check-config")
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=MS",
+                        help="Override the budget of a scenario")
+    args = parser.parse_args()
+
+    budgets = {name: budget for name, (_, budget, _) in SCENARIOS.items()}
+    for override in args.budget:
+        name, _, value = override.partition("=")
+        if name not in budgets:
+            parser.error(f"Unknown scenario '{name}' (one of {', '.join(SCENARIOS)})")
+        budgets[name] = float(value)
+
+    failed = False
+    for name, (arguments, _, forbidden) in SCENARIOS.items():
+        arguments = [argument.format(lab=args.lab) for argument in arguments]
+        imports, wall, modules = run_scenario(arguments, args.runs)
+        loaded = sorted({module.split(".")[0] for module in modules} & forbidden)
+        ok = imports <= budgets[name] and not loaded
+        failed = failed or not ok
+        print(f"{name:<16} imports: {imports:8.1f} ms  budget: {budgets[name]:6.0f} ms  "
+              f"wall: {wall:8.1f} ms  {'OK' if ok else 'FAIL'}")
+        if loaded:
+            print(f"{'':<16} imported forbidden modules: {', '.join(loaded)}")
+        if imports > budgets[name]:
+            slowest = sorted(modules.items(), key=lambda item: -item[1])[:5]
+            print(f"{'':<16} slowest: " + ", ".join(f"{m} {us / 1000:.1f} ms" for m, us in slowest))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+
+class _NullSpan:
+    """Shared no-op span returned while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, cat, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._add_complete(self.name, self.cat, self.start, end, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes discovered while the span is running (e.g. results)."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Lightweight span recorder exported as Chrome trace-event JSON
+    (loadable in chrome://tracing and https://ui.perfetto.dev).
+
+    While disabled, span() returns a shared no-op object so instrumented code
+    pays only one attribute check per span.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.events = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.thread_ids = {}
+
+    # ---------------------- PRIVATE UTILITY METHODS ----------------------
+    def _tid(self):
+        ident = threading.get_ident()
+        tid = self.thread_ids.get(ident)
+        if tid is None:
+            with self.lock:
+                tid = self.thread_ids.setdefault(ident, len(self.thread_ids) + 1)
+                self.events.append({
+                    "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                    "args": {"name": threading.current_thread().name}
+                })
+        return tid
+
+    def _us(self, t):
+        return round((t - self.origin) * 1_000_000, 3)
+
+    def _add_complete(self, name, cat, start, end, attrs):
+        event = {
+            "name": name, "cat": cat, "ph": "X", "pid": self.pid, "tid": self._tid(),
+            "ts": self._us(start), "dur": round((end - start) * 1_000_000, 3),
+            "args": {k: _jsonable(v) for k, v in attrs.items()}
+        }
+        with self.lock:
+            self.events.append(event)
+
+    # ---------------------- PUBLIC METHODS ----------------------
+    def enable(self, path):
+        """
+        Start recording spans; the trace is written to path at exit (or on save()).
+        """
+        self.enabled = True
+        self.path = path
+        atexit.register(self.save)
+
+    def span(self, name, cat="lab", **attrs):
+        """
+        Context manager timing a block. Usage:
+            with tracer.span("deploy_lab", devices=12):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, attrs)
+
+    def instant(self, name, cat="lab", **attrs):
+        """Record a point-in-time event."""
+        if not self.enabled:
+            return
+        event = {
+            "name": name, "cat": cat, "ph": "i", "s": "t", "pid": self.pid, "tid": self._tid(),
+            "ts": self._us(time.perf_counter()), "args": {k: _jsonable(v) for k, v in attrs.items()}
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def save(self, path=None):
+        """
+        Write all recorded events as Chrome trace-event JSON. Returns the file path.
+        """
+        path = path or self.path
+        if not self.enabled or not path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self.lock:
+                data = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+            with open(path, "w") as f:
+                json.dump(data, f)
+            return path
+        except Exception as e:
+            print(f"[ERROR] Failed to save trace to {path}: {e}")
+            return None
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return [_jsonable(v) for v in value]
+    return str(value)
+
+
+tracer = Tracer()
+
@@ -1,66 +1,170 @@
-from Kathara.manager.Kathara import Kathara
-from src.logs.action_logger import ActionLogger
-from src.logs.plan_logger import PlanLogger
-from Kathara.model.Lab import Lab
-from src.lab_manager.LabManager import LabManager
-from src.ospf.ospf_manager import OSPFManager
 from src.lab_manager.utils.arg_parser import parse_args
-from src.lab_manager.utils.process_monitor import monitor_processes
-from src.command_system.action_parser import parse_actions
-from src.command_system.plan_parser import parse_plans
-from src.command_system.cmd_manager import CommandManager
-from src.command_system.cli import cli
-from src.lab_manager.utils.spawn_terminal import spawn_terminal
-import threading
 import sys
 import os
 
 
 if __name__ == "__main__":
-    python_path = sys.executable 
+    python_path = sys.executable
     try:
 
         script_dir = os.path.dirname(os.path.abspath(__file__))
         args = parse_args(script_dir)
-        
+
+        # Validation modes stop here: Kathara and Docker are never used
+        if args.check_config or args.dry_run:
+            from src.lab_manager.config_check import check_lab_config
+            sys.exit(check_lab_config(script_dir, os.path.join(script_dir, args.lab_name), dry_run=args.dry_run))
+
+        # Deployment modules (Kathara, command system, servers) are imported
+        # only once the arguments are parsed
+        from src.logs.action_logger import ActionLogger
+        from src.logs.plan_logger import PlanLogger
+        from src.logs.plan_checkpoint import PlanCheckpoint
+        from Kathara.model.Lab import Lab
+        from src.lab_manager.LabManager import LabManager
+        from src.ospf.ospf_manager import OSPFManager
+        from src.lab_manager.utils.process_monitor import monitor_processes
+        from src.command_system.action_parser import parse_actions
+        from src.command_system.plan_parser import parse_plans
+        from src.command_system.cmd_manager import CommandManager
+        from src.command_system.selectors import DeviceIndex
+        from src.command_system.cli import cli
+        from src.lab_manager.utils.spawn_terminal import spawn_terminal
+        from src.backend.manager import create_manager, get_manager, set_manager, get_local_image_id, supports_terminals
+        from src.backend.recording import RecordingManager, ReplayManager
+        from src.lab_manager.image_prefetch import ImagePrefetcher
+        from src.lab_manager.snapshots import device_snapshot_key, filter_startup_for_snapshot, get_startup_lines, snapshot_tag
+        from src.lab_manager.snort_rules import build_rule_subset, rule_subset_devices, apply_rule_subset
+        from src.tracing.tracer import tracer
+        from src.api.server import start_api_server
+        from src.alerts.collector import start_alert_collector
+        from src.logs.console_logger import ConsoleCapture
+        from src.backend.multihost import MultiHostManager, create_host_managers, host_capacities
+        from src.lab_manager.placement import (device_weights, place_devices, cross_host_links, plan_overlay,
+                                               add_overlay_gateways, devices_by_host, print_placement)
+        from src.lab_manager.resources import (ResourceBudgetError, PeakSampler, load_peaks, plan_resources,
+                                               apply_resource_plan, print_resource_plan)
+        from src.metrics import metrics
+        from datetime import datetime
+        import threading
+
         lab_name_arg = args.lab_name
         spawn_terminals = args.spawn_terminals
         check_r_ospf = args.check_ospf
-        
+        from_snapshot = args.from_snapshot
+        create_manager(args.backend)
+        if args.replay:
+            set_manager(ReplayManager(args.replay, speed=args.replay_speed))
+            print(f"Replaying commands from {args.replay}")
+        if not supports_terminals() or args.headless:
+            spawn_terminals = False
+
 
         lab_folder = os.path.join(script_dir, lab_name_arg)
 
+        # Enable phase tracing (Chrome trace-event JSON)
+        if args.trace:
+            trace_file = args.trace
+            if trace_file == "auto":
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                trace_file = os.path.join(lab_folder, "logs", "traces", f"startup_{timestamp}.json")
+            tracer.enable(trace_file)
+            print(f"Tracing enabled, trace will be written to {trace_file}")
+
         action_logger = ActionLogger(lab_folder)
         plan_logger = PlanLogger(lab_folder)
         lab_manager = LabManager(script_dir, lab_folder, lab_name=None)
-        
+
         # Load lab configuration
-        lab_info, devices = lab_manager.load_lab()
+        with tracer.span("load_lab"):
+            lab_info, devices = lab_manager.load_lab()
         lab_name = lab_info.get("description")
         lab_manager.lab_name = lab_name
+
+        # Spread the devices over the container hosts of the 'hosts' section
+        placement, host_capacity, overlay_gateways = None, None, {}
+        if lab_manager.hosts and not args.replay:
+            hosts = lab_manager.hosts["hosts"]
+            with tracer.span("place_devices", hosts=len(hosts)):
+                host_managers = create_host_managers(hosts, args.backend)
+                host_capacity = host_capacities(hosts, host_managers)
+                weights = device_weights(devices, lab_manager.resources)
+                placement = place_devices(devices, hosts, weights, host_capacity)
+                cross_links = cross_host_links(devices, placement)
+                overlay_gateways = plan_overlay(cross_links, lab_manager.hosts)
+            set_manager(MultiHostManager(
+                host_managers,
+                {**placement, **{name: gateway["host"] for name, gateway in overlay_gateways.items()}},
+                images={**{name: dev["image"] for name, dev in devices.items()},
+                        **{name: lab_manager.hosts["overlay"]["image"] for name in overlay_gateways}},
+                endpoints={name: cfg["endpoint"] for name, cfg in hosts.items()},
+            ))
+            print_placement(placement, hosts, weights, cross_links, overlay_gateways)
+        if args.record:
+            set_manager(RecordingManager(get_manager(), args.record, lab_name=lab_name_arg,
+                                         output_window=lab_manager.get_output_window(lab_info)))
+            print(f"Recording commands to {args.record}")
+
+        # Check and pull images in background while the rest of the lab is prepared
+        image_prefetcher = ImagePrefetcher(dev["image"] for dev in devices.values()).start()
         if os.path.isfile(os.path.join(lab_folder,"actions.yaml")):
-            try: 
-                actions = parse_actions(os.path.join(lab_folder,"actions.yaml"))
+            try:
+                with tracer.span("parse_actions"):
+                    actions = parse_actions(os.path.join(lab_folder,"actions.yaml"))
                 actions = { str(k): v for k, v in actions.items() }
             except Exception as e:
                 print(e)
                 exit()
         if os.path.isfile(os.path.join(lab_folder,"plans.yaml")):
-            try: 
-                plans = parse_plans(os.path.join(lab_folder,"plans.yaml"))
+            try:
+                with tracer.span("parse_plans"):
+                    plans = parse_plans(os.path.join(lab_folder,"plans.yaml"))
                 plans = { str(k): v for k, v in plans.items() }
             except Exception as e:
                 print(e)
                 exit()
         #print("Dynamic expected_routes:", expected_routes) # for debug
 
-        Kathara.get_instance().undeploy_lab(lab_name=lab_name)
+        # Size CPU/memory limits and JVM heaps of the devices to their host
+        if lab_manager.resources:
+            peaks = load_peaks(lab_manager.resources["peaks_file"])
+            try:
+                with tracer.span("plan_resources"):
+                    resource_plans = [
+                        (host, *plan_resources(lab_manager.resources, host_devices, host=capacity, peaks=peaks))
+                        for host, host_devices, capacity in devices_by_host(devices, placement, host_capacity)
+                    ]
+            except ResourceBudgetError as e:
+                print(e)
+                print("Lower the reserve or the 'resources' overrides, or remove devices from the lab.")
+                sys.exit(1)
+            for host, resource_plan, budget in resource_plans:
+                apply_resource_plan(devices, resource_plan)
+                if host:
+                    print(f"Host {host}:")
+                print_resource_plan(resource_plan, budget)
+
+        with tracer.span("undeploy_previous", lab=lab_name):
+            get_manager().undeploy_lab(lab_name=lab_name)
 
         # Initialize lab
         print(f"Creating Lab {lab_name}...")
         lab = Lab(lab_name)
 
         lab_devices = {}
+        device_index = DeviceIndex(devices, lab_manager.groups)
+
+        # Compile the Snort rules exercised by the scenario (cached by input hash)
+        rule_subset, rule_subset_targets = None, []
+        if lab_manager.snort_rules:
+            with tracer.span("snort_rules"):
+                rule_subset = build_rule_subset(lab_manager.snort_rules, lab_folder, actions, plans)
+            if rule_subset:
+                rule_subset_targets = rule_subset_devices(lab_manager.snort_rules, devices, device_index)
+                print(f"Snort rule subset {rule_subset['key']}: {rule_subset['selected']} of "
+                      f"{rule_subset['total']} rules{' (cached)' if rule_subset['cached'] else ''}")
+        # Snapshot keys of the devices, reused by the 'snapshot' command
+        snapshot_keys = {}
 
         # Create devices from configuration
         for name, dev in devices.items():
@@ -70,97 +174,143 @@ if __name__ == "__main__":
             #print(f"  Interfaces: {dev['interfaces'] if dev['interfaces'] else 'None'}")
             #print(f"  Options: {dev['options'] if dev['options'] else 'None'}\n")
 
-            lab_devices[name] = lab.new_machine(
-                name,
-                **{
-                    "image": dev["image"],
-                    **dev["options"],
-                }
-            )
-            lab_devices[name].add_meta("type", dev["type"])
-
-            # Connect interfaces
-            for iface_name, link_name in dev.get("interfaces", {}).items():
-                iface_index = int(iface_name.replace("eth", ""))
-                lab.connect_machine_to_link(name, link_name, machine_iface_number=iface_index)
-
-            # Ensure the image is available
-            Kathara.get_instance().check_image(dev['image'])
-            device = lab_devices[name]
-
-
-            # Copy device-specific assets if available
-            if dev["assets"] == None:
-                machine_folder_name = os.path.join(lab_folder, "assets", name)
-                if os.path.isdir(machine_folder_name):
-                    device.copy_directory_from_path(machine_folder_name, f"/")
-        
-                # Copy router-specific assets if available
-                router_folder_name = os.path.join(lab_folder, "assets", "routers", name)
-                if os.path.isdir(router_folder_name):
-                    device.copy_directory_from_path(router_folder_name, f"/")
-            else:
-                # If custom assets are defined as a list in the YAML
-                try:
-                    for asset_path in dev["assets"]:
-                        abs_asset_path = os.path.abspath(asset_path)
-                        if os.path.exists(abs_asset_path):
-                            if os.path.isdir(abs_asset_path):
-                                # Copy entire directory
-                                dest_path = "/"
-                                device.copy_directory_from_path(abs_asset_path, dest_path)
-                            else:
-                                # Copy single file (e.g., README.md)
-                                dest_path = f"/{asset_path}"
-                                device.create_file_from_path(abs_asset_path, dest_path)
-                        else:
-                            print(f"Asset not found: {abs_asset_path}")
-                except Exception as e:
-                    print(f"Failed to copy custom assets for {name}: {e}")
-
-            # Handle startup files
-            startup_file = os.path.join(lab_folder, "startups", f"{name}.startup")
-            lab_manager.prepare_startup_file(startup_file, name, dev, lab)
-
-            # Copy agent/snort dependencies if required
-            if os.path.isfile(startup_file):
-                with open(startup_file, "r") as sf:
-                    content = sf.read()
-                    if "init_caldera" in content:
-                        try:
-                            device.copy_directory_from_path(os.path.join(lab_folder, "assets", "agents"), "/agents")
-                        except:
-                            print("Directory agents not found")
-                            continue
-                    #Management of this part to be reviewed
-                    lab_has_wazuh = any(map(lambda d: "wazuh" in d["image"].lower(), devices.values()))
-
-                    if "wazuh" in content or ("snort" in dev["image"].lower() and lab_has_wazuh):
+            with tracer.span("create_device", device=name, image=dev["image"], type=dev["type"]):
+                lab_devices[name] = lab.new_machine(
+                    name,
+                    **{
+                        "image": dev["image"],
+                        **dev["options"],
+                    }
+                )
+                lab_devices[name].add_meta("type", dev["type"])
+                device = lab_devices[name]
+
+                # Connect interfaces
+                for iface_name, link_name in dev.get("interfaces", {}).items():
+                    iface_index = int(iface_name.replace("eth", ""))
+                    lab.connect_machine_to_link(name, link_name, machine_iface_number=iface_index)
+
+                # Handle startup files
+                startup_file = os.path.join(lab_folder, "startups", f"{name}.startup")
+                lab_manager.prepare_startup_file(startup_file, name, dev, lab)
+                lab_has_wazuh = any(map(lambda d: "wazuh" in d["image"].lower(), devices.values()))
+
+                # Point Snort to the rule subset instead of the full ruleset
+                if name in rule_subset_targets:
+                    apply_rule_subset(lab, device, name, lab_manager.snort_rules, rule_subset,
+                                      get_startup_lines(lab, name, lab_folder))
+
+                # Ensure the image is available (waits only if still being pulled):
+                # the snapshot key below includes its local id
+                image_prefetcher.wait(dev['image'])
+
+                # Boot from a post-startup snapshot if its inputs did not change
+                snapshot_image = None
+                if from_snapshot:
+                    with tracer.span("find_snapshot", device=name) as span:
+                        key = device_snapshot_key(lab, lab_folder, name, devices)
+                        snapshot_keys[name] = key
+                        tag = snapshot_tag(lab_name, name, key)
+                        if get_local_image_id(tag):
+                            snapshot_image = tag
+                            device.meta["image"] = tag
+                            startup_lines = get_startup_lines(lab, name, lab_folder)
+                            lab.create_file_from_list(filter_startup_for_snapshot(startup_lines), f"{name}.startup")
+                        span.set(snapshot=snapshot_image)
+                    print(f"{name}: booting from snapshot {snapshot_image}" if snapshot_image
+                          else f"{name}: no up-to-date snapshot, full startup")
+
+                # Bind-mount the shared assets selected for this device
+                for asset in lab_manager.get_device_shared_assets(name, device_index):
+                    lab_manager.mount_shared_asset(device, asset)
+
+                # Copy device-specific assets if available (already in a snapshot image)
+                with tracer.span("copy_assets", device=name):
+                    if snapshot_image is not None:
+                        pass
+                    elif dev["assets"] == None:
+                        machine_folder_name = os.path.join(lab_folder, "assets", name)
+                        if os.path.isdir(machine_folder_name):
+                            device.copy_directory_from_path(machine_folder_name, f"/")
+
+                        # Copy router-specific assets if available
+                        router_folder_name = os.path.join(lab_folder, "assets", "routers", name)
+                        if os.path.isdir(router_folder_name):
+                            device.copy_directory_from_path(router_folder_name, f"/")
+                    else:
+                        # If custom assets are defined as a list in the YAML
                         try:
-                            device.create_file_from_path(
-                                os.path.join(lab_folder, "assets", "wazuh-agent_4.9.0-1_amd64.deb"),
-                                "/wazuh-agent_4.9.0-1_amd64.deb"
-                            )
-                        except:
-                            print("file wazuh-agent_4.9.0-1_amd64.deb not found")
-                            continue
-
-                    if "wazuh-indexer" in dev["image"]:
-                        wazuh_indexer_path = os.path.join(lab_folder, "assets", "wazuh_indexer")
-                        device.add_meta("volume", f"{os.path.abspath(wazuh_indexer_path)}|/wazuh_indexer|ro")
-                    if "wazuh-dashboard" in dev["image"]:
-                        wazuh_dashboard_path = os.path.join(lab_folder, "assets", "wazuh_dashboard" )
-                        device.add_meta("volume", f"{os.path.abspath(wazuh_dashboard_path)}|/wazuh_dashboard|ro")
-
-                        #Bug, this test doesn't work, i can't copy folders in wazuh indexer and dashboard containers with copy_directory_from_path
-                        test = os.path.join(lab_folder, "assets", "test")
-                        if os.path.isdir(test):
-                            device.copy_directory_from_path(test,"/")
-                        
-                    if "snort" in dev["image"]:
+                            for asset_path in dev["assets"]:
+                                abs_asset_path = os.path.abspath(asset_path)
+                                shared_asset = lab_manager.get_shared_asset(abs_asset_path)
+                                if shared_asset:
+                                    lab_manager.mount_shared_asset(device, shared_asset)
+                                elif os.path.exists(abs_asset_path):
+                                    if os.path.isdir(abs_asset_path):
+                                        # Copy entire directory
+                                        dest_path = "/"
+                                        device.copy_directory_from_path(abs_asset_path, dest_path)
+                                    else:
+                                        # Copy single file (e.g., README.md)
+                                        dest_path = f"/{asset_path}"
+                                        device.create_file_from_path(abs_asset_path, dest_path)
+                                else:
+                                    print(f"Asset not found: {abs_asset_path}")
+                        except Exception as e:
+                            print(f"Failed to copy custom assets for {name}: {e}")
+
+                # Copy agent/snort dependencies if required
+                if os.path.isfile(startup_file):
+                    with tracer.span("copy_dependencies", device=name), open(startup_file, "r") as sf:
+                        content = sf.read()
+                        # Dependencies declared in shared_assets are bind-mounted instead of copied
+                        agents_path = os.path.join(lab_folder, "assets", "agents")
+                        wazuh_agent_path = os.path.join(lab_folder, "assets", "wazuh-agent_4.9.0-1_amd64.deb")
                         snort_path = os.path.join(lab_folder, "assets", "snort3")
-                        if os.path.isdir(snort_path):
-                            device.copy_directory_from_path(snort_path, "/snort3/")
+
+                        if "init_caldera" in content:
+                            if lab_manager.get_shared_asset(agents_path):
+                                lab_manager.mount_shared_asset(device, lab_manager.get_shared_asset(agents_path))
+                            elif snapshot_image is None:
+                                try:
+                                    device.copy_directory_from_path(agents_path, "/agents")
+                                except:
+                                    print("Directory agents not found")
+                                    continue
+                        #Management of this part to be reviewed
+
+                        if "wazuh" in content or ("snort" in dev["image"].lower() and lab_has_wazuh):
+                            if lab_manager.get_shared_asset(wazuh_agent_path):
+                                lab_manager.mount_shared_asset(device, lab_manager.get_shared_asset(wazuh_agent_path))
+                            elif snapshot_image is None:
+                                try:
+                                    device.create_file_from_path(wazuh_agent_path, "/wazuh-agent_4.9.0-1_amd64.deb")
+                                except:
+                                    print("file wazuh-agent_4.9.0-1_amd64.deb not found")
+                                    continue
+
+                        if "wazuh-indexer" in dev["image"]:
+                            wazuh_indexer_path = os.path.join(lab_folder, "assets", "wazuh_indexer")
+                            device.add_meta("volume", f"{os.path.abspath(wazuh_indexer_path)}|/wazuh_indexer|ro")
+                        if "wazuh-dashboard" in dev["image"]:
+                            wazuh_dashboard_path = os.path.join(lab_folder, "assets", "wazuh_dashboard" )
+                            device.add_meta("volume", f"{os.path.abspath(wazuh_dashboard_path)}|/wazuh_dashboard|ro")
+
+                            #Bug, this test doesn't work, i can't copy folders in wazuh indexer and dashboard containers with copy_directory_from_path
+                            test = os.path.join(lab_folder, "assets", "test")
+                            if os.path.isdir(test) and snapshot_image is None:
+                                device.copy_directory_from_path(test,"/")
+
+                        if "snort" in dev["image"]:
+                            if lab_manager.get_shared_asset(snort_path):
+                                lab_manager.mount_shared_asset(device, lab_manager.get_shared_asset(snort_path))
+                            elif snapshot_image is None and os.path.isdir(snort_path):
+                                device.copy_directory_from_path(snort_path, "/snort3/")
+
+        # Stitch the collision domains spanning several hosts
+        if overlay_gateways:
+            with tracer.span("overlay_gateways", gateways=len(overlay_gateways)):
+                add_overlay_gateways(lab, overlay_gateways, lab_manager.hosts["overlay"]["image"])
 
         # Identify routers
         routers = set(map(lambda x: x.name, filter(lambda x: x.meta["type"] == "router", lab.machines.values())))
@@ -172,8 +322,10 @@ if __name__ == "__main__":
             ospf_manager.check_and_deploy()
 
         else:
-            Kathara.get_instance().deploy_lab(lab)
-    
+            with tracer.span("deploy_lab", lab=lab_name, devices=len(lab.machines)), \
+                    metrics.timed(metrics.deploy_duration, scope="lab"):
+                get_manager().deploy_lab(lab)
+
         # Open terminals
         processes = {}
         cmd_manager = CommandManager(
@@ -185,13 +337,50 @@ if __name__ == "__main__":
             processes=processes,
             action_logger=action_logger,
             plan_logger=plan_logger,
-            spawn_terminals=spawn_terminals
+            spawn_terminals=spawn_terminals,
+            output_window=lab_manager.get_output_window(lab_info),
+            plan_checkpoint=PlanCheckpoint(lab_folder),
+            groups=lab_manager.groups,
+            lab_folder=lab_folder,
+            snapshot_keys=snapshot_keys
         )
 
-        for name, dev in devices.items():
-            if spawn_terminals or dev.get("spawn_terminal", False):
-                p = spawn_terminal(name, lab_name)
-                cmd_manager.processes[name] = p
+        # Collect IDS/SIEM alerts to measure detection latency of plan steps
+        if lab_manager.alerts:
+            cmd_manager.alert_collector = start_alert_collector(lab_manager.alerts, lab, lab_folder)
+            if cmd_manager.alert_collector:
+                print(f"Collecting alerts from {', '.join(s.name for s in cmd_manager.alert_collector.sources)}")
+
+        if lab_manager.resources:
+            cmd_manager.resource_sampler = PeakSampler(
+                lab, devices, lab_manager.resources["peaks_file"], lab_manager.resources["sample_interval"]
+            ).start()
+
+        # Headless mode: device consoles go to rotating files instead of terminals
+        if args.headless:
+            cmd_manager.console_capture = ConsoleCapture(
+                lab, list(devices.keys()), lab_folder, lab_manager.console_logs
+            ).start()
+            print(f"Capturing device consoles into {cmd_manager.console_capture.directory}")
+
+        # Optional Prometheus endpoint
+        if args.metrics_port:
+            metrics.registry.add_collector(metrics.machine_state_collector(cmd_manager))
+            metrics.start_metrics_server(args.metrics_port, host=args.metrics_host)
+            print(f"Metrics available at http://{args.metrics_host}:{args.metrics_port}/metrics")
+
+        # Optional remote control API
+        if args.api_port:
+            start_api_server(cmd_manager, args.api_port, host=args.api_host, token=args.api_token)
+            print(f"Remote control API available at http://{args.api_host}:{args.api_port}")
+
+        with tracer.span("spawn_terminals"):
+            for name, dev in devices.items():
+                if supports_terminals() and not args.headless and (spawn_terminals or dev.get("spawn_terminal", False)):
+                    with tracer.span("spawn_terminal", device=name):
+                        p = spawn_terminal(name, lab_name)
+                    cmd_manager.processes[name] = p
+        tracer.instant("lab_ready", lab=lab_name)
         stop_event = threading.Event()
 
         if processes:
@@ -208,4 +397,4 @@ if __name__ == "__main__":
             print("You need root permissions to run this script (or add your user to the 'docker' group).")
             sys.exit(1)
         else:
-            raise     
\ No newline at end of file
+            raise